@@ -2,8 +2,12 @@
 Authentication utilities for JWT token handling and password hashing.
 """
 
+import asyncio
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -12,9 +16,25 @@ from odmantic import AIOEngine, ObjectId
 from app.config import settings
 from app.database import get_engine
 from app.models import User
+from app.services.user_cache import user_cache
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max pin the cost so hashes made with any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt gets its own small pool so a login burst cannot occupy the
+# threadpool that request handlers use, and a semaphore caps queued jobs
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="bcrypt",
+)
+_hash_slots = asyncio.Semaphore(settings.password_hash_max_pending)
 
 # Bearer auth
 security = HTTPBearer()
@@ -22,16 +42,67 @@ security = HTTPBearer()
 
 # ---------------- PASSWORDS ---------------- #
 
-def hash_password(password: str) -> str:
-    import hashlib, base64
+def _prehash(password: str) -> str:
+    # SHA-256 first so passwords longer than bcrypt's 72 bytes still count
     hashed = hashlib.sha256(password.encode()).digest()
-    return pwd_context.hash(base64.b64encode(hashed).decode())
+    return base64.b64encode(hashed).decode()
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(_prehash(password))
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    import hashlib, base64
-    hashed = hashlib.sha256(password.encode()).digest()
-    return pwd_context.verify(base64.b64encode(hashed).decode(), hashed_password)
+    return pwd_context.verify(_prehash(password), hashed_password)
+
+
+def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if its bcrypt cost is out of date.
+
+    Returns:
+        (valid, new_hash) - new_hash is None unless the stored hash should be replaced
+    """
+    return pwd_context.verify_and_update(_prehash(password), hashed_password)
+
+
+async def _run_hash_job(func, *args):
+    """
+    Run a bcrypt call on the password hashing pool.
+
+    Raises 503 when too many hash jobs are already pending, instead of
+    letting a login burst queue up without bound.
+    """
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), settings.password_hash_wait_seconds)
+    except asyncio.TimeoutError:
+        print("⚠️ Password hashing pool saturated; rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def ahash_password(password: str) -> str:
+    """Async hash_password that keeps bcrypt off the event loop."""
+    return await _run_hash_job(hash_password, password)
+
+
+async def averify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Async verify_and_update_password that keeps bcrypt off the event loop."""
+    return await _run_hash_job(verify_and_update_password, password, hashed_password)
+
+
+def shutdown_password_hasher() -> None:
+    """Stop the password hashing pool (called on app shutdown)."""
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
 
 
 # ---------------- TOKENS ---------------- #
@@ -72,12 +143,24 @@ async def get_current_user(
     engine: AIOEngine = Depends(get_engine),
 ) -> User:
     token = credentials.credentials
+
+    # Cached entries never outlive the token, so a hit needs no decode.
+    # Cached users carry no password hash (see user_cache.NO_PASSWORD_HASH)
+    user = user_cache.lookup(token)
+    if user is not None:
+        return user
+
     payload = verify_token(token)
 
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    user = await user_cache.lookup_shared(user_id)
+    if user is not None:
+        await user_cache.store(token, user, payload.get("exp"), shared=False)
+        return user
+
     try:
         user = await engine.find_one(User, User.id == ObjectId(user_id))
     except Exception:
@@ -86,9 +169,17 @@ async def get_current_user(
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    await user_cache.store(token, user, payload.get("exp"))
     return user
 
 
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """The current user, if listed in ADMIN_USER_IDS; 403 otherwise."""
+    if str(current_user.id) not in settings.get_admin_user_ids():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
 async def get_optional_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(
         HTTPBearer(auto_error=False)
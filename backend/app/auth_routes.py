@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from odmantic import AIOEngine, ObjectId
 from app.database import get_engine
 from app.models import User
+from app.services.user_cache import user_cache
 from app.schemas import (
     UserCreate,
     UserLogin,
@@ -15,8 +16,8 @@ from app.schemas import (
     RefreshTokenRequest
 )
 from app.auth import (
-    hash_password,
-    verify_password,
+    ahash_password,
+    averify_password,
     create_access_token,
     create_refresh_token,
     get_current_user,
@@ -43,7 +44,7 @@ async def register_user(
     new_user = User(
         email=user_data.email,
         name=user_data.name,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await ahash_password(user_data.password),
     )
 
     await engine.save(new_user)
@@ -65,12 +66,25 @@ async def login_user(
     engine: AIOEngine = Depends(get_engine),
 ):
     user = await engine.find_one(User, User.email == credentials.email)
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
+    valid, new_hash = await averify_password(credentials.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password",
+        )
+
+    # Stored hash uses an old bcrypt cost: upgrade it while we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+        await engine.save(user)
+        await user_cache.invalidate_user(str(user.id))
+
     access_token = create_access_token(data={"sub": str(user.id)})
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
 
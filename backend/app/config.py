@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set
 import os
 
 class Settings(BaseSettings):
@@ -17,6 +17,15 @@ class Settings(BaseSettings):
     # Database Configuration
     database_url: str  # REQUIRED: No default
     database_name: str = "real_estate_ai"
+
+    # MongoDB Connection Pool (per worker process)
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 5  # Connections opened at startup and kept warm
+    mongo_max_idle_time_ms: int = 300000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 30000
+    mongo_configure_indexes: bool = True  # Ensure model indexes at startup
     
     # Application Settings
     app_name: str = "Tamil Nadu Real Estate AI Assistant"
@@ -41,7 +50,129 @@ class Settings(BaseSettings):
     llm_model: str = "llama-3.1-8b-instant"
     llm_temperature: float = 0.7
     llm_max_tokens: int = 1024
-    
+    llm_api_url: str = "https://api.groq.com/openai/v1/chat/completions"
+
+    # LLM HTTP Client (shared, pooled connection to Groq)
+    llm_http2: bool = True
+    llm_timeout_seconds: float = 30.0
+    llm_connect_timeout_seconds: float = 5.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry_seconds: float = 30.0
+
+    # LLM Request Coalescing (identical in-flight requests without history share one call)
+    llm_coalesce_enabled: bool = True
+    llm_coalesce_max_wait_seconds: float = 20.0  # Followers then make their own call
+
+    # LLM Providers: JSON list of OpenAI-compatible endpoints; empty = the Groq settings above.
+    # Entry fields: name, api_url, model, api_key or api_key_env, weight, query_classes
+    # ("general", "unit_conversion"), and optional max_concurrency / requests_per_minute /
+    # tokens_per_minute overrides
+    llm_providers: List[Dict[str, Any]] = []
+    llm_short_query_chars: int = 120  # Longest query routed as a unit conversion
+    llm_ewma_alpha: float = 0.2  # Weight of the newest sample in provider latency/error averages
+
+    # LLM Resilience (retries, hedging, circuit breaker, quota limiter)
+    llm_request_budget_seconds: float = 30.0  # Total time for all attempts of one call
+    llm_max_attempts: int = 3
+    llm_retry_base_delay_seconds: float = 0.5
+    llm_retry_max_delay_seconds: float = 8.0
+    llm_hedge_enabled: bool = False  # Send a second request when the first is slower than p95
+    llm_hedge_min_delay_seconds: float = 1.0
+    llm_hedge_max_delay_seconds: float = 10.0
+    llm_breaker_error_threshold: float = 0.5  # Error ratio that opens the circuit
+    llm_breaker_min_calls: int = 20
+    llm_breaker_window: int = 50
+    llm_breaker_open_seconds: float = 15.0
+    # Quota limits are per worker process: divide the Groq quota by the worker count (0 = unlimited)
+    llm_max_concurrency: int = 64
+    llm_requests_per_minute: int = 0
+    llm_tokens_per_minute: int = 0
+    llm_limiter_max_wait_seconds: float = 10.0
+
+    # Chat History Storage
+    message_bucket_size: int = 50  # Messages per MessageBucket document
+    chat_history_messages: int = 6  # Recent messages kept verbatim (older ones are summarized)
+    history_page_size: int = 50  # Default page size of the history endpoint
+    history_max_page_size: int = 200
+    message_migration_wait_seconds: float = 10.0  # Longest an append waits on a session being migrated
+
+    # Conversation History Window (token budget + rolling per-session summary)
+    llm_prompt_token_budget: int = 6000  # Whole prompt: system, knowledge, history, message
+    history_max_tokens: int = 1500  # Summary + recent turns
+    history_summary_every: int = 8  # Summarize once this many messages pile up past the verbatim ones; 0 = never
+    history_summary_max_tokens: int = 200
+    history_summary_fold_max: int = 16  # Most messages folded into the summary per LLM call
+    history_summary_retry_seconds: float = 60.0  # Back-off after a failed summary, doubling per failure
+
+    # Batch Evaluation (POST /api/chat/batch, admin users only)
+    batch_max_items: int = 5000
+    batch_max_body_bytes: int = 5 * 1024 * 1024  # Larger bodies are refused before parsing
+    batch_max_concurrency: int = 16  # LLM calls in flight per batch
+
+    # Knowledge Retrieval (passages added to the system prompt)
+    knowledge_top_k: int = 6
+    knowledge_max_chars: int = 3000
+
+    # Shared cache tier (Redis-compatible URL, or memory:// for a local stand-in)
+    redis_url: Optional[str] = None
+
+    # LLM Response Cache
+    response_cache_enabled: bool = True
+    response_cache_ttl_seconds: int = 3600
+    response_cache_max_entries: int = 2048
+    # 0 = never cache turns that carry conversation history;
+    # N > 0 = cache them keyed on a digest of the last N messages
+    response_cache_history_turns: int = 0
+
+    # Domain Classifier (second opinion on queries the keyword gate cannot settle)
+    domain_classifier_enabled: bool = True
+    domain_classifier_path: Optional[str] = None  # Default: app/data/domain_classifier.npz
+
+    # Classification Cache (domain validation + language per normalized query)
+    classification_cache_enabled: bool = True
+    classification_cache_max_entries: int = 50000
+    # Optional file of frequent queries ("<count><TAB><query>" per line) loaded at startup
+    classification_cache_prewarm_path: Optional[str] = None
+
+    # Deterministic Answers (unit conversions and fee calculations, no LLM call)
+    fast_answers_enabled: bool = True
+
+    # Rate Limiting (token bucket per user id, or per client IP when anonymous;
+    # shared across workers when REDIS_URL is set, else per worker)
+    rate_limit_enabled: bool = True
+    rate_limit_chat_per_minute: int = 20  # 0 disables a route class
+    rate_limit_chat_burst: int = 10
+    rate_limit_auth_per_minute: int = 10
+    rate_limit_auth_burst: int = 5
+    rate_limit_history_per_minute: int = 120
+    rate_limit_history_burst: int = 30
+    # Batch evaluation is charged per query, not per request; a batch larger
+    # than the burst is refused
+    rate_limit_batch_items_per_minute: int = 300
+    rate_limit_batch_items_burst: int = 5000
+    rate_limit_max_clients: int = 100000  # Buckets kept by the in-memory store
+    # Trusted proxies in front of the app: the client IP is read from
+    # X-Forwarded-For through this many hops (Render: 1). Set 0 only when
+    # clients connect directly, or every anonymous user behind a proxy shares
+    # one bucket; a value above the real hop count lets clients pick their IP
+    rate_limit_proxy_hops: int = 1
+
+    # Authenticated User Cache (token -> user snapshot, skips the Mongo lookup)
+    user_cache_enabled: bool = True
+    user_cache_ttl_seconds: int = 60
+    user_cache_max_entries: int = 10000
+
+    # Password Hashing (bcrypt runs on a dedicated thread pool, off the event loop)
+    bcrypt_rounds: int = 12  # Changing this rehashes passwords on next login
+    password_hash_workers: int = 2  # Threads per worker process
+    password_hash_max_pending: int = 16  # Hash jobs running or queued at once
+    password_hash_wait_seconds: float = 5.0  # Queue wait before answering 503
+
+    # Admin-only routes (batch evaluation): comma-separated user ids, as
+    # returned by /api/auth/me; empty = no admins
+    admin_user_ids: str = ""
+
     # JWT Authentication
     jwt_secret_key: str  # REQUIRED: No default
     jwt_algorithm: str = "HS256"
@@ -68,6 +199,10 @@ class Settings(BaseSettings):
             origins.extend([origin.strip() for origin in env_origins.split(",") if origin.strip()])
         return origins
 
+    def get_admin_user_ids(self) -> Set[str]:
+        """User ids allowed on admin-only routes."""
+        return {user_id.strip() for user_id in self.admin_user_ids.split(",") if user_id.strip()}
+
 # Global settings instance
 try:
     settings = Settings()
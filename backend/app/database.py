@@ -1,26 +1,86 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from odmantic import AIOEngine
 from app.config import settings
+from app.models import ChatSession, MessageBucket, User
 
 # Global variables to store the client and engine
 _client = None
 _engine = None
 
+# Collections whose declared indexes are ensured at startup
+MODELS = [User, ChatSession, MessageBucket]
+
+
+def _create_client() -> AsyncIOMotorClient:
+    """MongoDB client with the pool sizes and timeouts from Settings."""
+    return AsyncIOMotorClient(
+        settings.database_url,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        socketTimeoutMS=settings.mongo_socket_timeout_ms,
+    )
+
+
 def get_engine():
     """
-    Return the database engine (Lazy Initialization).
-    Creates the connection only when valid request comes in.
+    Return the database engine.
+    Normally opened by connect_db() at startup; created lazily here when
+    used outside the app lifespan (scripts, health checks before startup).
     """
     global _client, _engine
-    
+
     if _engine is None:
         # Create MongoDB client only when needed
-        _client = AsyncIOMotorClient(settings.database_url)
+        _client = _create_client()
         _engine = AIOEngine(client=_client, database=settings.database_name)
         print("✅ MongoDB connection initialized (Lazy)")
-        
+
     return _engine
 
-def init_db():
-    """No initialization needed for MongoDB (schemaless)."""
-    pass
+
+async def init_db(engine: AIOEngine):
+    """Create the indexes declared on the models (no-op for existing ones)."""
+    await engine.configure_database(MODELS)
+
+
+async def connect_db():
+    """
+    Open the MongoDB client for this worker (called from the app lifespan).
+
+    Resolves the cluster and opens `mongo_min_pool_size` connections up
+    front, so the first request does not pay DNS/TLS/handshake latency,
+    then ensures indexes. Failures are logged, not raised: the driver keeps
+    retrying and requests surface the error as before.
+    """
+    engine = get_engine()
+
+    try:
+        # Concurrent pings each check out a connection, filling the pool
+        warm = max(1, settings.mongo_min_pool_size)
+        await asyncio.gather(*(engine.client.admin.command("ping") for _ in range(warm)))
+        print(f"✅ MongoDB connected (pool {settings.mongo_min_pool_size}-{settings.mongo_max_pool_size})")
+    except Exception as e:
+        print(f"⚠️ MongoDB warm-up failed: {e}")
+        return
+
+    if settings.mongo_configure_indexes:
+        try:
+            await init_db(engine)
+            print("✅ MongoDB indexes ensured")
+        except Exception as e:
+            print(f"⚠️ MongoDB index setup failed: {e}")
+
+
+def close_db():
+    """Close the MongoDB client (called on shutdown)."""
+    global _client, _engine
+
+    if _client is not None:
+        _client.close()
+        print("✅ MongoDB connection closed")
+    _client = None
+    _engine = None
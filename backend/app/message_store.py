@@ -0,0 +1,279 @@
+"""
+Bucketed chat message storage.
+
+Messages live in MessageBucket documents of MESSAGE_BUCKET_SIZE messages
+each, keyed by (session_id, bucket). ChatSession only keeps a
+message_count, which hands out message sequence numbers atomically, and a
+stored_count, bumped once the messages are in their buckets. Appends are a
+`$push` on the current bucket; reads fetch only the buckets that hold the
+requested messages.
+
+While migrate_message_buckets.py rewrites a session's buckets it sets
+MIGRATION_LOCK on the session; appends to that session wait for it.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from itertools import groupby
+from typing import List, Optional
+
+from odmantic import AIOEngine
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.models import ChatMessage, ChatSession, MessageBucket
+
+
+# Set (to the lock time) on a session while its buckets are being migrated
+MIGRATION_LOCK = "migrating_since"
+MIGRATION_POLL_SECONDS = 0.05
+
+
+def bucket_for(seq: int) -> int:
+    """Bucket number holding message `seq`."""
+    return seq // settings.message_bucket_size
+
+
+async def append_messages(
+    engine: AIOEngine,
+    session_id: str,
+    messages: List[ChatMessage],
+) -> Optional[int]:
+    """
+    Append messages to a session.
+
+    Reserves a contiguous range of sequence numbers with one atomic `$inc`
+    on the session (which also bumps updated_at), then pushes the messages
+    onto their bucket(s), creating a bucket on first use, and finally adds
+    them to the session's stored_count.
+
+    The `$inc` only matches a session without MIGRATION_LOCK, so an append
+    waits (up to MESSAGE_MIGRATION_WAIT_SECONDS) while the migration
+    renumbers the session; after that the lock is taken as abandoned.
+
+    Args:
+        engine: Database engine
+        session_id: Session to append to
+        messages: Messages in order; their `seq` is filled in
+
+    Returns:
+        The session's new message count, or None if the session is missing
+    """
+    if not messages:
+        return None
+
+    sessions = engine.get_collection(ChatSession)
+    deadline = time.monotonic() + settings.message_migration_wait_seconds
+    while True:
+        query = {"session_id": session_id}
+        waiting = time.monotonic() < deadline
+        if waiting:
+            query[MIGRATION_LOCK] = None
+        session_doc = await sessions.find_one_and_update(
+            query,
+            {
+                "$inc": {"message_count": len(messages)},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            projection={"message_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if session_doc is not None or not waiting:
+            break
+        locked = await sessions.count_documents(
+            {"session_id": session_id, MIGRATION_LOCK: {"$ne": None}}, limit=1
+        )
+        if not locked:
+            break
+        await asyncio.sleep(MIGRATION_POLL_SECONDS)
+    if session_doc is None:
+        return None
+
+    message_count = session_doc["message_count"]
+    first_seq = message_count - len(messages)
+    for offset, message in enumerate(messages):
+        message.seq = first_seq + offset
+
+    buckets = engine.get_collection(MessageBucket)
+    for bucket, group in groupby(messages, key=lambda message: bucket_for(message.seq)):
+        docs = [message.model_dump_doc() for message in group]
+        await buckets.update_one(
+            {"session_id": session_id, "bucket": bucket},
+            {
+                # $sort keeps seq order when concurrent appends land out of order
+                "$push": {"messages": {"$each": docs, "$sort": {"seq": 1}}},
+                "$inc": {"count": len(docs)},
+            },
+            upsert=True,
+        )
+
+    # Only now may readers treat the reserved messages as present
+    await sessions.update_one({"session_id": session_id}, {"$inc": {"stored_count": len(messages)}})
+
+    return message_count
+
+
+async def find_session_state(engine: AIOEngine, session_id: str) -> Optional[dict]:
+    """
+    Look up a session without loading its body.
+
+    Projects only the fields the chat path needs, so legacy sessions that
+    still embed a long messages array cost the same as migrated ones.
+
+    Returns:
+        {"session_id", "message_count", "stored_count", "summary",
+        "summary_upto"} or None if the session is missing
+    """
+    doc = await engine.get_collection(ChatSession).find_one(
+        {"session_id": session_id},
+        projection={
+            "_id": 0, "session_id": 1, "message_count": 1, "stored_count": 1, "summary": 1, "summary_upto": 1,
+        },
+    )
+    if doc is None:
+        return None
+    doc.setdefault("message_count", 0)
+    doc.setdefault("stored_count", 0)
+    doc.setdefault("summary", None)
+    doc.setdefault("summary_upto", 0)
+    return doc
+
+
+async def update_session_summary(
+    engine: AIOEngine,
+    session_id: str,
+    summary: str,
+    previous_upto: int,
+    upto: int,
+) -> bool:
+    """
+    Store a new rolling summary covering messages before `upto`.
+
+    Only applies if the summary still covers `previous_upto`, so two
+    workers summarizing the same session cannot overwrite each other.
+
+    Returns:
+        True if the summary was stored
+    """
+    # Sessions from before summaries existed have no summary_upto field
+    covered = previous_upto if previous_upto else {"$in": [0, None]}
+    result = await engine.get_collection(ChatSession).update_one(
+        {"session_id": session_id, "summary_upto": covered},
+        {"$set": {"summary": summary, "summary_upto": upto}},
+    )
+    return result.modified_count == 1
+
+
+async def _read_buckets(
+    engine: AIOEngine,
+    session_id: str,
+    first_bucket: int,
+    last_bucket: Optional[int] = None,
+    tail: Optional[int] = None,
+) -> List[ChatMessage]:
+    """
+    Messages from a range of buckets, in sequence order.
+
+    With `tail`, a `$slice` projection makes Mongo return at most that
+    many trailing messages per bucket instead of whole buckets.
+    """
+    bucket_filter = {"$gte": first_bucket}
+    if last_bucket is not None:
+        bucket_filter["$lte"] = last_bucket
+
+    messages_projection = {"$slice": -tail} if tail else 1
+    cursor = engine.get_collection(MessageBucket).find(
+        {"session_id": session_id, "bucket": bucket_filter},
+        projection={"messages": messages_projection, "_id": 0},
+        sort=[("bucket", 1)],
+    )
+    messages = []
+    async for doc in cursor:
+        messages.extend(ChatMessage.model_validate_doc(message) for message in doc["messages"])
+    return messages
+
+
+async def get_recent_messages(
+    engine: AIOEngine,
+    session_id: str,
+    message_count: int,
+    limit: int,
+) -> List[ChatMessage]:
+    """
+    The last `limit` messages of a session.
+
+    Args:
+        engine: Database engine
+        session_id: Session to read
+        message_count: The session's current message count
+        limit: Number of trailing messages wanted
+
+    Returns:
+        Up to `limit` messages, oldest first
+    """
+    if message_count <= 0 or limit <= 0:
+        return []
+
+    first_seq = max(0, message_count - limit)
+    messages = await _read_buckets(
+        engine,
+        session_id,
+        bucket_for(first_seq),
+        bucket_for(message_count - 1),
+        tail=limit,
+    )
+    return messages[-limit:]
+
+
+async def get_messages_page(
+    engine: AIOEngine,
+    session_id: str,
+    message_count: int,
+    before: Optional[int],
+    limit: int,
+) -> List[ChatMessage]:
+    """
+    One page of a session's history: up to `limit` messages before a cursor.
+
+    Each bucket in the page is fetched with a positional `$slice`, so only
+    the requested messages leave Mongo.
+
+    Args:
+        engine: Database engine
+        session_id: Session to read
+        message_count: The session's current message count
+        before: Exclusive upper seq bound (None = newest messages)
+        limit: Page size
+
+    Returns:
+        Messages with seq in [end - limit, end), oldest first
+    """
+    end = message_count if before is None else min(before, message_count)
+    start = max(0, end - limit)
+    if start >= end:
+        return []
+
+    size = settings.message_bucket_size
+    buckets = engine.get_collection(MessageBucket)
+
+    async def read_bucket(bucket: int) -> List[ChatMessage]:
+        skip = max(start, bucket * size) - bucket * size
+        take = min(end, (bucket + 1) * size) - bucket * size - skip
+        doc = await buckets.find_one(
+            {"session_id": session_id, "bucket": bucket},
+            projection={"messages": {"$slice": [skip, take]}, "_id": 0},
+        )
+        if doc is None:
+            return []
+        return [ChatMessage.model_validate_doc(message) for message in doc["messages"]]
+
+    pages = await asyncio.gather(*(
+        read_bucket(bucket) for bucket in range(bucket_for(start), bucket_for(end - 1) + 1)
+    ))
+    return [
+        message
+        for page in pages
+        for message in page
+        if message.seq is None or start <= message.seq < end
+    ]
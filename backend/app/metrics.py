@@ -0,0 +1,240 @@
+"""
+Prometheus Metrics
+
+Request latency per route, chat latency per language and outcome, time
+spent in each stage of a chat turn, and upstream LLM latency and token
+usage.
+
+Multi-process safe: gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR before
+workers start, so each worker writes its samples to files there and
+/metrics aggregates every worker. Without the variable (plain uvicorn,
+scripts) the in-process registry is served.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "purityprop_http_request_duration_seconds",
+    "HTTP request latency, until the last body byte is sent",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+
+CHAT_REQUEST_SECONDS = Histogram(
+    "purityprop_chat_request_duration_seconds",
+    "Chat request latency by language and outcome (accepted/rejected/error)",
+    ["route", "language", "outcome"],
+    buckets=REQUEST_BUCKETS,
+)
+
+STAGE_SECONDS = Histogram(
+    "purityprop_chat_stage_duration_seconds",
+    "Time spent in one stage of a chat turn",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "purityprop_llm_request_duration_seconds",
+    "Upstream LLM call latency (whole stream for streaming calls)",
+    ["model", "mode", "outcome"],
+    buckets=REQUEST_BUCKETS,
+)
+
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "purityprop_llm_first_token_seconds",
+    "Time from sending a streaming LLM request to its first content delta",
+    ["model"],
+    buckets=REQUEST_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "purityprop_llm_tokens",
+    "Tokens reported in upstream `usage`",
+    ["model", "kind"],
+)
+
+LLM_COMPLETION_TOKENS = Histogram(
+    "purityprop_llm_completion_tokens",
+    "Completion tokens per upstream call, to correlate with latency",
+    ["model"],
+    buckets=TOKEN_BUCKETS,
+)
+
+LLM_RETRIES = Counter(
+    "purityprop_llm_retries",
+    "Upstream LLM retries by reason (status code, timeout, transport)",
+    ["upstream", "reason"],
+)
+
+LLM_HEDGES = Counter(
+    "purityprop_llm_hedges",
+    "Hedged upstream LLM requests sent, and how many answered first",
+    ["upstream", "result"],
+)
+
+LLM_FAILOVERS = Counter(
+    "purityprop_llm_failovers",
+    "Requests moved on to the next provider after this one failed",
+    ["upstream"],
+)
+
+LLM_CIRCUIT_TRANSITIONS = Counter(
+    "purityprop_llm_circuit_transitions",
+    "Circuit breaker state changes",
+    ["upstream", "state"],
+)
+
+LLM_COALESCED = Counter(
+    "purityprop_llm_coalesced",
+    "Single-flight roles: leader (made the call), follower (shared it), fallback (gave up waiting)",
+    ["mode", "role"],
+)
+
+LLM_COALESCED_FOLLOWERS = Histogram(
+    "purityprop_llm_coalesced_followers",
+    "Followers that joined each coalesced upstream call",
+    ["mode"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100),
+)
+
+FAST_ANSWERS = Counter(
+    "purityprop_fast_answers",
+    "Queries answered by the deterministic fast path instead of the LLM",
+    ["kind"],
+)
+
+DOMAIN_CLASSIFIER = Counter(
+    "purityprop_domain_classifier",
+    "Ambiguous queries the domain classifier accepted, rejected, or left to the keyword rules (kept)",
+    ["verdict"],
+)
+
+CLASSIFICATION_CACHE = Counter(
+    "purityprop_classification_cache",
+    "Classification cache lookups (hit, miss) and LRU evictions",
+    ["result"],
+)
+
+CLASSIFICATION_CACHE_SIZE = Gauge(
+    "purityprop_classification_cache_size",
+    "Queries held in the classification cache, summed over live workers",
+    multiprocess_mode="livesum",
+)
+
+RATE_LIMITED = Counter(
+    "purityprop_rate_limited",
+    "Requests rejected with 429 by the per-client rate limiter",
+    ["route_class"],
+)
+
+# Labels a handler attaches to the request being timed by MetricsMiddleware
+_request_labels: ContextVar[Optional[Dict[str, str]]] = ContextVar("request_labels", default=None)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time a block of a chat turn into the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def label_chat_request(language: Optional[str] = None, outcome: Optional[str] = None) -> None:
+    """
+    Set the language/outcome the current chat request is recorded under.
+
+    No-op outside MetricsMiddleware (scripts, tests).
+    """
+    labels = _request_labels.get()
+    if labels is None:
+        return
+    if language is not None:
+        labels["language"] = language
+    if outcome is not None:
+        labels["outcome"] = outcome
+
+
+def record_llm_usage(model: str, usage: Optional[dict]) -> None:
+    """Count the prompt/completion tokens of one upstream response."""
+    if not usage:
+        return
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    LLM_COMPLETION_TOKENS.labels(model).observe(completion_tokens)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request.
+
+    Streaming responses are timed until their last chunk. Routes are
+    labelled by their template (/api/sessions/{session_id}/messages), not
+    the raw path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        labels: Dict[str, str] = {}
+        token = _request_labels.set(labels)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status_code)).observe(elapsed)
+            if "outcome" in labels:
+                CHAT_REQUEST_SECONDS.labels(
+                    route_path, labels.get("language", "unknown"), labels["outcome"]
+                ).observe(elapsed)
+            _request_labels.reset(token)
+
+
+def metrics_response() -> Response:
+    """Render all metrics, merging every worker in multi-process mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -4,14 +4,16 @@ Database Models for Tamil Nadu Real Estate AI Assistant (MongoDB/Odmantic)
 
 from typing import List, Optional
 from datetime import datetime
-from odmantic import Model, EmbeddedModel, Reference, Field
+from odmantic import Model, EmbeddedModel, Reference, Field, Index
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 class ChatMessage(EmbeddedModel):
-    """Embedded chat message within a session."""
+    """Embedded chat message within a message bucket."""
     role: str  # 'user' or 'assistant'
     content: str
     language: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    seq: Optional[int] = None  # Position in the session, starting at 0
 
 class User(Model):
     """User model collection."""
@@ -24,6 +26,37 @@ class ChatSession(Model):
     """Chat session model collection."""
     session_id: str = Field(unique=True, index=True)
     user: Optional[User] = None
+    # Legacy embedded messages; moved into MessageBucket by migrate_message_buckets.py
     messages: List[ChatMessage] = Field(default_factory=list)
+    message_count: int = 0  # Messages stored in buckets (next seq to assign)
+    stored_count: int = 0  # Messages whose bucket write has completed (lags message_count mid-append)
+    # Rolling LLM summary of messages with seq < summary_upto (see history_window.py)
+    summary: Optional[str] = None
+    summary_upto: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = {
+        # A user's sessions, most recently active first
+        "indexes": lambda: [
+            IndexModel([("user._id", ASCENDING), ("updated_at", DESCENDING)], name="user_updated_at"),
+        ],
+    }
+
+class MessageBucket(Model):
+    """
+    Fixed-size page of a session's messages.
+    
+    Message `seq` lives in bucket `seq // MESSAGE_BUCKET_SIZE`, so a session
+    never outgrows the 16MB document limit and appends touch one small doc.
+    """
+    session_id: str
+    bucket: int
+    messages: List[ChatMessage] = Field(default_factory=list)
+    count: int = 0
+
+    model_config = {
+        "indexes": lambda: [
+            Index(MessageBucket.session_id, MessageBucket.bucket, unique=True),
+        ],
+    }
@@ -0,0 +1,283 @@
+"""
+Per-Client Rate Limiting
+
+Token buckets keyed by user id (from the bearer token) or, for anonymous
+requests, the client IP, with a separate budget per route class:
+
+    batch    POST /api/chat/batch       LLM calls, one token per query
+    chat     POST /api/chat...          LLM calls (Groq quota)
+    auth     POST /api/auth/...         bcrypt hashing (CPU)
+    history  /api/sessions...           Mongo reads and writes
+
+Over-budget requests get 429 with Retry-After before any handler work,
+except batches: their size is only known once the body is parsed, so the
+handler charges them with charge_items().
+
+Buckets live in a per-worker in-memory store, or in the shared tier when
+REDIS_URL points at a Redis server, so the budget holds across gunicorn
+workers. If the shared store fails, requests are let through rather than
+rejected.
+"""
+
+import json
+import math
+import re
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.auth import verify_token
+from app.config import settings
+from app.metrics import RATE_LIMITED
+from app.services.cache import TTLCache
+from app.services.resilience import TokenBucket
+
+# (route class, methods, path pattern); the first match wins
+ROUTE_CLASSES = (
+    ("batch", {"POST"}, re.compile(r"^/api/chat/batch$")),
+    ("chat", {"POST"}, re.compile(r"^/api/chat(?:/.*)?$")),
+    ("auth", {"POST"}, re.compile(r"^/api/auth/(?:login|register|refresh)$")),
+    ("history", {"GET", "POST"}, re.compile(r"^/api/sessions(?:/.*)?$")),
+)
+
+
+# Charged per item by the handler (charge_items), not per request here
+PER_ITEM_CLASSES = frozenset({"batch"})
+
+
+def route_budgets() -> Dict[str, Tuple[float, float]]:
+    """(requests per minute, burst) per route class, from settings."""
+    return {
+        "batch": (settings.rate_limit_batch_items_per_minute, settings.rate_limit_batch_items_burst),
+        "chat": (settings.rate_limit_chat_per_minute, settings.rate_limit_chat_burst),
+        "auth": (settings.rate_limit_auth_per_minute, settings.rate_limit_auth_burst),
+        "history": (settings.rate_limit_history_per_minute, settings.rate_limit_history_burst),
+    }
+
+
+class InMemoryRateLimitStore:
+    """
+    Token buckets for one worker process.
+
+    A bucket is dropped once it would have refilled completely, since a
+    missing bucket and a full one behave the same.
+    """
+
+    def __init__(self, max_entries: int):
+        self._buckets = TTLCache(max_entries=max_entries, ttl_seconds=0)
+
+    async def take(self, key: str, per_minute: float, burst: float, cost: float = 1) -> float:
+        """
+        Take tokens from a bucket.
+
+        Args:
+            key: Bucket key (route class + client)
+            per_minute: Refill rate
+            burst: Bucket capacity
+            cost: Tokens to take (at most `burst`)
+
+        Returns:
+            0 if the request is allowed, else seconds until it would be
+        """
+        refill_per_second = per_minute / 60
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(capacity=burst, refill_per_second=refill_per_second)
+        wait = bucket.wait_time(cost)
+        if wait == 0:
+            bucket.take(cost)
+        self._buckets.set(key, bucket, ttl_seconds=burst / refill_per_second)
+        return wait
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Refill, take and expire one bucket atomically on the Redis server, using
+# the server clock so every worker sees the same time
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), burst)
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitStore:
+    """Token buckets shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url: str, prefix: str = "purityprop:ratelimit:"):
+        # Optional dependency: only needed when REDIS_URL is configured
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, per_minute: float, burst: float, cost: float = 1) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[per_minute / 60, burst, cost]))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_rate_limit_store(url: Optional[str]):
+    """
+    Bucket store for the configured shared tier.
+
+    Without a URL, or with `memory://`, buckets are kept per worker.
+    """
+    if url and not url.startswith("memory://"):
+        try:
+            return RedisRateLimitStore(url)
+        except ImportError:
+            print("⚠️ REDIS_URL is set but the 'redis' package is not installed; rate limits are per worker")
+    return InMemoryRateLimitStore(max_entries=settings.rate_limit_max_clients)
+
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    """Route class of a request, or None if it is not rate limited."""
+    for route_class, methods, pattern in ROUTE_CLASSES:
+        if method in methods and pattern.match(path):
+            return route_class
+    return None
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_ip(scope) -> str:
+    """
+    Client address, looking through RATE_LIMIT_PROXY_HOPS trusted proxies.
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is the entry `hops` from the right;
+    anything further left is client-supplied and not trusted.
+    """
+    hops = settings.rate_limit_proxy_hops
+    if hops > 0:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+            if addresses:
+                return addresses[max(0, len(addresses) - hops)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def client_key(scope) -> str:
+    """`user:<id>` for a valid bearer token, else `ip:<address>`."""
+    authorization = _header(scope, b"authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        # Signature check only (no Mongo lookup), as get_optional_user would key it
+        try:
+            user_id = verify_token(authorization[7:].strip()).get("sub")
+        except HTTPException:
+            user_id = None
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{client_ip(scope)}"
+
+
+async def _take(store, route_class: str, client: str, cost: float) -> float:
+    """Seconds until `client` may spend `cost` tokens of a route class (0 = now, taken)."""
+    budget = route_budgets().get(route_class)
+    if not settings.rate_limit_enabled or budget is None or budget[0] <= 0:
+        return 0.0
+    per_minute, burst = budget
+    try:
+        return await store.take(f"{route_class}:{client}", per_minute, max(1.0, burst), cost)
+    except Exception as e:
+        # Fail open: an unreachable shared store must not take the API down
+        print(f"⚠️ Rate limit store error: {e}")
+        return 0.0
+
+
+async def charge_items(route_class: str, scope, count: int) -> None:
+    """
+    Charge a request one token per item, for route classes whose cost is
+    only known after the body is parsed (see PER_ITEM_CLASSES).
+
+    Raises:
+        HTTPException: 413 if the request alone exceeds the burst, 429
+            with Retry-After if the client's budget is spent
+    """
+    budget = route_budgets().get(route_class)
+    if settings.rate_limit_enabled and budget is not None and budget[0] > 0 and count > budget[1]:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request has {count} items; the rate limit allows at most {int(budget[1])} at once",
+        )
+    wait = await _take(rate_limiter, route_class, client_key(scope), count)
+    if wait > 0:
+        RATE_LIMITED.labels(route_class).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please slow down and try again shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying the per-client token buckets.
+
+    Installed inside CORSMiddleware so 429 responses carry CORS headers and
+    the frontend can read them (Retry-After is exposed).
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify_route(scope["method"], scope["path"])
+        budget = route_budgets().get(route_class) if route_class else None
+        if budget is None or budget[0] <= 0 or route_class in PER_ITEM_CLASSES:
+            await self.app(scope, receive, send)
+            return
+
+        wait = await _take(self.store, route_class, client_key(scope), 1)
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        RATE_LIMITED.labels(route_class).inc()
+        retry_after = str(max(1, math.ceil(wait)))
+        body = json.dumps({"detail": "Too many requests. Please slow down and try again shortly."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Global store instance
+rate_limiter = create_rate_limit_store(settings.redis_url)
@@ -2,22 +2,41 @@
 API Routes for Tamil Nadu Real Estate AI Assistant
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from odmantic import AIOEngine
+from contextlib import aclosing
 from datetime import datetime
+from typing import Optional
+import anyio
+import hashlib
+import json
+import logging
 import uuid
 
+from app.auth import get_admin_user
+from app.config import settings
 from app.database import get_engine
-from app.models import ChatSession, ChatMessage
+from app.metrics import label_chat_request, track_stage
+from app.message_store import append_messages, find_session_state, get_messages_page
+from app.models import ChatSession, ChatMessage, User
+from app.rate_limit import charge_items
 from app.schemas import (
     ChatRequest, ChatResponse, SessionCreate, SessionResponse,
     ConversationHistory, MessageHistory
 )
-from app.services.domain_validator import is_real_estate_query, get_rejection_message, detect_language
+from app.services.batch import parse_jsonl, run_batch
+from app.services.classification_cache import Classification, classification_cache
+from app.services.domain_validator import get_rejection_message
+from app.services.history_window import load_history, needs_summary, schedule_summary
 from app.services.llm_service import llm_service
+from app.services.resilience import StreamInterruptedError
 
 
 router = APIRouter(tags=["chat"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("/sessions", response_model=SessionResponse)
@@ -39,27 +58,65 @@ async def create_session(session_data: SessionCreate, engine: AIOEngine = Depend
     )
 
 
+async def _classify(message: str) -> Classification:
+    """
+    Run the request gate once: domain validation and language.
+    
+    Repeated queries are answered from the classification cache on the event
+    loop; a miss is classified in the threadpool to keep CPU work off it.
+    
+    Returns:
+        Classification, unpacking as (is_valid, reason, language)
+    """
+    cached = classification_cache.lookup(message)
+    if cached is not None:
+        return cached
+    return await run_in_threadpool(classification_cache.fill, message)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _save_turn(
+    engine: AIOEngine,
+    session: dict,
+    user_msg: ChatMessage,
+    assistant_msg: Optional[ChatMessage],
+) -> None:
+    """
+    Append a user turn (and its reply, if any) to the session's message buckets.
+    
+    Starts a background summary refresh once enough older turns have piled up.
+    """
+    messages = [user_msg] if assistant_msg is None else [user_msg, assistant_msg]
+    with track_stage("mongo_write"):
+        message_count = await append_messages(engine, session["session_id"], messages)
+    if needs_summary(session, message_count):
+        schedule_summary(engine, session["session_id"], llm_service.asummarize)
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
     """
     Process chat message and return response.
     """
+    # Recorded as an error unless the turn completes
+    label_chat_request(outcome="error")
+
     # Verify session exists
-    session = await engine.find_one(ChatSession, ChatSession.session_id == request.session_id)
+    with track_stage("mongo_session"):
+        session = await find_session_state(engine, request.session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Validate domain (real estate only)
-    # Validate domain (real estate only)
-    # Run CPU-bound validation in threadpool to enforce non-blocking behavior
-    from fastapi.concurrency import run_in_threadpool
-    
-    is_valid, reason = await run_in_threadpool(is_real_estate_query, request.message)
+    # Validate domain (real estate) and detect language once for the request
+    is_valid, reason, language = await _classify(request.message)
+    label_chat_request(language=language)
     
     if not is_valid:
-        # Detect language for rejection message
-        language = await run_in_threadpool(detect_language, request.message)
         rejection_msg = get_rejection_message(language)
         
         # Save user message
@@ -69,7 +126,6 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
             language=language,
             timestamp=datetime.utcnow()
         )
-        session.messages.append(user_msg)
         
         # Save rejection response
         assistant_msg = ChatMessage(
@@ -78,9 +134,8 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
             language=language,
             timestamp=datetime.utcnow()
         )
-        session.messages.append(assistant_msg)
-        session.updated_at = datetime.utcnow()
-        await engine.save(session)
+        await _save_turn(engine, session, user_msg, assistant_msg)
+        label_chat_request(outcome="rejected")
         
         return ChatResponse(
             session_id=request.session_id,
@@ -89,22 +144,16 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
             timestamp=assistant_msg.timestamp
         )
     
-    # Get conversation history from session
-    history_messages = session.messages
-    
-    conversation_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in history_messages
-    ]
-    
-    # Generate response using LLM
-    # Generate response using LLM (Async Safe)
-    from fastapi.concurrency import run_in_threadpool
+    # Rolling summary plus the unsummarized recent messages (trimmed to the
+    # prompt token budget when the LLM request is built)
+    with track_stage("mongo_history"):
+        conversation_history = await load_history(engine, session)
     
-    response_text, detected_language = await run_in_threadpool(
-        llm_service.generate_response,
+    # Generate response using LLM (awaits the shared pooled HTTP client)
+    response_text, detected_language = await llm_service.agenerate_response(
         user_message=request.message,
-        conversation_history=conversation_history
+        conversation_history=conversation_history,
+        language=language
     )
     
     # Save user message
@@ -114,7 +163,6 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
         language=detected_language,
         timestamp=datetime.utcnow()
     )
-    session.messages.append(user_msg)
     
     # Save assistant response
     assistant_msg = ChatMessage(
@@ -123,12 +171,8 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
         language=detected_language,
         timestamp=datetime.utcnow()
     )
-    session.messages.append(assistant_msg)
-    
-    # Update session timestamp
-    session.updated_at = datetime.utcnow()
-    
-    await engine.save(session)
+    await _save_turn(engine, session, user_msg, assistant_msg)
+    label_chat_request(outcome="error" if llm_service.is_error_response(response_text) else "accepted")
     
     return ChatResponse(
         session_id=request.session_id,
@@ -138,30 +182,211 @@ async def chat(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
     )
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, engine: AIOEngine = Depends(get_engine)):
+    """
+    Process chat message and stream the response as Server-Sent Events.
+
+    Events: `meta` (session and language), one `delta` per content chunk,
+    and `done` once the reply is complete. The assembled reply is saved to
+    the session when the stream finishes or the client disconnects. If the
+    upstream fails mid-reply the stream ends with an `error` event instead,
+    and only the user message is saved.
+    """
+    label_chat_request(outcome="error")
+
+    with track_stage("mongo_session"):
+        session = await find_session_state(engine, request.session_id)
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    is_valid, reason, language = await _classify(request.message)
+    label_chat_request(language=language)
+
+    with track_stage("mongo_history"):
+        conversation_history = await load_history(engine, session) if is_valid else []
+    user_msg = ChatMessage(
+        role="user",
+        content=request.message,
+        language=language,
+        timestamp=datetime.utcnow()
+    )
+
+    async def event_stream():
+        parts = []
+        interrupted = False
+        try:
+            yield _sse_event("meta", {"session_id": request.session_id, "language": language})
+
+            if not is_valid:
+                rejection_msg = get_rejection_message(language)
+                parts.append(rejection_msg)
+                yield _sse_event("delta", {"content": rejection_msg})
+                label_chat_request(outcome="rejected")
+            else:
+                # On client disconnect Starlette cancels this generator; aclosing
+                # then closes the upstream stream so Groq stops generating.
+                try:
+                    async with aclosing(llm_service.astream_response(
+                        user_message=request.message,
+                        language=language,
+                        conversation_history=conversation_history
+                    )) as deltas:
+                        async for delta in deltas:
+                            parts.append(delta)
+                            yield _sse_event("delta", {"content": delta})
+                except StreamInterruptedError as e:
+                    print(f"❌ Chat stream interrupted: {e}")
+                    interrupted = True
+                    yield _sse_event("error", {"detail": "The response was interrupted; please try again."})
+                    return
+                reply = "".join(parts)
+                label_chat_request(outcome="error" if llm_service.is_error_response(reply) else "accepted")
+
+            yield _sse_event("done", {"timestamp": datetime.utcnow().isoformat()})
+        finally:
+            assistant_msg = None
+            # A truncated reply is not kept as an answer
+            if parts and not interrupted:
+                assistant_msg = ChatMessage(
+                    role="assistant",
+                    content="".join(parts),
+                    language=language,
+                    timestamp=datetime.utcnow()
+                )
+            # Persist even when the request was cancelled mid-stream
+            with anyio.CancelScope(shield=True):
+                await _save_turn(engine, session, user_msg, assistant_msg)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    The request body, refused with 413 once it exceeds `max_bytes`.
+
+    A declared Content-Length is checked before anything is read.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise too_large
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post("/chat/batch")
+async def chat_batch(
+    request: Request,
+    concurrency: int = Query(8, ge=1, le=settings.batch_max_concurrency, description="LLM calls in flight"),
+    use_cache: bool = Query(True, alias="cache", description="Use the response cache"),
+    current_user: User = Depends(get_admin_user),
+):
+    """
+    Run a batch of queries through the chat pipeline for evaluation.
+
+    Admin users only (ADMIN_USER_IDS). The body is JSONL, one {"id",
+    "message"} object per line, at most BATCH_MAX_BODY_BYTES. Each query
+    costs one token of the client's batch rate limit. Nothing is saved to
+    any session. Results stream back as NDJSON in completion order, each
+    with per-stage timings, followed by a summary record. Lines that cannot
+    be parsed come first, as error records.
+    """
+    body = (await _read_body(request, settings.batch_max_body_bytes)).decode("utf-8", errors="replace")
+    items, errors = parse_jsonl(body)
+    if not items and not errors:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} queries; the limit is {settings.batch_max_items}",
+        )
+    await charge_items("batch", request.scope, len(items))
+    logger.info("Batch of %d queries (concurrency %d)", len(items), concurrency)
+
+    async def results():
+        for error in errors:
+            yield json.dumps(error, ensure_ascii=False) + "\n"
+        async with aclosing(run_batch(items, concurrency, use_cache)) as records:
+            async for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def _history_etag(session_id: str, message_count: int, stored_count: int, before: Optional[int], limit: int) -> str:
+    """
+    ETag for a history page.
+    
+    Messages are append-only, so once every reserved message is in its
+    bucket a page is fully determined by the session's message count and
+    the page parameters. stored_count only catches up with message_count
+    after the bucket writes, so a page read mid-append gets a different
+    ETag from the finished one.
+    """
+    raw = f"{session_id}:{message_count}:{stored_count}:{before}:{limit}"
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
 @router.get("/sessions/{session_id}/messages", response_model=ConversationHistory)
-async def get_conversation_history(session_id: str, engine: AIOEngine = Depends(get_engine)):
-    """Get conversation history for a session."""
-    session = await engine.find_one(ChatSession, ChatSession.session_id == session_id)
+async def get_conversation_history(
+    session_id: str,
+    request: Request,
+    before: Optional[int] = Query(None, ge=0, description="Return messages with seq below this cursor"),
+    limit: int = Query(settings.history_page_size, ge=1, le=settings.history_max_page_size),
+    engine: AIOEngine = Depends(get_engine),
+):
+    """
+    Get conversation history for a session, newest page first.
+    
+    Pass `next_before` from a response as `before` to fetch older messages.
+    Supports If-None-Match: an unchanged page returns 304 without reading
+    any messages.
+    """
+    session = await find_session_state(engine, session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    messages = session.messages
+    message_count = session["message_count"]
+    etag = _history_etag(session_id, message_count, session["stored_count"], before, limit)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=cache_headers)
+    
+    messages = await get_messages_page(engine, session_id, message_count, before, limit)
     
     message_list = [
         MessageHistory(
             role=msg.role,
             content=msg.content,
             language=msg.language,
-            timestamp=msg.timestamp
+            timestamp=msg.timestamp,
+            seq=msg.seq
         )
         for msg in messages
     ]
     
-    return ConversationHistory(
+    end = message_count if before is None else min(before, message_count)
+    first_seq = max(0, end - limit)
+    history = ConversationHistory(
         session_id=session_id,
-        messages=message_list
+        messages=message_list,
+        message_count=message_count,
+        next_before=first_seq if first_seq > 0 else None
     )
+    return JSONResponse(content=jsonable_encoder(history), headers=cache_headers)
 
 
 @router.get("/health")
@@ -42,15 +42,18 @@ class MessageHistory(BaseModel):
     content: str
     language: Optional[str]
     timestamp: datetime
+    seq: Optional[int] = None
     
     class Config:
         from_attributes = True
 
 
 class ConversationHistory(BaseModel):
-    """Response model for conversation history."""
+    """Response model for conversation history (one page, oldest first)."""
     session_id: str
     messages: List[MessageHistory]
+    message_count: int = 0
+    next_before: Optional[int] = Field(None, description="Cursor for the previous page; null when no older messages")
 
 
 # Authentication Schemas
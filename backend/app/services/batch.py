@@ -0,0 +1,184 @@
+"""
+Batch Chat Evaluation
+
+Runs a set of queries through the chat pipeline (domain validation ->
+language detection -> knowledge context -> LLM) without sessions, for
+re-checking answer quality after prompt or model changes. Used by
+`POST /api/chat/batch` and the run_batch.py CLI.
+
+Input is JSONL, one query per line: {"id": "faq-1", "message": "..."}
+(or a bare JSON string). The CPU stages run in bulk, a chunk of queries
+per threadpool hop; LLM calls run with bounded concurrency. Results are
+yielded as they complete, each with per-stage timings, followed by one
+summary record.
+"""
+
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.classification_cache import classification_cache
+from app.services.domain_validator import get_rejection_message
+from app.services.llm_service import llm_service
+
+# Queries classified per threadpool hop
+CLASSIFY_CHUNK = 256
+
+
+@dataclass
+class BatchItem:
+    """One query of a batch."""
+    index: int
+    id: Optional[str]
+    message: str
+    valid: bool = False
+    reason: str = ""
+    language: str = "english"
+    classify_ms: float = 0.0
+
+
+def parse_jsonl(text: str) -> Tuple[List[BatchItem], List[Dict[str, Any]]]:
+    """
+    Parse a JSONL batch.
+
+    Args:
+        text: One JSON object ({"id", "message"}) or string per line;
+            blank lines are skipped
+
+    Returns:
+        Tuple of (items, error records for lines that could not be parsed)
+    """
+    items: List[BatchItem] = []
+    errors: List[Dict[str, Any]] = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append({"type": "error", "line": line_number, "error": f"Invalid JSON: {e.msg}"})
+            continue
+
+        if isinstance(record, str):
+            record = {"message": record}
+        message = record.get("message") if isinstance(record, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            errors.append({"type": "error", "line": line_number, "error": "Missing 'message'"})
+            continue
+
+        item_id = record.get("id")
+        items.append(BatchItem(
+            index=len(items),
+            id=None if item_id is None else str(item_id),
+            message=message,
+        ))
+    return items, errors
+
+
+def classify_items(items: List[BatchItem]) -> None:
+    """Domain validation and language detection for a chunk of items, in place."""
+    for item in items:
+        start = time.perf_counter()
+        item.valid, item.reason, item.language = classification_cache.classify(item.message)
+        item.classify_ms = (time.perf_counter() - start) * 1000
+
+
+async def _answer(item: BatchItem, slots: asyncio.Semaphore, use_cache: bool) -> Dict[str, Any]:
+    """Generate the reply for one classified item."""
+    queued = time.perf_counter()
+    timings = {"classify": round(item.classify_ms, 3), "queue": 0.0, "generate": 0.0}
+
+    if not item.valid:
+        response = get_rejection_message(item.language)
+        outcome = "rejected"
+    else:
+        async with slots:
+            started = time.perf_counter()
+            timings["queue"] = round((started - queued) * 1000, 3)
+            response, _ = await llm_service.agenerate_response(
+                user_message=item.message,
+                language=item.language,
+                use_cache=use_cache,
+            )
+            timings["generate"] = round((time.perf_counter() - started) * 1000, 3)
+        outcome = "error" if llm_service.is_error_response(response) else "accepted"
+
+    return {
+        "type": "result",
+        "index": item.index,
+        "id": item.id,
+        "message": item.message,
+        "language": item.language,
+        "valid": item.valid,
+        "reason": item.reason,
+        "outcome": outcome,
+        "response": response,
+        "timings_ms": timings,
+    }
+
+
+async def run_batch(
+    items: List[BatchItem],
+    concurrency: int,
+    use_cache: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run a batch through the pipeline.
+
+    Args:
+        items: Parsed batch items
+        concurrency: Most LLM calls in flight at once
+        use_cache: Serve repeated queries from the response cache (turn off
+            to evaluate a prompt change)
+
+    Yields:
+        One result record per item in completion order, then a summary
+    """
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    pending = set()
+    outcomes: Dict[str, int] = {}
+    generate_ms: List[float] = []
+
+    def collect(record: Dict[str, Any]) -> Dict[str, Any]:
+        outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+        if record["timings_ms"]["generate"]:
+            generate_ms.append(record["timings_ms"]["generate"])
+        return record
+
+    try:
+        # Classify chunk by chunk so LLM calls start before the whole batch is classified
+        for offset in range(0, len(items), CLASSIFY_CHUNK):
+            chunk = items[offset:offset + CLASSIFY_CHUNK]
+            await run_in_threadpool(classify_items, chunk)
+            pending.update(asyncio.create_task(_answer(item, slots, use_cache)) for item in chunk)
+
+            finished = {task for task in pending if task.done()}
+            pending -= finished
+            for task in finished:
+                yield collect(task.result())
+
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                yield collect(task.result())
+    finally:
+        # Client went away: stop the calls that have not finished
+        for task in pending:
+            task.cancel()
+
+    generate_ms.sort()
+    yield {
+        "type": "summary",
+        "items": len(items),
+        "outcomes": outcomes,
+        "wall_ms": round((time.perf_counter() - started) * 1000, 3),
+        "generate_p50_ms": round(statistics.median(generate_ms), 3) if generate_ms else None,
+        "generate_p95_ms": round(generate_ms[int(0.95 * (len(generate_ms) - 1))], 3) if generate_ms else None,
+    }
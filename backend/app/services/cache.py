@@ -0,0 +1,141 @@
+"""
+Cache Primitives
+
+In-process TTL + LRU cache and an optional shared (Redis-compatible) tier.
+Services build their own caches on top of these; nothing here knows about
+chat, users or the LLM.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries also expire after a TTL.
+
+    Not thread-safe; meant to be used from the event loop of one worker.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class InMemorySharedBackend:
+    """
+    Local stand-in for the shared tier.
+
+    Same async interface as RedisCacheBackend; used for a single worker,
+    scripts and benchmarks where no Redis is available.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=0)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self._cache.set(key, value, ttl_seconds=ttl_seconds)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class RedisCacheBackend:
+    """Shared cache tier backed by any Redis-compatible server."""
+
+    def __init__(self, url: str, prefix: str = "purityprop:"):
+        # Optional dependency: only needed when REDIS_URL is configured
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        await self._redis.set(self.prefix + key, value, ex=max(1, int(ttl_seconds)))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_shared_backend(url: Optional[str]):
+    """
+    Build the shared cache tier from a URL.
+
+    Returns None when no URL is configured. `memory://` gives the local
+    stand-in; anything else is handed to the Redis client.
+    """
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InMemorySharedBackend()
+    try:
+        return RedisCacheBackend(url)
+    except ImportError:
+        print("⚠️ REDIS_URL is set but the 'redis' package is not installed; shared cache disabled")
+        return None
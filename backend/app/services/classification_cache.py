@@ -0,0 +1,161 @@
+"""
+Query Classification Cache
+
+The same short queries ("hi", "stamp duty?", "patta enna") arrive many
+times a day. Domain validation and language detection are memoized per
+normalized query (see normalize_query: NFC, case, whitespace and
+surrounding punctuation), in an LRU bounded by
+CLASSIFICATION_CACHE_MAX_ENTRIES.
+
+A miss classifies the normalized query, not the raw text, so every
+spelling that maps to one key gets the same answer whichever arrived
+first. The empty, length and too-short checks still run on the raw query
+and are never cached.
+
+Shared by the chat routes, LLMService and batch evaluation; the batch
+path classifies from threadpool workers, so access is locked.
+"""
+
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.config import settings
+from app.metrics import CLASSIFICATION_CACHE, CLASSIFICATION_CACHE_SIZE, track_stage
+from app.services.cache import TTLCache
+from app.services.domain_validator import (
+    MAX_QUERY_LENGTH, detect_language, is_real_estate_query, normalize_query
+)
+
+# Entries never expire: a classification only changes with a deploy
+NO_EXPIRY = float("inf")
+
+# Resolved once: a labels() lookup costs as much as a cache hit
+_HITS = CLASSIFICATION_CACHE.labels("hit")
+_MISSES = CLASSIFICATION_CACHE.labels("miss")
+_EVICTIONS = CLASSIFICATION_CACHE.labels("eviction")
+
+
+class Classification(NamedTuple):
+    """Outcome of the request gate; unpacks as (is_valid, reason, language)."""
+    valid: bool
+    reason: str
+    language: str
+
+
+def classify_uncached(query: str) -> Classification:
+    """Domain validation and language detection of one query."""
+    with track_stage("domain_validation"):
+        is_valid, reason = is_real_estate_query(query)
+    with track_stage("language_detection"):
+        language = detect_language(query)
+    return Classification(is_valid, reason, language)
+
+
+def _rejected_raw(query: str) -> bool:
+    """The checks is_real_estate_query makes on the raw text (never cached)."""
+    return not query or len(query) > MAX_QUERY_LENGTH or len(query.lower().strip()) < 3
+
+
+class ClassificationCache:
+    """LRU memo of normalized query -> Classification for one worker."""
+
+    def __init__(self, max_entries: int, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=NO_EXPIRY)
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> Optional[Classification]:
+        """
+        Cached classification of a query, without classifying on a miss.
+
+        Cheap enough for the event loop; callers classify a miss in the
+        threadpool with fill().
+        """
+        if not self.enabled or _rejected_raw(query):
+            return None
+        key = normalize_query(query)
+        with self._lock:
+            result = self._cache.get(key)
+        (_HITS if result is not None else _MISSES).inc()
+        return result
+
+    def fill(self, query: str) -> Classification:
+        """Classify a query that lookup() missed and cache the result."""
+        if not self.enabled or _rejected_raw(query):
+            return classify_uncached(query)
+        key = normalize_query(query)
+        result = classify_uncached(key)
+        self._store(key, result)
+        return result
+
+    def classify(self, query: str) -> Classification:
+        """
+        Classify a query, from the cache when possible.
+
+        Args:
+            query: User's input query
+
+        Returns:
+            Classification (is_valid, reason, language)
+        """
+        result = self.lookup(query)
+        return result if result is not None else self.fill(query)
+
+    def _store(self, key: str, result: Classification) -> None:
+        with self._lock:
+            evictions = self._cache.evictions
+            self._cache.set(key, result)
+            evicted = self._cache.evictions - evictions
+            size = len(self._cache)
+        if evicted:
+            _EVICTIONS.inc(evicted)
+        CLASSIFICATION_CACHE_SIZE.set(size)
+
+    def prewarm(self, path: str) -> int:
+        """
+        Load the most frequent queries of a frequency file.
+
+        Args:
+            path: One "<count><TAB><query>" per line (a line without a tab
+                counts once); blank lines are skipped
+
+        Returns:
+            Number of queries now cached from the file
+        """
+        counts: Dict[str, int] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                count, tab, query = line.partition("\t")
+                if not tab:
+                    count, query = "1", line
+                if _rejected_raw(query):
+                    continue
+                key = normalize_query(query)
+                try:
+                    counts[key] = counts.get(key, 0) + int(count)
+                except ValueError:
+                    continue
+
+        # Least frequent first, so the most frequent end up most recently used
+        top = sorted(counts, key=counts.get, reverse=True)[:self._cache.max_entries]
+        for key in reversed(top):
+            self._store(key, classify_uncached(key))
+        return len(top)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        CLASSIFICATION_CACHE_SIZE.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = self._cache.stats()
+        return {"enabled": self.enabled, **stats}
+
+
+# Global classification cache instance
+classification_cache = ClassificationCache(
+    max_entries=settings.classification_cache_max_entries,
+    enabled=settings.classification_cache_enabled,
+)
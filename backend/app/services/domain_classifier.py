@@ -0,0 +1,143 @@
+"""
+Domain Classifier
+
+Second opinion for queries the keyword gate (domain_validator) cannot
+settle: a logistic regression over hashed character n-grams, trained by
+train_domain_classifier.py on app/data/domain_corpus.tsv.
+
+Character n-grams (2 to 5 characters, word boundaries included) cover
+English, Tanglish spelling variants and Tamil script alike, and hashing
+them into a fixed-size weight vector needs no vocabulary. Inference is a
+few numpy operations, tens of microseconds per query.
+
+The exported model (app/data/domain_classifier.npz) holds the weights,
+the hashing parameters and the decision thresholds chosen at training.
+"""
+
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "domain_classifier.npz")
+
+# Multiplicative hashing constants (64-bit, arithmetic wraps)
+_ROLL = np.uint64(1099511628211)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_features(text: str, bits: int, min_n: int, max_n: int) -> np.ndarray:
+    """
+    Hashed character n-grams of a text.
+
+    Args:
+        text: Normalized query (see domain_validator.normalize_query)
+        bits: log2 of the number of feature buckets
+        min_n: Shortest n-gram
+        max_n: Longest n-gram
+
+    Returns:
+        Sorted unique bucket indices (uint64) of the n-grams present
+    """
+    codes = np.frombuffer(f" {text} ".encode("utf-32-le"), dtype=np.uint32)
+    # Rolling polynomial hash: the hashes of every n-gram at once, each
+    # length extending the previous one by a character
+    h = codes.astype(np.uint64)
+    hashes = [h] if min_n <= 1 else []
+    for n in range(2, max_n + 1):
+        h = h[:-1] * _ROLL + codes[n - 1:]
+        if len(h) == 0:
+            break
+        if n >= min_n:
+            hashes.append(h)
+    if not hashes:
+        return np.zeros(0, dtype=np.uint64)
+    return np.unique((np.concatenate(hashes) * _MIX) >> np.uint64(64 - bits))
+
+
+class DomainClassifier:
+    """Logistic regression over hashed character n-grams."""
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: float,
+        min_n: int,
+        max_n: int,
+        accept_threshold: float,
+        reject_threshold: float,
+    ):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.bits = int(math.log2(len(weights)))
+        self.min_n = min_n
+        self.max_n = max_n
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+
+    def features(self, text: str) -> np.ndarray:
+        return hash_features(text, self.bits, self.min_n, self.max_n)
+
+    def probability(self, text: str) -> float:
+        """
+        Probability that a query is about real estate.
+
+        Args:
+            text: Normalized query (see domain_validator.normalize_query)
+
+        Returns:
+            Probability in [0, 1]
+        """
+        features = self.features(text)
+        if len(features) == 0:
+            return 1.0 / (1.0 + math.exp(-self.bias))
+        # Binary features scaled to unit length
+        score = float(self.weights[features].sum()) / math.sqrt(len(features)) + self.bias
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, score))))
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.float32(self.bias),
+            ngram_range=np.array([self.min_n, self.max_n]),
+            thresholds=np.array([self.accept_threshold, self.reject_threshold]),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "DomainClassifier":
+        with np.load(path) as data:
+            min_n, max_n = (int(n) for n in data["ngram_range"])
+            accept_threshold, reject_threshold = (float(t) for t in data["thresholds"])
+            return cls(
+                weights=data["weights"],
+                bias=float(data["bias"]),
+                min_n=min_n,
+                max_n=max_n,
+                accept_threshold=accept_threshold,
+                reject_threshold=reject_threshold,
+            )
+
+
+def load_domain_classifier() -> Optional[DomainClassifier]:
+    """
+    The configured classifier, or None to use the keyword gate alone.
+
+    A missing or unreadable model disables the second opinion rather than
+    failing startup.
+    """
+    if not settings.domain_classifier_enabled:
+        return None
+    path = settings.domain_classifier_path or DEFAULT_MODEL_PATH
+    try:
+        return DomainClassifier.load(path)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"⚠️ Domain classifier not loaded from {path}: {e}; using keyword rules only")
+        return None
+
+
+# Global classifier instance (None when disabled or missing)
+domain_classifier = load_domain_classifier()
@@ -6,7 +6,12 @@ Rejects non-real estate questions politely.
 """
 
 import re
-from typing import Tuple
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from app.metrics import DOMAIN_CLASSIFIER
+from app.services.domain_classifier import domain_classifier
 
 
 # Real estate keywords (English, Tamil, Tanglish)
@@ -43,6 +48,27 @@ REAL_ESTATE_KEYWORDS = [
     'சென்ட்', 'ஏக்கர்', 'சதுர அடி'
 ]
 
+# Keywords that also turn up outside real estate: everyday words, place
+# names, substrings of unrelated words ('rate' in 'separate', 'cent' in
+# 'percent', 'acre' in 'sacred') and Tanglish/Tamil words with other senses
+# ('vaanga' is also 'come'). A query matching only these is ambiguous and
+# gets a second opinion from the domain classifier.
+AMBIGUOUS_KEYWORDS = [
+    'buy', 'sell', 'purchase', 'sale', 'registration', 'registration fee',
+    'document', 'documents', 'papers', 'loan', 'bank loan', 'emi',
+    'investment', 'construction', 'building', 'commercial', 'builder',
+    'developer', 'home', 'house', 'land', 'plot', 'flat',
+    'cent', 'cents', 'acre', 'acres', 'ground', 'grounds',
+    'area', 'location', 'locality', 'neighborhood', 'near', 'nearby',
+    'price', 'rate', 'cost', 'value', 'worth', 'budget',
+    'chennai', 'coimbatore', 'madurai', 'salem', 'trichy', 'tirupur',
+    'erode', 'vellore', 'thoothukudi', 'dindigul', 'thanjavur',
+    'nagar', 'puram', 'colony', 'street', 'road', 'avenue',
+    'vidu', 'vaanga', 'vanga', 'vikka', 'vaangu', 'vilai', 'vilay',
+    'pathivu', 'pativu', 'kadan', 'vatti',
+    'வாங்க', 'விற்க', 'பதிவு', 'கடன்', 'வங்கி',
+]
+
 # Non-real estate indicators
 NON_REAL_ESTATE_INDICATORS = [
     'poem', 'story', 'joke', 'recipe', 'weather', 'movie', 'song',
@@ -52,58 +78,182 @@ NON_REAL_ESTATE_INDICATORS = [
 ]
 
 
+def _compile_keyword_pattern(keywords: List[str]) -> "re.Pattern[str]":
+    """
+    Compile keywords into one regex shaped like a trie.
+    
+    Shared prefixes are factored out ('cent', 'cents' -> 'cent(?:s)?'), so a
+    search tests each query position against the trie once instead of
+    retrying every keyword: a single pass over the query, in C.
+    
+    Args:
+        keywords: Literal substrings to match (already lowercased)
+        
+    Returns:
+        Compiled pattern matching any of the keywords
+    """
+    trie: dict = {}
+    for word in keywords:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ends here but longer ones continue: the rest is optional
+        return f"(?:{body})?" if "" in node else body
+    
+    return re.compile(build(trie))
+
+
+# Compiled once at import; matching is case-insensitive via query.lower()
+_NON_REAL_ESTATE_RE = _compile_keyword_pattern([word.lower() for word in NON_REAL_ESTATE_INDICATORS])
+_REAL_ESTATE_KEYWORD_RE = _compile_keyword_pattern(
+    sorted({keyword.lower() for keyword in REAL_ESTATE_KEYWORDS})
+)
+_CLEAR_KEYWORD_RE = _compile_keyword_pattern(
+    sorted({keyword.lower() for keyword in REAL_ESTATE_KEYWORDS}
+           - {keyword.lower() for keyword in AMBIGUOUS_KEYWORDS})
+)
+
+# Common real estate question patterns
+REAL_ESTATE_PATTERNS = [
+    r'(how|what|where|when|which|why).*(buy|purchase|sell|register)',
+    r'(documents?|papers?).*(need|require|necessary)',
+    r'(process|procedure|steps).*(buy|sell|register)',
+    r'(loan|finance|bank).*(property|house|home)',
+    r'(stamp duty|registration fee|charges)',
+    r'(tnrera|rera|dtcp|cmda)',
+]
+# Kept as separate compiled patterns: each keeps its own literal-prefix
+# scan, which a single combined alternation would lose
+_REAL_ESTATE_PATTERN_RES = tuple(re.compile(pattern) for pattern in REAL_ESTATE_PATTERNS)
+
+
 # Maximum allowed query length to prevent Regex DoS
 MAX_QUERY_LENGTH = 1000
 
-def is_real_estate_query(query: str) -> Tuple[bool, str]:
+def keyword_verdict(query: str) -> Tuple[bool, str, str]:
     """
-    Determine if a query is related to real estate.
+    The rule-based gate on its own: length checks, indicators, keywords
+    and question patterns.
     
     Args:
         query: User's input query
         
     Returns:
-        Tuple of (is_valid, reason)
+        Tuple of (is_valid, reason, evidence); evidence is 'clear' when the
+        rules settle the query, 'weak' when only ambiguous keywords or
+        question patterns matched, and 'none' when nothing did
     """
     if not query:
-        return False, "Empty query"
+        return False, "Empty query", "clear"
 
     # 1. Length Check (DoS Protection)
     if len(query) > MAX_QUERY_LENGTH:
-        return False, "Query too long"
+        return False, "Query too long", "clear"
         
     query_lower = query.lower().strip()
     
     # Check if query is too short
     if len(query_lower) < 3:
-        return False, "Query too short"
+        return False, "Query too short", "clear"
     
     # Check for non-real estate indicators first
-    for indicator in NON_REAL_ESTATE_INDICATORS:
-        if indicator in query_lower:
-            return False, f"Non-real estate topic detected: {indicator}"
+    if _NON_REAL_ESTATE_RE.search(query_lower):
+        # Report the first indicator in list order, as callers expect
+        for indicator in NON_REAL_ESTATE_INDICATORS:
+            if indicator in query_lower:
+                return False, f"Non-real estate topic detected: {indicator}", "clear"
     
     # Check for real estate keywords
-    for keyword in REAL_ESTATE_KEYWORDS:
-        if keyword.lower() in query_lower:
-            return True, "Real estate keyword found"
+    if _REAL_ESTATE_KEYWORD_RE.search(query_lower):
+        evidence = "clear" if _CLEAR_KEYWORD_RE.search(query_lower) else "weak"
+        return True, "Real estate keyword found", evidence
     
     # Check for common real estate question patterns
-    real_estate_patterns = [
-        r'(how|what|where|when|which|why).*(buy|purchase|sell|register)',
-        r'(documents?|papers?).*(need|require|necessary)',
-        r'(process|procedure|steps).*(buy|sell|register)',
-        r'(loan|finance|bank).*(property|house|home)',
-        r'(stamp duty|registration fee|charges)',
-        r'(tnrera|rera|dtcp|cmda)',
-    ]
+    for pattern in _REAL_ESTATE_PATTERN_RES:
+        if pattern.search(query_lower):
+            return True, "Real estate pattern matched", "weak"
+    
+    # No clear indicators: ambiguous
+    return False, "No clear real estate context", "none"
+
+
+def is_real_estate_query(query: str) -> Tuple[bool, str]:
+    """
+    Determine if a query is related to real estate.
+    
+    The keyword rules decide on their own when they are clear. Otherwise
+    the domain classifier, if loaded, can overturn them: it rejects a query
+    that only matched ambiguous keywords ('gold rate today') and accepts one
+    without any keyword ('what is adangal') when it is confident enough.
+    
+    Args:
+        query: User's input query
+        
+    Returns:
+        Tuple of (is_valid, reason)
+    """
+    is_valid, reason, evidence = keyword_verdict(query)
+    if evidence == "clear" or domain_classifier is None:
+        return is_valid, reason
+    
+    probability = domain_classifier.probability(normalize_query(query))
+    if evidence == "weak" and probability <= domain_classifier.reject_threshold:
+        DOMAIN_CLASSIFIER.labels("rejected").inc()
+        return False, "Classifier: no real estate context"
+    if evidence == "none" and probability >= domain_classifier.accept_threshold:
+        DOMAIN_CLASSIFIER.labels("accepted").inc()
+        return True, "Classifier: real estate context"
+    DOMAIN_CLASSIFIER.labels("kept").inc()
+    return is_valid, reason
+
+
+# Space and the ASCII punctuation characters (Unicode category P), stripped
+# in one C call before the per-character check
+_ASCII_EDGE_JUNK = " " + "".join(
+    char for char in map(chr, range(128)) if unicodedata.category(char)[0] == "P"
+)
+
+
+def _is_edge_junk(char: str) -> bool:
+    return char == " " or unicodedata.category(char)[0] == "P"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for use as a cache key.
     
-    for pattern in real_estate_patterns:
-        if re.search(pattern, query_lower):
-            return True, "Real estate pattern matched"
+    Applies Unicode NFC (Tamil text can arrive decomposed), lowercases,
+    collapses runs of whitespace and trims whitespace and punctuation from
+    both ends. Punctuation inside the query is kept: keywords such as
+    'sq.ft' and 'sub-registrar' depend on it.
     
-    # If no clear indicators, it's ambiguous - reject to be safe
-    return False, "No clear real estate context"
+    Args:
+        query: User's input query
+        
+    Returns:
+        Normalized query string
+    """
+    # ASCII is always NFC; the check is far cheaper than normalizing
+    text = query if query.isascii() else unicodedata.normalize("NFC", query)
+    text = " ".join(text.lower().split()).strip(_ASCII_EDGE_JUNK)
+    if not text or (text[0].isalnum() and text[-1].isalnum()):
+        return text
+    
+    # Tamil vowel signs are not alphanumeric, so trim by Unicode category
+    # rather than with \W
+    start, end = 0, len(text)
+    while start < end and _is_edge_junk(text[start]):
+        start += 1
+    while end > start and _is_edge_junk(text[end - 1]):
+        end -= 1
+    return text[start:end]
 
 
 def get_rejection_message(language: str = "english") -> str:
@@ -152,9 +302,127 @@ def get_rejection_message(language: str = "english") -> str:
     return messages.get(language, messages["english"])
 
 
+# Common Tamil words written in English that are unlikely to appear in pure
+# English; each group counts once, however many of its spellings occur
+TANGLISH_WORD_GROUPS = [
+    ('veedu', 'vidu'),  # house
+    ('vaanga', 'vanga'),  # buy
+    ('enna', 'yenna'),  # what
+    ('epdi', 'eppadi', 'yeppadi'),  # how
+    ('venum', 'vendum'),  # need/want
+    ('panna', 'pannu'),  # do/make
+    ('irukku', 'iruku'),  # is/are
+    ('sollu', 'sollunga'),  # tell/say
+    ('kudukka', 'kudu'),  # give
+    ('nalla', 'nalladhu'),  # good
+    ('illa', 'illai'),  # no/not
+    ('aana', 'ana'),  # but
+    ('naan', 'nan'),  # I
+    ('nee', 'neenga'),  # you
+    ('avaru', 'avar'),  # he/she/they
+]
+
+# Tanglish postpositions following a word: "Chennai la", "bank ku", "avar oda"
+TANGLISH_SUFFIXES = ('la', 'ku', 'oda', 'ah')
+
+_TANGLISH_WORD_GROUP = {
+    word: index
+    for index, group in enumerate(TANGLISH_WORD_GROUPS)
+    for word in group
+}
+
+# One scan finds Tamil-script runs, Tanglish words and Tanglish suffixes.
+# The suffix branch looks behind for the preceding word character instead
+# of consuming it, so a word match never hides a following suffix.
+_LANGUAGE_SCAN_RE = re.compile(
+    r'(?P<tamil>[\u0B80-\u0BFF]+)'
+    r'|\b(?P<word>' + '|'.join(word for group in TANGLISH_WORD_GROUPS for word in group) + r')\b'
+    r'|(?<=\w)\s+(?P<suffix>' + '|'.join(TANGLISH_SUFFIXES) + r')\b'
+)
+
+
+@dataclass(frozen=True)
+class LanguageResult:
+    """
+    Outcome of language detection.
+    
+    Attributes:
+        label: 'tamil', 'tanglish' or 'english'
+        scores: Evidence strength per language, each in [0, 1]
+        counts: Raw counts behind the scores (tamil_chars, tanglish_words,
+            tanglish_suffixes)
+    """
+    label: str
+    scores: Dict[str, float]
+    counts: Dict[str, int]
+
+
+def detect_language_result(text: str) -> LanguageResult:
+    """
+    Detect language from text in a single pass, with per-language scores.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        LanguageResult with the label and the evidence behind it
+    """
+    tamil_chars = 0
+    word_groups = set()
+    suffixes = 0
+    
+    for match in _LANGUAGE_SCAN_RE.finditer(text.lower()):
+        kind = match.lastgroup
+        if kind == 'tamil':
+            tamil_chars += match.end() - match.start()
+        elif kind == 'word':
+            word_groups.add(_TANGLISH_WORD_GROUP[match.group('word')])
+        else:
+            suffixes += 1
+    
+    tanglish_words = len(word_groups)
+    
+    # More than 3 Tamil-script characters means Tamil; otherwise any
+    # Tanglish word or suffix means Tanglish; default to English
+    if tamil_chars > 3:
+        label = "tamil"
+    elif tanglish_words or suffixes:
+        label = "tanglish"
+    else:
+        label = "english"
+    
+    tamil_score = min(1.0, tamil_chars / 4)
+    tanglish_score = min(1.0, (tanglish_words + min(suffixes, 1)) / 2)
+    scores = {
+        "tamil": tamil_score,
+        "tanglish": tanglish_score,
+        "english": 1.0 - max(tamil_score, tanglish_score),
+    }
+    counts = {
+        "tamil_chars": tamil_chars,
+        "tanglish_words": tanglish_words,
+        "tanglish_suffixes": suffixes,
+    }
+    return LanguageResult(label=label, scores=scores, counts=counts)
+
+
+def detect_languages(texts: Iterable[str]) -> List[LanguageResult]:
+    """
+    Detect the language of many texts (batch evaluation, benchmarks).
+    
+    Args:
+        texts: Input texts
+        
+    Returns:
+        One LanguageResult per text, in order
+    """
+    detect = detect_language_result
+    return [detect(text) for text in texts]
+
+
 def detect_language(text: str) -> str:
     """
-    Detect language from text with improved accuracy.
+    Detect language from text.
     
     Args:
         text: Input text
@@ -162,58 +430,4 @@ def detect_language(text: str) -> str:
     Returns:
         Language code: 'tamil', 'tanglish', or 'english'
     """
-    # Check for Tamil script (Unicode range for Tamil)
-    tamil_chars = re.findall(r'[\u0B80-\u0BFF]', text)
-    if len(tamil_chars) > 3:
-        return "tamil"
-    
-    # Improved Tanglish detection using word boundaries
-    # These are common Tamil words written in English that are unlikely to appear in pure English
-    tanglish_patterns = [
-        r'\b(veedu|vidu)\b',  # house
-        r'\b(vaanga|vanga)\b',  # buy
-        r'\b(enna|yenna)\b',  # what
-        r'\b(epdi|eppadi|yeppadi)\b',  # how
-        r'\b(venum|vendum)\b',  # need/want
-        r'\b(panna|pannu)\b',  # do/make
-        r'\b(irukku|iruku)\b',  # is/are
-        r'\b(sollu|sollunga)\b',  # tell/say
-        r'\b(kudukka|kudu)\b',  # give
-        r'\b(nalla|nalladhu)\b',  # good
-        r'\b(illa|illai)\b',  # no/not
-        r'\b(aana|ana)\b',  # but
-        r'\b(naan|nan)\b',  # I
-        r'\b(nee|neenga)\b',  # you
-        r'\b(avaru|avar)\b',  # he/she/they
-    ]
-    
-    # Check for Tanglish patterns with word boundaries
-    text_lower = text.lower()
-    tanglish_matches = 0
-    for pattern in tanglish_patterns:
-        if re.search(pattern, text_lower):
-            tanglish_matches += 1
-    
-    # If we find 2 or more Tanglish words, it's likely Tanglish
-    if tanglish_matches >= 2:
-        return "tanglish"
-    
-    # Check for common Tanglish suffixes (Chennai la, bank ku, etc.)
-    # Only match if preceded by a word character
-    tanglish_suffix_patterns = [
-        r'\w+\s+la\b',  # Chennai la, bank la
-        r'\w+\s+ku\b',  # veedu ku, property ku
-        r'\w+\s+oda\b',  # avar oda, naan oda
-        r'\w+\s+ah\b',  # nalla ah, romba ah
-    ]
-    
-    for pattern in tanglish_suffix_patterns:
-        if re.search(pattern, text_lower):
-            tanglish_matches += 1
-    
-    # If we have at least 1 strong Tanglish indicator, classify as Tanglish
-    if tanglish_matches >= 1:
-        return "tanglish"
-    
-    # Default to English for pure English queries
-    return "english"
+    return detect_language_result(text).label
@@ -0,0 +1,421 @@
+"""
+Deterministic Fast-Path Answers
+
+Some questions have exactly one correct answer that the knowledge base
+already holds: land-unit conversions ("how many sqft in 3 cents") and
+stamp duty / registration fee for a property value ("stamp duty for a 60
+lakh flat"). These are parsed with rules, computed from the factors in
+TN_KNOWLEDGE_BASE and answered from templates in the user's language,
+without an LLM call.
+
+The parser is deliberately conservative: anything it does not fully
+understand (several quantities, price questions, women's concession,
+other deed types, places outside Tamil Nadu, a second question or clause,
+unrecognised words) returns None and the query goes to the LLM as before.
+Fee answers tolerate no unrecognised word at all, since the rates are
+Tamil Nadu's; a Tamil Nadu place name is the only location they accept.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import FAST_ANSWERS
+from app.services.tn_knowledge_base import TN_KNOWLEDGE_BASE
+
+# Unrecognised words tolerated in a conversion query before it counts as
+# ambiguous (fee queries tolerate none)
+MAX_UNKNOWN_WORDS = 2
+
+
+# ---------------- FACTORS (from the knowledge base) ---------------- #
+
+def _number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _load_area_factors() -> Dict[str, float]:
+    """Square feet per unit, parsed from the KB conversion strings."""
+    units = TN_KNOWLEDGE_BASE["measurement_units"]
+    factors = {"sqft": 1.0}
+    for unit in ("cent", "ground", "acre", "gunta"):
+        match = re.search(r"=\s*([\d,.]+)\s*square feet", units[unit]["conversion"])
+        factors[unit] = _number(match.group(1))
+    # 1 cent = 435.6 square feet = 40.47 square meters
+    match = re.search(r"=\s*([\d,.]+)\s*square met", units["cent"]["conversion"])
+    factors["sqm"] = factors["cent"] / _number(match.group(1))
+    return factors
+
+
+def _load_fee_rates() -> Tuple[float, float, float, float]:
+    """
+    (stamp duty rate, value in ₹ the rate applies above, registration fee
+    rate, registration fee cap in ₹).
+    """
+    fees = TN_KNOWLEDGE_BASE["stamp_duty_registration"]
+    stamp_rate = _number(re.search(r"([\d.]+)%", fees["stamp_duty"]).group(1)) / 100
+    # "7% of property value (for properties above ₹50 lakhs in urban areas)"
+    above_lakh = _number(re.search(r"above\s*₹\s*([\d.]+)\s*lakh", fees["stamp_duty"]).group(1))
+    registration_rate = _number(re.search(r"([\d.]+)%", fees["registration_fee"]).group(1)) / 100
+    cap_lakh = _number(re.search(r"maximum\s*₹\s*([\d.]+)\s*lakh", fees["registration_fee"]).group(1))
+    return stamp_rate, above_lakh * 100_000, registration_rate, cap_lakh * 100_000
+
+
+SQFT_PER_UNIT = _load_area_factors()
+STAMP_DUTY_RATE, STAMP_DUTY_MIN_VALUE, REGISTRATION_FEE_RATE, REGISTRATION_FEE_CAP = _load_fee_rates()
+
+
+# ---------------- PARSING ---------------- #
+
+_NUMBER = r"\d+(?:,\d+)*(?:\.\d+)?|\.\d+"
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "oru": 1, "ஒரு": 1, "ஒன்று": 1,
+    "half": 0.5, "arai": 0.5, "அரை": 0.5,
+    "two": 2, "rendu": 2, "irandu": 2, "இரண்டு": 2,
+    "three": 3, "moonu": 3, "munu": 3, "மூன்று": 3,
+    "four": 4, "naalu": 4, "nalu": 4, "நான்கு": 4,
+    "five": 5, "anju": 5, "ainthu": 5, "ஐந்து": 5,
+    "ten": 10, "pathu": 10, "பத்து": 10,
+}
+
+# Latin aliases end at a word boundary; Tamil aliases take the rest of the
+# word, since case suffixes are written joined (சென்ட்டில், ஏக்கருக்கு)
+_LATIN_BOUNDARY = r"(?![a-z])"
+_UNIT_ALIASES = {
+    "sqm": (r"sq\.?\s?(?:mtrs?|mts?|meters?|metres?|m)\.?" + _LATIN_BOUNDARY
+            + r"|sqm" + _LATIN_BOUNDARY + r"|square\s+(?:meters?|metres?|mtrs?|m)" + _LATIN_BOUNDARY
+            + r"|சதுர\s*(?:மீட்டர்|மீ)\S*"),
+    "sqft": (r"sq\.?\s?(?:ft|feet|foot)\.?" + _LATIN_BOUNDARY
+             + r"|sqft|sft|square\s+(?:feet|foot|ft)" + _LATIN_BOUNDARY
+             + r"|(?:sathura|sadhura|sathuram)\s+adi" + _LATIN_BOUNDARY
+             + r"|சதுர\s*அடி\S*"),
+    "cent": r"cents?" + _LATIN_BOUNDARY + r"|centu" + _LATIN_BOUNDARY + r"|சென்ட\S*",
+    "ground": r"grounds?" + _LATIN_BOUNDARY + r"|grownds?" + _LATIN_BOUNDARY + r"|கிர(?:வு|ௌ)ண்ட\S*",
+    "acre": r"acres?" + _LATIN_BOUNDARY + r"|ekk?ars?" + _LATIN_BOUNDARY + r"|ஏக்கர\S*",
+    "gunta": r"gunt(?:h)?as?" + _LATIN_BOUNDARY + r"|குண்டா\S*|குன்டா\S*",
+}
+_UNIT = "|".join(f"(?P<{unit}>{alias})" for unit, alias in _UNIT_ALIASES.items())
+
+_QUANTITY_RE = re.compile(
+    rf"(?<![\w.])(?P<qty>{_NUMBER}|{'|'.join(map(re.escape, _NUMBER_WORDS))})\s*-?\s*(?:{_UNIT})"
+)
+_UNIT_RE = re.compile(rf"(?<![a-z])(?:{_UNIT})")
+
+_FEE_RE = re.compile(
+    r"stamp\s*dut(?:y|ies)|stamp\s+paper|registration\s+(?:fees?|charges?|cost|expenses?)"
+    r"|reg(?:istration)?\.?\s+fees?|muthirai|muththirai|pathivu\s+(?:kattanam|fees?|charges?)"
+    r"|முத்திரை\S*|பதிவு\s*கட்டண\S*"
+)
+_AMOUNT_RE = re.compile(
+    rf"(?P<prefix>₹|rs\.?|inr|rupees?)?\s*(?P<number>{_NUMBER})\s*"
+    r"(?P<scale>lakhs?|lacs?|laksh?|l|crores?|cr|k|லட்ச\S*|கோடி\S*)?(?![a-z\d])"
+)
+# Keyed by the first two characters of the scale word
+_SCALES = {"l": 100_000, "la": 100_000, "k": 1_000, "cr": 10_000_000, "லட": 100_000, "கோ": 10_000_000}
+
+# Places outside Tamil Nadu: the fee rates are Tamil Nadu's, and units such
+# as the ground and the gunta differ between states
+_OTHER_REGIONS = (
+    r"\b(?:andhra|telangana|karnataka|kerala|keralam|puducherry|pondicherry|pondy|karaikal|goa"
+    r"|maharashtra|gujarat|rajasthan|punjab|haryana|delhi|odisha|orissa|bihar|bengal|assam"
+    r"|uttar|madhya|jharkhand|chhattisgarh|himachal|uttarakhand|kashmir"
+    r"|bangalore|bengaluru|mysore|mysuru|mangalore|hyderabad|secunderabad|vijayawada"
+    r"|visakhapatnam|vizag|tirupati|nellore|kochi|cochin|trivandrum|thiruvananthapuram"
+    r"|kozhikode|calicut|palakkad|thrissur|mumbai|bombay|pune|kolkata|calcutta|ahmedabad"
+    r"|noida|gurgaon|gurugram|other\s+states?|outside|abroad)\b"
+    r"|கர்நாடக|கேரள|புதுச்சேரி|பாண்டிச்சேரி|ஆந்திர|தெலங்கானா|பெங்களூ|மும்பை|ஹைதராபாத்|டெல்லி"
+)
+# A second question or clause ("is 3 cents enough for a house? how many
+# sqft") asks for more than the template answers
+_SECOND_CLAUSE = (
+    r"[?!;]\s*\S|\n"
+    r"|\b(?:but|also|or|then|because|if|whether|enough|should|which|why|when|where|who"
+    r"|better|best|suitable|allowed|possible)\b"
+)
+
+# Queries mentioning these need judgement, not arithmetic
+_CONVERSION_BLOCKERS = re.compile(
+    r"price|rate|cost|value|worth|lakh|crore|₹|\brs\b|rupee|guideline|vilai|விலை|மதிப்பு|ரூபா"
+    rf"|{_OTHER_REGIONS}|{_SECOND_CLAUSE}"
+)
+_FEE_BLOCKERS = re.compile(
+    r"wom[ae]n|lady|ladies|female|wife|mother|daughter|\bpen\b|ponnu|penn|பெண்|மனைவி"
+    r"|gift|settlement|\blease|\brent|mortgage|partition|release|agreement|power|\bpoa\b|\bwill\b"
+    r"|dhan|தான|செட்டில்|குத்தகை|அடமான|%|percent|sq|cent|ground|acre|சதுர|சென்ட|ஏக்கர"
+    rf"|{_OTHER_REGIONS}|{_SECOND_CLAUSE}"
+)
+# Tamil Nadu place names, the only locations a fee query may mention
+_TN_PLACE_RE = re.compile(
+    r"\b(?:tamil\s*nadu|tn|chennai|madras|coimbatore|kovai|madurai|trichy|tiruchirappalli|salem"
+    r"|tirunelveli|nellai|erode|vellore|thoothukudi|tuticorin|tiruppur|tirupur|thanjavur|tanjore"
+    r"|kanchipuram|kancheepuram|chengalpattu|tiruvallur|hosur|krishnagiri|dharmapuri|namakkal"
+    r"|karur|dindigul|cuddalore|villupuram|nagercoil|kanyakumari|tambaram|avadi|ooty)\b"
+    r"|தமிழ்நாட\S*|தமிழக\S*|சென்னை\S*|கோவை\S*|கோயம்புத்தூ\S*|மதுரை\S*|திருச்சி\S*"
+    r"|சேலம்\S*|திருநெல்வேலி\S*|ஈரோ\S*|வேலூ\S*|தஞ்சா\S*|திருப்பூ\S*"
+)
+
+_FILLER_WORDS = frozenset("""
+    how many much what is are was the a an of in into to for from me my our please pls plz tell
+    calculate calc convert conversion converted equals equal equivalent eq there will be per
+    give show find exactly approx approximately about total and do does i we it this that
+    need pay have has on at with be by can you fee fees charge charges duty stamp current latest
+    evlo evvalavu evalavu ethana ethanai ethanaiyum enna la le ku kku ukku na naa nu irukku iruku
+    irukum aagum agum aaguma varum vanthu sollunga sollu sollungal solunga kattanum
+    kattanam katta pannanum koodu vendum venum
+    land plot site property flat house apartment villa home building veedu vidu veetu manai nilam
+    buy buying purchase purchasing sale selling registration register registering
+    எத்தனை எவ்வளவு என்ன ஒரு இல் க்கு ஆகும் சமம் மாற்று மாற்றவும் சொல்லுங்கள் உள்ளது இருக்கும்
+    நிலம் நிலத்துக்கு நிலத்திற்கு மனை மனைக்கு வீடு வீட்டுக்கு வீட்டிற்கு சொத்து சொத்துக்கு
+    சொத்திற்கு பிளாட் பிளாட்டுக்கு வாங்க வாங்கும் பதிவு கட்டணம் செலுத்த வேண்டும் தேவை கட்ட
+""".split())
+_WORD_RE = re.compile(r"[^\s\d.,?!=:;()/\-₹'\"]+")
+
+
+def _unit_of(match: re.Match) -> str:
+    return next(unit for unit in _UNIT_ALIASES if match.group(unit))
+
+
+def _parse_quantity(text: str) -> float:
+    return _NUMBER_WORDS.get(text) or _number(text)
+
+
+def _unknown_words(text: str, spans: List[Tuple[int, int]]) -> int:
+    """Count words outside the matched spans that are not in the vocabulary."""
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    return sum(1 for word in _WORD_RE.findall(text) if word not in _FILLER_WORDS)
+
+
+def parse_conversion(text: str) -> Optional[Tuple[float, str, List[str]]]:
+    """
+    Parse a unit-conversion question.
+
+    Args:
+        text: Lower-cased user message
+
+    Returns:
+        (quantity, source unit, target units), or None if the query is not
+        an unambiguous conversion
+    """
+    if _CONVERSION_BLOCKERS.search(text):
+        return None
+
+    quantities = list(_QUANTITY_RE.finditer(text))
+    if len(quantities) != 1:
+        return None
+    quantity_match = quantities[0]
+    source = _unit_of(quantity_match)
+    quantity = _parse_quantity(quantity_match.group("qty"))
+    if quantity <= 0:
+        return None
+
+    spans = [quantity_match.span()]
+    targets: List[str] = []
+    for match in _UNIT_RE.finditer(text):
+        if quantity_match.start() <= match.start() < quantity_match.end():
+            continue
+        spans.append(match.span())
+        unit = _unit_of(match)
+        if unit != source and unit not in targets:
+            targets.append(unit)
+
+    if not targets or _unknown_words(text, spans) > MAX_UNKNOWN_WORDS:
+        return None
+    return quantity, source, targets
+
+
+def parse_fee_amount(text: str) -> Optional[float]:
+    """
+    Parse a stamp duty / registration fee question.
+
+    Args:
+        text: Lower-cased user message
+
+    Returns:
+        The property value in rupees, or None if the query is not an
+        unambiguous fee calculation
+    """
+    fee_mentions = list(_FEE_RE.finditer(text))
+    if not fee_mentions or _FEE_BLOCKERS.search(text):
+        return None
+
+    amounts = []
+    for match in _AMOUNT_RE.finditer(text):
+        value = _number(match.group("number"))
+        scale = match.group("scale")
+        if scale:
+            value *= _SCALES[scale[:2]]
+        elif not match.group("prefix") and value < 100_000:
+            # A bare small number ("for 60") is not a property value
+            return None
+        amounts.append((value, match.span()))
+
+    if len(amounts) != 1 or amounts[0][0] < 10_000:
+        return None
+    spans = [span for _, span in amounts] + [match.span() for match in fee_mentions]
+    spans += [match.span() for match in _TN_PLACE_RE.finditer(text)]
+    if _unknown_words(text, spans):
+        return None
+    return amounts[0][0]
+
+
+# ---------------- RENDERING ---------------- #
+
+UNIT_NAMES = {
+    # unit: (english singular, english plural, tamil)
+    "sqft": ("sq ft", "sq ft", "சதுர அடி"),
+    "sqm": ("sq m", "sq m", "சதுர மீட்டர்"),
+    "cent": ("cent", "cents", "சென்ட்"),
+    "ground": ("ground", "grounds", "கிரவுண்ட்"),
+    "acre": ("acre", "acres", "ஏக்கர்"),
+    "gunta": ("gunta", "guntas", "குண்டா"),
+}
+
+CONVERSION_NOTES = {
+    "english": "Based on the standard Tamil Nadu land measurement units.",
+    "tanglish": "Tamil Nadu standard land measurement units padi calculate pannadhu.",
+    "tamil": "தமிழ்நாட்டின் நிலையான நில அளவை அலகுகளின்படி கணக்கிடப்பட்டது.",
+}
+
+FEE_TEMPLATES = {
+    "english": (
+        "For a property value of ₹{value} ({words}):\n"
+        "• Stamp duty ({stamp_rate}, urban property above ₹{stamp_above}): ₹{stamp}\n"
+        "• Registration fee ({registration_rate}, maximum ₹{cap}): ₹{registration}\n"
+        "• Total: ₹{total}\n\n"
+        "Both are calculated on the guideline value or the transaction value, whichever is higher. "
+        "Please confirm the current rates at the Sub-Registrar Office before registration."
+    ),
+    "tanglish": (
+        "₹{value} ({words}) property ku:\n"
+        "• Stamp duty ({stamp_rate}, ₹{stamp_above} mela urban property ku): ₹{stamp}\n"
+        "• Registration fee ({registration_rate}, maximum ₹{cap}): ₹{registration}\n"
+        "• Total: ₹{total}\n\n"
+        "Guideline value illa transaction value, edhu adhigamo adha vachu dhaan calculate pannuvanga. "
+        "Registration ku munnadi Sub-Registrar office la current rates confirm pannikonga."
+    ),
+    "tamil": (
+        "₹{value} ({words}) மதிப்புள்ள சொத்துக்கு:\n"
+        "• முத்திரைத் தீர்வை ({stamp_rate}, ₹{stamp_above}-ஐ விட அதிக மதிப்புள்ள நகர்ப்புறச் சொத்து): ₹{stamp}\n"
+        "• பதிவுக் கட்டணம் ({registration_rate}, அதிகபட்சம் ₹{cap}): ₹{registration}\n"
+        "• மொத்தம்: ₹{total}\n\n"
+        "வழிகாட்டி மதிப்பு அல்லது பரிவர்த்தனை மதிப்பு, இவற்றில் எது அதிகமோ அதன் அடிப்படையில் கணக்கிடப்படும். "
+        "பதிவுக்கு முன் சார்பதிவாளர் அலுவலகத்தில் தற்போதைய விகிதங்களை உறுதிப்படுத்திக் கொள்ளுங்கள்."
+    ),
+}
+
+_SCALE_WORDS = {
+    "english": ("lakh", "crore"),
+    "tanglish": ("lakh", "crore"),
+    "tamil": ("லட்சம்", "கோடி"),
+}
+
+
+def format_indian(value: float) -> str:
+    """Format a number with Indian digit grouping (12,34,567.5)."""
+    if 0 < abs(value) < 0.01:
+        # Four significant digits, without scientific notation
+        return f"{value:.{3 - math.floor(math.log10(abs(value)))}f}"
+    whole, _, fraction = f"{abs(value):.2f}".partition(".")
+    fraction = fraction.rstrip("0")
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        whole = ",".join([head] + groups + [tail]) if head else ",".join(groups + [tail])
+    sign = "-" if value < 0 else ""
+    return f"{sign}{whole}.{fraction}" if fraction else f"{sign}{whole}"
+
+
+def _amount_in_words(value: float, language: str) -> str:
+    lakh, crore = _SCALE_WORDS.get(language, _SCALE_WORDS["english"])
+    if value >= 10_000_000:
+        return f"{format_indian(value / 10_000_000)} {crore}"
+    if value >= 100_000:
+        return f"{format_indian(value / 100_000)} {lakh}"
+    return format_indian(value)
+
+
+def _unit_name(unit: str, quantity: float, language: str) -> str:
+    singular, plural, tamil = UNIT_NAMES[unit]
+    if language == "tamil":
+        return tamil
+    return singular if quantity == 1 else plural
+
+
+def _percent(rate: float) -> str:
+    return f"{format_indian(rate * 100)}%"
+
+
+def render_conversion(quantity: float, source: str, targets: List[str], language: str) -> str:
+    """Templated answer for a parsed conversion."""
+    lines = []
+    for target in targets:
+        result = quantity * SQFT_PER_UNIT[source] / SQFT_PER_UNIT[target]
+        lines.append(f"{format_indian(quantity)} {_unit_name(source, quantity, language)} = "
+                     f"{format_indian(result)} {_unit_name(target, result, language)}")
+    for target in targets:
+        # State the factor from the larger unit, unless the answer already is it
+        larger, smaller = sorted((source, target), key=SQFT_PER_UNIT.get, reverse=True)
+        if quantity == 1 and larger == source:
+            continue
+        factor = SQFT_PER_UNIT[larger] / SQFT_PER_UNIT[smaller]
+        lines.append(f"(1 {_unit_name(larger, 1, language)} = "
+                     f"{format_indian(factor)} {_unit_name(smaller, factor, language)})")
+    note = CONVERSION_NOTES.get(language, CONVERSION_NOTES["english"])
+    return "\n".join(lines) + f"\n\n{note}"
+
+
+def render_fees(value: float, language: str) -> str:
+    """
+    Templated stamp duty and registration fee breakdown for a property value.
+
+    Only valid above STAMP_DUTY_MIN_VALUE, where the knowledge base's rate
+    applies; answer_locally leaves lower values to the LLM.
+    """
+    stamp = round(value * STAMP_DUTY_RATE)
+    registration = round(min(value * REGISTRATION_FEE_RATE, REGISTRATION_FEE_CAP))
+    template = FEE_TEMPLATES.get(language, FEE_TEMPLATES["english"])
+    return template.format(
+        value=format_indian(value),
+        words=_amount_in_words(value, language),
+        stamp_rate=_percent(STAMP_DUTY_RATE),
+        stamp_above=_amount_in_words(STAMP_DUTY_MIN_VALUE, language),
+        registration_rate=_percent(REGISTRATION_FEE_RATE),
+        cap=_amount_in_words(REGISTRATION_FEE_CAP, language),
+        stamp=format_indian(stamp),
+        registration=format_indian(registration),
+        total=format_indian(stamp + registration),
+    )
+
+
+def answer_locally(user_message: str, language: str) -> Optional[str]:
+    """
+    Answer a unit conversion or fee calculation without the LLM.
+
+    Args:
+        user_message: User's input message (already domain-validated)
+        language: Detected language (tamil, tanglish, english)
+
+    Returns:
+        The templated answer, or None to fall back to the LLM
+    """
+    if not settings.fast_answers_enabled or len(user_message) > settings.llm_short_query_chars:
+        return None
+
+    text = user_message.lower()
+    conversion = parse_conversion(text)
+    if conversion is not None:
+        FAST_ANSWERS.labels("unit_conversion").inc()
+        return render_conversion(*conversion, language)
+
+    value = parse_fee_amount(text)
+    # The knowledge base only gives the stamp duty rate above a value
+    if value is not None and value > STAMP_DUTY_MIN_VALUE:
+        FAST_ANSWERS.labels("fee_calculation").inc()
+        return render_fees(value, language)
+    return None
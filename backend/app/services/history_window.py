@@ -0,0 +1,221 @@
+"""
+Conversation History Window
+
+Keeps the history part of the LLM prompt bounded however long a session
+grows:
+
+- Each session has a rolling summary (ChatSession.summary) of every
+  message before ChatSession.summary_upto.
+- load_history() fetches only the messages after that point (at most
+  CHAT_HISTORY_MESSAGES + HISTORY_SUMMARY_EVERY) and puts the summary in
+  front of them as a system message.
+- fit_history() keeps the summary and the newest turns that fit the token
+  budget left over after the system prompt, knowledge context and user
+  message (see LLMService._build_messages).
+- Once HISTORY_SUMMARY_EVERY messages have piled up beyond the most
+  recent CHAT_HISTORY_MESSAGES, refresh_summary() folds them into the
+  summary in the background, after the reply has been sent, at most
+  HISTORY_SUMMARY_FOLD_MAX messages per LLM call so a long backlog (e.g.
+  a migrated session) is caught up in steps. A session whose summary
+  call fails is left alone for HISTORY_SUMMARY_RETRY_SECONDS, doubling
+  with each further failure.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from odmantic import AIOEngine
+
+from app.config import settings
+from app.message_store import (
+    find_session_state, get_messages_page, get_recent_messages, update_session_summary
+)
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+# Chat-completions framing per message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], Awaitable[Optional[str]]]
+
+# Sessions with a summary refresh in flight in this worker
+_refreshing: Set[str] = set()
+# Strong references, so running refresh tasks are not garbage collected
+_tasks: Set[asyncio.Task] = set()
+# Session id -> (consecutive failed refreshes, monotonic time of the next try)
+_backoff: Dict[str, Tuple[int, float]] = {}
+# Longest back-off, as a multiple of HISTORY_SUMMARY_RETRY_SECONDS
+MAX_BACKOFF_FACTOR = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a text.
+
+    About 4 UTF-8 bytes per token: ~4 characters of English or Tanglish,
+    and ~1.3 characters of Tamil script (3 bytes each), which Llama
+    tokenizers split much more finely.
+    """
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_history(history: List[Dict[str, str]], budget_tokens: int) -> List[Dict[str, str]]:
+    """
+    The summary plus the newest turns that fit a token budget.
+
+    Args:
+        history: Summary system message (if any) followed by turns, oldest first
+        budget_tokens: Tokens available for history in the prompt
+
+    Returns:
+        The selected messages, oldest first
+    """
+    summaries = [message for message in history if message["role"] == "system"]
+    turns = [message for message in history if message["role"] != "system"]
+
+    used = 0
+    kept = []
+    for message in summaries:
+        cost = message_tokens(message)
+        if used + cost <= budget_tokens:
+            kept.append(message)
+            used += cost
+
+    selected = []
+    for message in reversed(turns):
+        cost = message_tokens(message)
+        if used + cost > budget_tokens:
+            break
+        selected.append(message)
+        used += cost
+    selected.reverse()
+
+    # Do not open the window on a reply whose question was cut off
+    while selected and selected[0]["role"] == "assistant":
+        selected.pop(0)
+    return kept + selected
+
+
+def fetch_limit() -> int:
+    """Most unsummarized messages a chat turn reads from Mongo."""
+    if settings.history_summary_every <= 0:
+        return settings.chat_history_messages
+    return settings.chat_history_messages + settings.history_summary_every
+
+
+async def load_history(engine: AIOEngine, session: dict) -> List[Dict[str, str]]:
+    """
+    Conversation history for the next LLM call.
+
+    Args:
+        engine: Database engine
+        session: State from find_session_state()
+
+    Returns:
+        Role/content dicts: the summary (as a system message) if there is
+        one, then the unsummarized recent messages, oldest first
+    """
+    message_count = session["message_count"]
+    unsummarized = message_count - session["summary_upto"]
+    messages = await get_recent_messages(
+        engine, session["session_id"], message_count, min(unsummarized, fetch_limit())
+    )
+
+    history = []
+    if session["summary"]:
+        history.append({"role": "system", "content": SUMMARY_HEADER + session["summary"]})
+    history.extend({"role": message.role, "content": message.content} for message in messages)
+    return history
+
+
+def needs_summary(session: dict, message_count: Optional[int]) -> bool:
+    """True once enough messages have piled up beyond the verbatim window."""
+    if settings.history_summary_every <= 0 or message_count is None:
+        return False
+    return message_count - session["summary_upto"] >= fetch_limit()
+
+
+async def refresh_summary(engine: AIOEngine, session_id: str, summarize: Summarizer) -> bool:
+    """
+    Fold all but the last CHAT_HISTORY_MESSAGES messages into the summary.
+
+    Folds HISTORY_SUMMARY_FOLD_MAX messages per summarize call, storing the
+    summary after each one, so a failure keeps the progress made so far.
+
+    Args:
+        engine: Database engine
+        session_id: Session to summarize
+        summarize: LLM call merging the old summary with new messages
+
+    Returns:
+        False if a summarize call failed
+    """
+    session = await find_session_state(engine, session_id)
+    if session is None:
+        return True
+
+    summary = session["summary"]
+    summary_upto = session["summary_upto"]
+    upto = session["message_count"] - settings.chat_history_messages
+    while summary_upto < upto:
+        fold_end = min(upto, summary_upto + max(1, settings.history_summary_fold_max))
+        messages = await get_messages_page(
+            engine, session_id, session["message_count"], before=fold_end, limit=fold_end - summary_upto
+        )
+        new_summary = await summarize(
+            summary,
+            [{"role": message.role, "content": message.content} for message in messages],
+        )
+        if not new_summary:
+            return False
+        if not await update_session_summary(engine, session_id, new_summary, summary_upto, fold_end):
+            # Another worker moved the summary on
+            return True
+        print(f"📝 Summarized messages {summary_upto}-{fold_end - 1} of session {session_id}")
+        summary, summary_upto = new_summary, fold_end
+    return True
+
+
+def _record_outcome(session_id: str, succeeded: bool) -> None:
+    """Clear or extend a session's back-off after a refresh."""
+    if succeeded:
+        _backoff.pop(session_id, None)
+        return
+    now = time.monotonic()
+    failures = _backoff.get(session_id, (0, 0.0))[0] + 1
+    factor = min(2 ** (failures - 1), MAX_BACKOFF_FACTOR)
+    _backoff[session_id] = (failures, now + settings.history_summary_retry_seconds * factor)
+
+    # Forget sessions whose back-off ran out long ago
+    horizon = now - settings.history_summary_retry_seconds * MAX_BACKOFF_FACTOR
+    for stale in [key for key, (_, retry_at) in _backoff.items() if retry_at < horizon]:
+        del _backoff[stale]
+
+
+def schedule_summary(engine: AIOEngine, session_id: str, summarize: Summarizer) -> None:
+    """Run refresh_summary() in the background, once per session at a time."""
+    if session_id in _refreshing:
+        return
+    backoff = _backoff.get(session_id)
+    if backoff is not None and time.monotonic() < backoff[1]:
+        return
+    _refreshing.add(session_id)
+
+    async def run():
+        succeeded = False
+        try:
+            succeeded = await refresh_summary(engine, session_id, summarize)
+        except Exception as e:
+            print(f"⚠️ Summary refresh failed for session {session_id}: {e}")
+        finally:
+            _refreshing.discard(session_id)
+            _record_outcome(session_id, succeeded)
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
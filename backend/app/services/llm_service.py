@@ -3,37 +3,55 @@ LLM Service - Groq API Integration for Llama 3.1 8B
 
 Handles multilingual real estate queries with strict language matching.
 Supports Tamil script, Tanglish, and English.
-Uses direct HTTP API calls to avoid SDK compatibility issues.
+Uses direct HTTP API calls to avoid SDK compatibility issues, over a single
+pooled HTTP/2 connection shared by the whole worker process.
+Requests are routed across the configured OpenAI-compatible providers
+(Groq by default, see providers.py) with failover between them.
+Unit conversions and fee calculations are answered deterministically
+(see fast_answers.py) without calling the LLM, and identical in-flight
+requests share one upstream call (see single_flight.py).
 """
 
+import asyncio
+import json
+import time
 import httpx
+from contextlib import aclosing
+from functools import lru_cache
 from app.config import settings
-from app.services.domain_validator import detect_language
-from app.services.tn_knowledge_base import get_knowledge_context
-from typing import List, Dict
+from app.metrics import (
+    LLM_FAILOVERS, LLM_FIRST_TOKEN_SECONDS, LLM_REQUEST_SECONDS, record_llm_usage, track_stage
+)
+from app.services.classification_cache import classification_cache
+from app.services.fast_answers import answer_locally
+from app.services.history_window import estimate_tokens, fit_history, message_tokens
+from app.services.tn_knowledge_base import context_for_keys, retrieve_passages
+from app.services.resilience import StreamInterruptedError
+from app.services.response_cache import request_fingerprint, response_cache
+from app.services.single_flight import single_flight
+from app.services.providers import GENERAL, classify_query_route, create_registry
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional
 
 
-class LLMService:
-    """Service for interacting with Llama 3.1 8B via Groq API."""
-    
-    def __init__(self):
-        self.api_key = settings.groq_api_key
-        self.model = settings.llm_model
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        print(f"✅ LLM Service initialized with model: {self.model}")
-        
-    def _get_system_prompt(self, language: str, context: str = "") -> str:
-        """
-        Generate system prompt based on language and context.
-        
-        Args:
-            language: Detected language (tamil, tanglish, english)
-            context: Relevant knowledge base context
-            
-        Returns:
-            System prompt string
-        """
-        base_instructions = """You are a Tamil Nadu Real Estate AI Assistant. You MUST follow these rules STRICTLY:
+ERROR_MESSAGES = {
+    "tamil": "மன்னிக்கவும், தற்போது பதில் அளிக்க முடியவில்லை. தயவுசெய்து மீண்டும் முயற்சிக்கவும்.",
+    "tanglish": "Mannikkavum, ippo response kudukka mudiyala. Please try again.",
+    "english": "I apologize, but I'm unable to generate a response at the moment. Please try again."
+}
+
+
+class Completion(NamedTuple):
+    """A completed reply and the provider that produced it."""
+    text: str
+    provider: str
+    # Produced by a failover candidate after the routed primary failed;
+    # not cached, since the cache scope stands for the primary's models
+    failover: bool
+
+
+# ---------------- SYSTEM PROMPT ---------------- #
+
+_BASE_INSTRUCTIONS = """You are a Tamil Nadu Real Estate AI Assistant. You MUST follow these rules STRICTLY:
 
 DOMAIN RESTRICTION:
 - Answer ONLY real estate-related questions about Tamil Nadu, India
@@ -42,27 +60,27 @@ DOMAIN RESTRICTION:
 
 LANGUAGE MATCHING RULE (CRITICAL):
 """
-        
-        language_instructions = {
-            "tamil": """- User is asking in TAMIL SCRIPT (தமிழ் எழுத்துக்கள்)
+
+LANGUAGE_INSTRUCTIONS = {
+    "tamil": """- User is asking in TAMIL SCRIPT (தமிழ் எழுத்துக்கள்)
 - You MUST respond ONLY in TAMIL SCRIPT
 - DO NOT use English letters or Tanglish
 - Example: If user asks "சென்னையில் வீடு வாங்க என்ன ஆவணங்கள் தேவை?", respond entirely in Tamil script""",
-            
-            "tanglish": """- User is asking in TANGLISH (Tamil language using English letters)
+    
+    "tanglish": """- User is asking in TANGLISH (Tamil language using English letters)
 - You MUST respond ONLY in TANGLISH
 - DO NOT use Tamil script or pure English
 - Example: If user asks "Chennai la veedu vaanga enna documents venum?", respond like "Chennai la veedu vaanga indha documents venum: Sale deed, EC, patta..."
 - Write Tamil words using English alphabet (vaanga, venum, enna, epdi, etc.)""",
-            
-            "english": """- User is asking in ENGLISH
+    
+    "english": """- User is asking in ENGLISH
 - You MUST respond ONLY in ENGLISH
 - Use professional, clear English language
 - DO NOT use Tamil script or Tanglish
 - Example: If user asks "What documents are needed to buy a house in Chennai?", respond in proper English"""
-        }
-        
-        response_structure = """
+}
+
+_RESPONSE_STRUCTURE = """
 
 RESPONSE STRUCTURE:
 1. Clear explanation of the topic
@@ -81,64 +99,591 @@ TAMIL NADU CONTEXT:
 - Mention authorities: TNRERA, DTCP, CMDA, Sub-Registrar
 - Reference Tamil Nadu Registration Department procedures
 """
+
+SUMMARY_INSTRUCTIONS = """Summarize the conversation below between a user and a Tamil Nadu real estate assistant. The summary replaces these messages in the assistant's context for later turns.
+- Merge the earlier summary (if any) with the new messages
+- Keep concrete facts: locations, property type and size, budget, documents, dates, decisions and open questions
+- Drop greetings and generic advice
+- Write in English, at most 120 words"""
+
+# Longest part of one message included in a summary request
+SUMMARY_MESSAGE_CHARS = 1500
+
+# Static part of the system prompt, built once per language at import.
+# It always comes first and never varies, so the prompt prefix is
+# byte-stable across requests and provider-side prefix caching can apply.
+SYSTEM_PROMPT_PREFIXES = {
+    language: _BASE_INSTRUCTIONS + instructions + _RESPONSE_STRUCTURE
+    for language, instructions in LANGUAGE_INSTRUCTIONS.items()
+}
+
+
+@lru_cache(maxsize=1024)
+def build_system_prompt(language: str, context: str = "") -> str:
+    """
+    Assemble the system prompt for a language and knowledge context.
+    
+    Contexts come from a small set of passage combinations (see
+    context_for_keys), so assembled prompts are cached and a repeat
+    request reuses the same string object instead of copying ~2KB.
+    
+    Args:
+        language: Detected language (tamil, tanglish, english)
+        context: Relevant knowledge base context
+        
+    Returns:
+        System prompt string
+    """
+    prefix = SYSTEM_PROMPT_PREFIXES.get(language, SYSTEM_PROMPT_PREFIXES["english"])
+    if not context:
+        return prefix
+    return prefix + "\n\nRELEVANT KNOWLEDGE:\n" + context
+
+
+class LLMService:
+    """Service for interacting with Llama 3.1 8B via Groq API."""
+    
+    def __init__(self):
+        self.api_key = settings.groq_api_key
+        self.model = settings.llm_model
+        self.api_url = settings.llm_api_url
+        self._client: Optional[httpx.AsyncClient] = None
+        self.registry = create_registry()
+        print(f"✅ LLM Service initialized with model: {self.model}")
         
-        context_section = f"\n\nRELEVANT KNOWLEDGE:\n{context}" if context else ""
+    def _get_system_prompt(self, language: str, context: str = "") -> str:
+        """
+        Generate system prompt based on language and context.
         
-        return (base_instructions + 
-                language_instructions.get(language, language_instructions["english"]) +
-                response_structure + 
-                context_section)
+        Args:
+            language: Detected language (tamil, tanglish, english)
+            context: Relevant knowledge base context
+            
+        Returns:
+            System prompt string
+        """
+        return build_system_prompt(language, context)
     
-    def generate_response(
-        self, 
-        user_message: str, 
-        conversation_history: List[Dict[str, str]] = None
-    ) -> tuple[str, str]:
+    def _build_messages(
+        self,
+        user_message: str,
+        language: str,
+        context: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
         """
-        Generate response using Llama 3.1 8B via direct HTTP API.
+        Build the chat-completions message list for a user turn.
         
         Args:
             user_message: User's input message
+            language: Detected language (tamil, tanglish, english)
+            context: Relevant knowledge base context
             conversation_history: Previous messages in conversation
             
         Returns:
-            Tuple of (response_text, detected_language)
+            List of role/content message dicts
         """
-        # Detect language
-        language = detect_language(user_message)
-        
-        # Get relevant knowledge context
-        context = get_knowledge_context(user_message.lower())
-        
         # Build system prompt
         system_prompt = self._get_system_prompt(language, context)
         
         # Build messages for API
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add conversation history if available
+        # Add as much recent history as fits the prompt token budget
         if conversation_history:
-            messages.extend(conversation_history[-6:])  # Last 3 exchanges
+            budget = min(
+                settings.history_max_tokens,
+                settings.llm_prompt_token_budget - estimate_tokens(system_prompt) - estimate_tokens(user_message),
+            )
+            messages.extend(fit_history(conversation_history, budget))
         
         # Add current user message
         messages.append({"role": "user", "content": user_message})
+        return messages
+    
+    def _build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build the request body for the chat-completions endpoint."""
+        return {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": settings.llm_temperature,
+            "max_tokens": max_tokens or settings.llm_max_tokens,
+        }
+    
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+        """Rough prompt + completion token count for the quota limiter."""
+        return sum(message_tokens(message) for message in messages) + (max_tokens or settings.llm_max_tokens)
+    
+    @staticmethod
+    def _attempt_timeout(seconds: float) -> httpx.Timeout:
+        """Per-attempt timeout, capped by what is left of the request budget."""
+        return httpx.Timeout(seconds, connect=min(settings.llm_connect_timeout_seconds, seconds))
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    @staticmethod
+    def _knowledge_context(user_message: str) -> str:
+        """Retrieve knowledge passages for the message within the configured budget."""
+        passages = retrieve_passages(
+            user_message.lower(),
+            top_k=settings.knowledge_top_k,
+            max_chars=settings.knowledge_max_chars,
+        )
+        return context_for_keys(tuple(passage.key for passage in passages))
+    
+    def _cache_key(
+        self,
+        user_message: str,
+        language: str,
+        context: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        query_class: str = GENERAL
+    ) -> Optional[str]:
+        """Response-cache key for this request, or None if it is not cacheable."""
+        return response_cache.make_key(
+            user_message,
+            language,
+            context,
+            model=self.registry.cache_scope(query_class),
+            temperature=settings.llm_temperature,
+            max_tokens=settings.llm_max_tokens,
+            conversation_history=conversation_history,
+        )
+    
+    def _flight_key(
+        self,
+        user_message: str,
+        language: str,
+        context: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        query_class: str = GENERAL
+    ) -> Optional[str]:
+        """Single-flight key for this request, or None if it must run alone."""
+        if conversation_history:
+            return None
+        return request_fingerprint(
+            user_message,
+            language,
+            context,
+            model=self.registry.cache_scope(query_class),
+            temperature=settings.llm_temperature,
+            max_tokens=settings.llm_max_tokens,
+        )
+    
+    @staticmethod
+    def _error_message(language: str) -> str:
+        """Localized apology returned when the upstream call fails."""
+        return ERROR_MESSAGES.get(language, ERROR_MESSAGES["english"])
+    
+    @staticmethod
+    def is_error_response(text: str) -> bool:
+        """True if `text` is the apology sent in place of a failed generation."""
+        return text in ERROR_MESSAGES.values()
+    
+    # ---------------- HTTP CLIENT LIFECYCLE ---------------- #
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the process-wide pooled HTTP client for the LLM API."""
+        return httpx.AsyncClient(
+            http2=settings.llm_http2,
+            timeout=httpx.Timeout(
+                settings.llm_timeout_seconds,
+                connect=settings.llm_connect_timeout_seconds,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry_seconds,
+            ),
+            headers=self._headers(),
+        )
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client. Called from the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+            print(f"✅ LLM HTTP client ready (http2={settings.llm_http2}, "
+                  f"max_connections={settings.llm_max_connections})")
+    
+    async def shutdown(self) -> None:
+        """Close the shared HTTP client and its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The shared HTTP client.
         
-        try:
-            # Call Groq API directly using httpx
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+        Falls back to lazy creation when used outside the app lifespan
+        (scripts, ad-hoc calls), mirroring get_engine().
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    # ---------------- GENERATION ---------------- #
+    
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        query_class: str = GENERAL,
+        max_tokens: Optional[int] = None
+    ) -> Optional[Completion]:
+        """
+        Run one chat completion, failing over across the routed providers.
+        
+        Args:
+            messages: Chat-completions message list
+            query_class: Routing class from classify_query_route()
+            max_tokens: Completion token limit (default LLM_MAX_TOKENS)
+            
+        Returns:
+            The Completion, or None if every provider failed
+        """
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        
+        started = time.monotonic()
+        candidates = self.registry.candidates(query_class, kind="complete")
+        for index, provider in enumerate(candidates):
+            if index and time.monotonic() - started >= settings.llm_request_budget_seconds:
+                break
+            
+            payload = self._build_payload(messages, provider.model, max_tokens)
             
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": settings.llm_temperature,
-                "max_tokens": settings.llm_max_tokens,
-            }
+            async def send(timeout: float, provider=provider, payload=payload) -> httpx.Response:
+                return await self.client.post(
+                    provider.config.api_url,
+                    json=payload,
+                    headers=provider.headers,
+                    timeout=self._attempt_timeout(timeout),
+                )
             
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(self.api_url, json=payload, headers=headers)
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                # Retries, hedging, circuit breaker and quota limits of this provider
+                with track_stage("llm"):
+                    async with provider.resilience.request(send, estimated_tokens, kind="complete") as response:
+                        response.raise_for_status()
+                        result = response.json()
+                assistant_message = result["choices"][0]["message"]["content"]
+                outcome = "ok"
+            except httpx.HTTPStatusError as e:
+                print(f"❌ HTTP Error calling LLM provider '{provider.name}': "
+                      f"{e.response.status_code} - {e.response.text}")
+            except Exception as e:
+                print(f"❌ Error calling LLM provider '{provider.name}': {e}")
+            finally:
+                LLM_REQUEST_SECONDS.labels(provider.model, "complete", outcome).observe(time.perf_counter() - start)
+            
+            if outcome != "ok":
+                provider.record_failure()
+                if index + 1 < len(candidates):
+                    LLM_FAILOVERS.labels(provider.name).inc()
+                continue
+            
+            provider.record_success("complete", time.perf_counter() - start)
+            record_llm_usage(provider.model, result.get("usage"))
+            provider.resilience.settle(estimated_tokens, result.get("usage"))
+            return Completion(assistant_message, provider.name, failover=index > 0)
+        
+        return None
+    
+    async def agenerate_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        language: Optional[str] = None,
+        use_cache: bool = True
+    ) -> tuple[str, str]:
+        """
+        Generate response using Llama 3.1 8B over the shared async HTTP client.
+        
+        The request goes to the providers routed for the query in turn,
+        failing over to the next one when a provider errors or its circuit
+        is open.
+        
+        Args:
+            user_message: User's input message
+            conversation_history: Previous messages in conversation
+            language: Language already detected for this request, if any
+            use_cache: Read and write the response cache and join identical
+                in-flight requests (batch evaluation turns it off to see
+                fresh answers)
+            
+        Returns:
+            Tuple of (response_text, detected_language)
+        """
+        # Detect language unless the caller already did
+        if language is None:
+            language = classification_cache.classify(user_message).language
+        
+        # Unit conversions and fee calculations are answered without the LLM
+        with track_stage("fast_answer"):
+            direct = answer_locally(user_message, language)
+        if direct is not None:
+            return direct, language
+        
+        # Get relevant knowledge context
+        with track_stage("knowledge"):
+            context = self._knowledge_context(user_message)
+        
+        query_class = classify_query_route(user_message)
+        
+        # Serve identical requests from the response cache
+        cache_key = None
+        if use_cache:
+            cache_key = self._cache_key(user_message, language, context, conversation_history, query_class)
+        if cache_key is not None:
+            with track_stage("cache_lookup"):
+                cached = await response_cache.get(cache_key)
+            if cached is not None:
+                return cached, language
+        
+        messages = self._build_messages(user_message, language, context, conversation_history)
+        
+        async def complete() -> Optional[str]:
+            completion = await self._complete(messages, query_class)
+            if completion is None:
+                return None
+            if cache_key is not None and not completion.failover:
+                await response_cache.set(cache_key, completion.text)
+            return completion.text
+        
+        # Identical in-flight requests share one upstream call; a request
+        # without the cache wants its own fresh answer, so it runs alone
+        flight_key = None
+        if use_cache:
+            flight_key = self._flight_key(user_message, language, context, conversation_history, query_class)
+        assistant_message = await single_flight.do(flight_key, complete)
+        if assistant_message is None:
+            return self._error_message(language), language
+        return assistant_message, language
+    
+    async def asummarize(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Fold conversation turns into a session's rolling summary.
+        
+        Args:
+            previous_summary: The session's current summary, if any
+            messages: Role/content dicts of the turns to fold in, oldest first
+            
+        Returns:
+            The new summary, or None if the LLM call failed
+        """
+        transcript = "\n".join(
+            f"{message['role'].capitalize()}: {message['content'][:SUMMARY_MESSAGE_CHARS]}"
+            for message in messages
+        )
+        content = f"Earlier summary:\n{previous_summary}\n\n" if previous_summary else ""
+        content += f"New messages:\n{transcript}"
+        summary = await self._complete(
+            [{"role": "system", "content": SUMMARY_INSTRUCTIONS}, {"role": "user", "content": content}],
+            max_tokens=settings.history_summary_max_tokens,
+        )
+        return summary.text.strip() if summary else None
+    
+    async def astream_response(
+        self,
+        user_message: str,
+        language: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response as content deltas using `stream: true` mode.
+
+        Closing the generator (e.g. when the client disconnects) exits the
+        upstream stream context, which aborts the upstream request instead of
+        letting it run to max_tokens. Fails over to the next provider only
+        while nothing has been yielded yet.
+
+        Args:
+            user_message: User's input message
+            language: Detected language (tamil, tanglish, english)
+            conversation_history: Previous messages in conversation
+
+        Yields:
+            Content deltas in arrival order
+
+        Raises:
+            StreamInterruptedError: The upstream stream failed after some
+                deltas were yielded; the reply is incomplete
+        """
+        with track_stage("fast_answer"):
+            direct = answer_locally(user_message, language)
+        if direct is not None:
+            yield direct
+            return
+
+        with track_stage("knowledge"):
+            context = self._knowledge_context(user_message)
+
+        query_class = classify_query_route(user_message)
+
+        cache_key = self._cache_key(user_message, language, context, conversation_history, query_class)
+        if cache_key is not None:
+            with track_stage("cache_lookup"):
+                cached = await response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        messages = self._build_messages(user_message, language, context, conversation_history)
+        flight_key = self._flight_key(user_message, language, context, conversation_history, query_class)
+
+        # Identical in-flight streams share one upstream call
+        async with aclosing(single_flight.stream(
+            flight_key, lambda: self._stream_upstream(messages, language, query_class, cache_key)
+        )) as deltas:
+            async for delta in deltas:
+                yield delta
+
+    async def _stream_upstream(
+        self,
+        messages: List[Dict[str, str]],
+        language: str,
+        query_class: str,
+        cache_key: Optional[str]
+    ) -> AsyncIterator[str]:
+        """
+        Stream one chat completion, failing over across the routed providers.
+
+        Args:
+            messages: Chat-completions message list
+            language: Detected language, for the apology on failure
+            query_class: Routing class from classify_query_route()
+            cache_key: Response-cache key to store the completed reply under
+
+        Yields:
+            Content deltas, or the localized apology if every provider failed
+
+        Raises:
+            StreamInterruptedError: A provider failed mid-reply
+        """
+        estimated_tokens = self._estimate_tokens(messages)
+
+        parts = []
+        started = time.monotonic()
+        candidates = self.registry.candidates(query_class, kind="stream")
+        for index, provider in enumerate(candidates):
+            if index and time.monotonic() - started >= settings.llm_request_budget_seconds:
+                break
+
+            payload = self._build_payload(messages, provider.model)
+            payload["stream"] = True
+
+            async def send(timeout: float, provider=provider, payload=payload) -> httpx.Response:
+                # Returns once headers arrive, so retries and hedging only happen
+                # before the first delta has been yielded
+                request = self.client.build_request(
+                    "POST",
+                    provider.config.api_url,
+                    json=payload,
+                    headers=provider.headers,
+                    timeout=self._attempt_timeout(timeout),
+                )
+                return await self.client.send(request, stream=True)
+
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                async with provider.resilience.request(send, estimated_tokens, kind="stream") as response:
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+
+                        chunk = json.loads(data)
+                        # Groq reports usage on the last chunk under x_groq
+                        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                        if usage:
+                            record_llm_usage(provider.model, usage)
+                            provider.resilience.settle(estimated_tokens, usage)
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if delta:
+                            if not parts:
+                                first_delta = time.perf_counter() - start
+                                LLM_FIRST_TOKEN_SECONDS.labels(provider.model).observe(first_delta)
+                                provider.record_success("stream", first_delta)
+                            parts.append(delta)
+                            yield delta
+
+                outcome = "ok"
+
+            except httpx.HTTPStatusError as e:
+                print(f"❌ HTTP Error streaming from LLM provider '{provider.name}': "
+                      f"{e.response.status_code} - {e.response.text}")
+            except (GeneratorExit, asyncio.CancelledError):
+                # Client disconnected and the stream was closed early: not an upstream error
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                print(f"❌ Error streaming from LLM provider '{provider.name}': {e}")
+            finally:
+                LLM_REQUEST_SECONDS.labels(provider.model, "stream", outcome).observe(time.perf_counter() - start)
+
+            if outcome == "ok":
+                # Only a stream that ran to completion is worth caching, and
+                # only from the routed primary (see Completion.failover)
+                if cache_key is not None and parts and index == 0:
+                    await response_cache.set(cache_key, "".join(parts))
+                return
+
+            provider.record_failure()
+            if parts:
+                # Part of the reply is already out; another provider cannot continue it
+                raise StreamInterruptedError(f"Stream from '{provider.name}' failed after {len(parts)} deltas")
+            if index + 1 < len(candidates):
+                LLM_FAILOVERS.labels(provider.name).inc()
+
+        yield self._error_message(language)
+
+    def generate_response(
+        self,
+        user_message: str, 
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> tuple[str, str]:
+        """
+        Blocking variant of agenerate_response for scripts and sync callers.
+        
+        Request handlers should await agenerate_response instead; this opens
+        a short-lived client per call.
+        
+        Args:
+            user_message: User's input message
+            conversation_history: Previous messages in conversation
+            
+        Returns:
+            Tuple of (response_text, detected_language)
+        """
+        language = classification_cache.classify(user_message).language
+        context = self._knowledge_context(user_message)
+        messages = self._build_messages(user_message, language, context, conversation_history)
+        
+        try:
+            with httpx.Client(timeout=settings.llm_timeout_seconds, headers=self._headers()) as client:
+                response = client.post(self.api_url, json=self._build_payload(messages))
                 response.raise_for_status()
                 
             result = response.json()
@@ -147,20 +692,10 @@ TAMIL NADU CONTEXT:
             
         except httpx.HTTPStatusError as e:
             print(f"❌ HTTP Error calling Groq API: {e.response.status_code} - {e.response.text}")
-            error_messages = {
-                "tamil": "மன்னிக்கவும், தற்போது பதில் அளிக்க முடியவில்லை. தயவுசெய்து மீண்டும் முயற்சிக்கவும்.",
-                "tanglish": "Mannikkavum, ippo response kudukka mudiyala. Please try again.",
-                "english": "I apologize, but I'm unable to generate a response at the moment. Please try again."
-            }
-            return error_messages.get(language, error_messages["english"]), language
+            return self._error_message(language), language
         except Exception as e:
             print(f"❌ Error calling Groq API: {e}")
-            error_messages = {
-                "tamil": "மன்னிக்கவும், தற்போது பதில் அளிக்க முடியவில்லை. தயவுசெய்து மீண்டும் முயற்சிக்கவும்.",
-                "tanglish": "Mannikkavum, ippo response kudukka mudiyala. Please try again.",
-                "english": "I apologize, but I'm unable to generate a response at the moment. Please try again."
-            }
-            return error_messages.get(language, error_messages["english"]), language
+            return self._error_message(language), language
 
 
 # Global LLM service instance
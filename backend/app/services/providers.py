@@ -0,0 +1,231 @@
+"""
+LLM Provider Registry
+
+Any number of OpenAI-compatible chat-completions endpoints (Groq, a
+second Groq account, Together, a self-hosted vLLM, ...) configured via
+LLM_PROVIDERS. Each provider has its own retry/hedging/breaker/quota
+stack (see resilience.py) and EWMA latency and error tracking.
+
+Routing:
+- Each query is classified (e.g. short unit-conversion questions) and
+  goes to the providers serving that class, then to the "general" ones.
+- Within a group the primary is picked at random by configured weight,
+  scaled down for providers that are slower or failing more than their
+  peers; the rest follow in score order as failover candidates.
+- Providers with an open circuit go last.
+
+With LLM_PROVIDERS unset there is a single provider built from the Groq
+settings, which behaves exactly like the single-endpoint service.
+"""
+
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.resilience import (
+    CircuitBreaker, RetryPolicy, UpstreamLimiter, UpstreamResilience
+)
+
+GENERAL = "general"
+UNIT_CONVERSION = "unit_conversion"
+
+_UNIT_QUERY_RE = re.compile(
+    r'\b(?:sq\.?\s?ft|sqft|square\s+(?:feet|foot|fe?et|met(?:er|re)s?|yards?)|sq\.?\s?m|cents?|grounds?'
+    r'|acres?|hectares?|ankanams?|kuzhis?|guntas?|convert|conversion)\b'
+    r'|சென்ட்|ஏக்கர்|சதுர\s*அடி|கிரவுண்ட்|ஹெக்டேர்'
+)
+
+
+def classify_query_route(user_message: str) -> str:
+    """
+    Routing class of a query.
+
+    Short questions about land measurement units are UNIT_CONVERSION (a
+    small, fast model answers them well); everything else is GENERAL.
+    """
+    if len(user_message) <= settings.llm_short_query_chars and _UNIT_QUERY_RE.search(user_message.lower()):
+        return UNIT_CONVERSION
+    return GENERAL
+
+
+@dataclass
+class ProviderConfig:
+    """One OpenAI-compatible endpoint, as configured in LLM_PROVIDERS."""
+    name: str
+    api_url: str
+    model: str
+    api_key: Optional[str] = None
+    api_key_env: Optional[str] = None  # Read the key from this env var instead
+    weight: float = 1.0
+    query_classes: List[str] = field(default_factory=lambda: [GENERAL])
+    # Quota overrides; None = the global LLM_* settings
+    max_concurrency: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+
+    def resolve_api_key(self) -> str:
+        if self.api_key_env:
+            return os.getenv(self.api_key_env, "")
+        return self.api_key or ""
+
+
+class Provider:
+    """A configured endpoint with its resilience stack and health statistics."""
+
+    def __init__(self, config: ProviderConfig, alpha: float):
+        self.config = config
+        self.name = config.name
+        self.model = config.model
+        self.alpha = alpha
+        self.headers = {"Authorization": f"Bearer {config.resolve_api_key()}"}
+        self.resilience = _create_resilience(config)
+        # EWMA of latency per request kind ("complete": whole call, "stream": first delta)
+        self.latency_ewma: Dict[str, float] = {}
+        self.error_ewma = 0.0
+        self.successes = 0
+        self.failures = 0
+
+    def record_success(self, kind: str, seconds: float) -> None:
+        previous = self.latency_ewma.get(kind)
+        self.latency_ewma[kind] = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+        self.error_ewma = (1 - self.alpha) * self.error_ewma
+        self.successes += 1
+
+    def record_failure(self) -> None:
+        self.error_ewma = self.alpha + (1 - self.alpha) * self.error_ewma
+        self.failures += 1
+
+    @property
+    def available(self) -> bool:
+        return self.resilience.breaker.state != CircuitBreaker.OPEN
+
+    def score(self, kind: str, best_latency: Optional[float]) -> float:
+        """Configured weight, scaled by error rate and latency relative to the fastest peer."""
+        score = self.config.weight * (1 - self.error_ewma) ** 2
+        latency = self.latency_ewma.get(kind)
+        if latency and best_latency:
+            score *= best_latency / latency
+        return score
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "weight": self.config.weight,
+            "query_classes": self.config.query_classes,
+            "latency_ewma_seconds": {kind: round(value, 4) for kind, value in self.latency_ewma.items()},
+            "error_ewma": round(self.error_ewma, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            **self.resilience.stats(),
+        }
+
+
+class ProviderRegistry:
+    """Routes each request to an ordered list of providers (primary first)."""
+
+    def __init__(self, providers: List[Provider]):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+
+    def _order(self, group: List[Provider], kind: str) -> List[Provider]:
+        healthy = [provider for provider in group if provider.available]
+        unhealthy = [provider for provider in group if not provider.available]
+        if not healthy:
+            return unhealthy
+
+        latencies = [provider.latency_ewma[kind] for provider in healthy if kind in provider.latency_ewma]
+        best_latency = min(latencies) if latencies else None
+        scores = [max(provider.score(kind, best_latency), 1e-6) for provider in healthy]
+
+        primary = random.choices(healthy, weights=scores)[0]
+        rest = sorted(
+            (pair for pair in zip(scores, healthy) if pair[1] is not primary),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        return [primary] + [provider for _, provider in rest] + unhealthy
+
+    def candidates(self, query_class: str = GENERAL, kind: str = "complete") -> List[Provider]:
+        """
+        Providers to try for a request, in order.
+
+        Args:
+            query_class: Routing class from classify_query_route()
+            kind: "complete" or "stream" (latency is tracked per kind)
+        """
+        dedicated = [p for p in self.providers if query_class != GENERAL and query_class in p.config.query_classes]
+        general = [p for p in self.providers if GENERAL in p.config.query_classes and p not in dedicated]
+        return self._order(dedicated, kind) + self._order(general, kind)
+
+    def cache_scope(self, query_class: str = GENERAL) -> str:
+        """
+        Models that may answer a query class, for response-cache keys.
+
+        Only replies from the routed primary are cached under it; failover
+        replies (possibly from another group's model) are not.
+        """
+        models = {p.model for p in self.providers if query_class in p.config.query_classes}
+        if not models:
+            models = {p.model for p in self.providers if GENERAL in p.config.query_classes}
+        return "|".join(sorted(models))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [provider.stats() for provider in self.providers]
+
+
+def _create_resilience(config: ProviderConfig) -> UpstreamResilience:
+    """Retries, hedging, circuit breaker and quota limiter for one provider."""
+    def pick(override: Optional[int], default: int) -> int:
+        return default if override is None else override
+
+    return UpstreamResilience(
+        retry=RetryPolicy(
+            max_attempts=settings.llm_max_attempts,
+            base_delay=settings.llm_retry_base_delay_seconds,
+            max_delay=settings.llm_retry_max_delay_seconds,
+        ),
+        breaker=CircuitBreaker(
+            error_threshold=settings.llm_breaker_error_threshold,
+            min_calls=settings.llm_breaker_min_calls,
+            window=settings.llm_breaker_window,
+            open_seconds=settings.llm_breaker_open_seconds,
+            name=config.name,
+        ),
+        limiter=UpstreamLimiter(
+            max_concurrency=pick(config.max_concurrency, settings.llm_max_concurrency),
+            requests_per_minute=pick(config.requests_per_minute, settings.llm_requests_per_minute),
+            tokens_per_minute=pick(config.tokens_per_minute, settings.llm_tokens_per_minute),
+            max_wait_seconds=settings.llm_limiter_max_wait_seconds,
+        ),
+        budget_seconds=settings.llm_request_budget_seconds,
+        attempt_timeout_seconds=settings.llm_timeout_seconds,
+        hedge_enabled=settings.llm_hedge_enabled,
+        hedge_min_delay=settings.llm_hedge_min_delay_seconds,
+        hedge_max_delay=settings.llm_hedge_max_delay_seconds,
+        name=config.name,
+    )
+
+
+def load_provider_configs() -> List[ProviderConfig]:
+    """Provider configs from LLM_PROVIDERS, or the single Groq endpoint."""
+    if not settings.llm_providers:
+        return [ProviderConfig(
+            name="groq",
+            api_url=settings.llm_api_url,
+            model=settings.llm_model,
+            api_key=settings.groq_api_key,
+        )]
+    return [ProviderConfig(**entry) for entry in settings.llm_providers]
+
+
+def create_registry() -> ProviderRegistry:
+    providers = [Provider(config, alpha=settings.llm_ewma_alpha) for config in load_provider_configs()]
+    for provider in providers:
+        print(f"✅ LLM provider '{provider.name}': {provider.model} "
+              f"(weight {provider.config.weight}, classes {provider.config.query_classes})")
+    return ProviderRegistry(providers)
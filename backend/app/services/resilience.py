@@ -0,0 +1,520 @@
+"""
+Upstream Resilience for LLM Calls
+
+Wraps each upstream request in:
+
+- A quota limiter: caps concurrent upstream requests and spends request
+  and token budgets (token buckets sized to the provider quota), so a
+  traffic peak queues briefly instead of thrashing into 429s.
+- A circuit breaker: once the recent upstream error rate crosses a
+  threshold, calls fail fast for a cool-off period instead of each
+  waiting out a timeout.
+- Retries with jittered exponential backoff on 429/5xx and transport
+  errors, honouring Retry-After, within an overall time budget.
+- Optional hedging: if an attempt is slower than the recent p95, a second
+  identical request is sent and whichever answers first wins.
+
+Everything here is per worker process and knows nothing about chat or
+prompts; LLMService supplies a `send(timeout)` coroutine per request.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+from app.metrics import LLM_CIRCUIT_TRANSITIONS, LLM_HEDGES, LLM_RETRIES
+
+# Statuses worth retrying: rate limited or the upstream is struggling
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+Send = Callable[[float], Awaitable[httpx.Response]]
+
+
+class UpstreamError(Exception):
+    """The upstream call could not be completed."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+class RateLimitedError(UpstreamError):
+    """The local quota limiter could not admit the call in time."""
+
+
+class StreamInterruptedError(UpstreamError):
+    """The upstream stream failed after part of the reply was sent."""
+
+
+class UpstreamStatusError(UpstreamError):
+    """Every attempt ended in a retryable HTTP status."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Upstream returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter") bounded by max_delay."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retry number `attempt` + 1.
+
+        A server-provided Retry-After is a floor, not a suggestion.
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a rolling window of calls.
+
+    closed -> open when at least `min_calls` of the last `window` calls
+    were recorded and the failure ratio reaches `error_threshold`.
+    open -> half_open after `open_seconds`; then up to `half_open_calls`
+    probes are let through: one success closes the circuit, a failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_threshold: float,
+        min_calls: int,
+        window: int,
+        open_seconds: float,
+        half_open_calls: int = 1,
+        name: str = "llm",
+    ):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.name = name
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._probes = 0
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            print(f"⚡ Circuit '{self.name}' {self.state} -> {state}")
+            LLM_CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+            self.state = state
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self._transition(self.HALF_OPEN)
+            self._half_opened_at = time.monotonic()
+            self._probes = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                # A probe that never reported back must not wedge the circuit
+                if time.monotonic() - self._half_opened_at < self.open_seconds:
+                    return False
+                self._half_opened_at = time.monotonic()
+                self._probes = 0
+            self._probes += 1
+        return True
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of an attempted call."""
+        if self.state == self.HALF_OPEN:
+            if success:
+                self._outcomes.clear()
+                self._transition(self.CLOSED)
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        if len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.error_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._transition(self.OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        failures = self._outcomes.count(False)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_error_rate": round(failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+        }
+
+
+class TokenBucket:
+    """Classic token bucket; `refill_per_second` tokens accrue up to `capacity`."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class UpstreamLimiter:
+    """
+    Concurrency cap plus request/token rate budgets for one upstream.
+
+    Rates are per worker process: divide the provider quota by the number
+    of gunicorn workers. 0 disables a limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_wait_seconds: float,
+    ):
+        self.max_wait_seconds = max_wait_seconds
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute > 0 else None
+        self._cooldown_until = 0.0
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(0.0, self._cooldown_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def _take(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+    async def take(self, tokens: int, deadline: float) -> None:
+        """Spend one request and `tokens` from the budgets, waiting up to the deadline."""
+        while True:
+            wait = self._wait_time(tokens)
+            if wait <= 0:
+                self._take(tokens)
+                return
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                raise RateLimitedError(f"LLM quota exhausted; next slot in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    def try_take(self, tokens: int) -> bool:
+        """Spend the budgets only if that needs no waiting (used for hedges)."""
+        if self._wait_time(tokens) > 0:
+            return False
+        self._take(tokens)
+        return True
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """Return over-estimated tokens once the real usage is known."""
+        if self.tokens is not None and actual is not None and actual < estimated:
+            self.tokens.refund(estimated - actual)
+
+    def cool_down(self, seconds: float) -> None:
+        """Hold all new calls back, e.g. after the upstream answered 429 + Retry-After."""
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    @asynccontextmanager
+    async def slot(self, deadline: float) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of a request."""
+        if self._slots is not None:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitedError("Too many concurrent LLM requests")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "request_budget": round(self.requests.tokens, 1) if self.requests else None,
+            "token_budget": round(self.tokens.tokens, 1) if self.tokens else None,
+            "cooling_down": self._cooldown_until > time.monotonic(),
+        }
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies, for the hedge delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class UpstreamResilience:
+    """Limiter, breaker, retries and hedging around one upstream endpoint."""
+
+    def __init__(
+        self,
+        retry: RetryPolicy,
+        breaker: CircuitBreaker,
+        limiter: UpstreamLimiter,
+        budget_seconds: float,
+        attempt_timeout_seconds: float,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_max_delay: float = 10.0,
+        name: str = "llm",
+    ):
+        self.retry = retry
+        self.breaker = breaker
+        self.limiter = limiter
+        self.budget_seconds = budget_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.name = name
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @asynccontextmanager
+    async def request(self, send: Send, estimated_tokens: int = 0, kind: str = "complete") -> AsyncIterator[httpx.Response]:
+        """
+        Perform one logical upstream request.
+
+        Args:
+            send: Coroutine function taking a per-attempt timeout (seconds)
+                and returning a response; called once per attempt or hedge
+            estimated_tokens: Prompt + completion token estimate for the limiter
+            kind: Latency class for hedging ("complete" or "stream")
+
+        Yields:
+            The winning response (non-retryable status). It is closed when
+            the block exits, so streamed bodies must be consumed inside it.
+
+        Raises:
+            CircuitOpenError, RateLimitedError, UpstreamStatusError, httpx.HTTPError
+        """
+        deadline = time.monotonic() + self.budget_seconds
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+        admit_by = min(deadline, time.monotonic() + self.limiter.max_wait_seconds)
+        async with self.limiter.slot(admit_by):
+            await self.limiter.take(estimated_tokens, admit_by)
+            response = await self._send_with_retries(send, estimated_tokens, kind, deadline)
+            try:
+                yield response
+            finally:
+                await response.aclose()
+
+    def settle(self, estimated_tokens: int, usage: Optional[dict]) -> None:
+        """Reconcile the token budget with the upstream-reported usage."""
+        if usage:
+            self.limiter.settle(estimated_tokens, usage.get("total_tokens"))
+
+    async def _send_with_retries(self, send: Send, estimated_tokens: int, kind: str, deadline: float) -> httpx.Response:
+        last_error: Exception = UpstreamError("No attempt made")
+        for attempt in range(self.retry.max_attempts):
+            if attempt:
+                if not self.breaker.allow():
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                await self.limiter.take(estimated_tokens, deadline)
+
+            retry_after = None
+            try:
+                response = await self._send_hedged(send, estimated_tokens, kind, deadline)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = e
+                reason = "timeout" if isinstance(e, httpx.TimeoutException) else "transport"
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                if response.status_code == 429 and retry_after:
+                    self.limiter.cool_down(retry_after)
+                await response.aclose()
+                last_error = UpstreamStatusError(response.status_code)
+                reason = str(response.status_code)
+
+            if attempt + 1 >= self.retry.max_attempts:
+                break
+            delay = self.retry.delay(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                break
+            self.retries += 1
+            LLM_RETRIES.labels(self.name, reason).inc()
+            print(f"🔁 Retrying {self.name} in {delay:.2f}s after {reason}")
+            await asyncio.sleep(delay)
+
+        raise last_error
+
+    async def _attempt(self, send: Send, kind: str, deadline: float) -> httpx.Response:
+        """One physical request; feeds the breaker and the latency window."""
+        timeout = min(self.attempt_timeout_seconds, max(0.1, deadline - time.monotonic()))
+        self.attempts += 1
+        start = time.monotonic()
+        try:
+            response = await send(timeout)
+        except (httpx.TimeoutException, httpx.TransportError):
+            self.breaker.record(False)
+            raise
+        # 429 is our quota, not upstream health: it does not trip the breaker
+        if response.status_code != 429:
+            self.breaker.record(response.status_code < 500)
+        if response.status_code < 400:
+            self._latency.setdefault(kind, LatencyTracker()).record(time.monotonic() - start)
+        return response
+
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        if not self.hedge_enabled or kind not in self._latency:
+            return None
+        p95 = self._latency[kind].percentile(95)
+        if p95 is None:
+            return None
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    async def _send_hedged(self, send: Send, estimated_tokens: int, kind: str, deadline: float) -> httpx.Response:
+        delay = self._hedge_delay(kind)
+        if delay is None:
+            return await self._attempt(send, kind, deadline)
+
+        primary = asyncio.create_task(self._attempt(send, kind, deadline))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Hedge only when the primary is slow and the quota has room to spare
+            if not done and self.breaker.state == CircuitBreaker.CLOSED and self.limiter.try_take(estimated_tokens):
+                self.hedges += 1
+                LLM_HEDGES.labels(self.name, "sent").inc()
+                tasks.add(asyncio.create_task(self._attempt(send, kind, deadline)))
+
+            # First usable response wins; a retryable one is only kept as a fallback
+            winner: Optional[httpx.Response] = None
+            fallback: Optional[httpx.Response] = None
+            error: Optional[BaseException] = None
+            while tasks and winner is None:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    response = task.result()
+                    if winner is None and response.status_code not in RETRYABLE_STATUSES:
+                        winner = response
+                        if task is not primary:
+                            self.hedge_wins += 1
+                            LLM_HEDGES.labels(self.name, "won").inc()
+                    elif fallback is None:
+                        fallback = response
+                    else:
+                        await response.aclose()
+
+            if winner is not None:
+                if fallback is not None:
+                    await fallback.aclose()
+                return winner
+            if fallback is not None:
+                return fallback
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+                task.add_done_callback(_close_abandoned)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.stats(),
+            "limiter": self.limiter.stats(),
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": {
+                kind: tracker.percentile(95) for kind, tracker in self._latency.items()
+            },
+        }
+
+
+def _close_abandoned(task: "asyncio.Task") -> None:
+    """Close the response of a losing hedge that completed despite cancellation."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
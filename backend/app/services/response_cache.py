@@ -0,0 +1,170 @@
+"""
+LLM Response Cache
+
+Caches assistant replies in front of the Groq call. Keys combine the
+normalized user message, detected language, a hash of the knowledge
+context, the model and its sampling settings, so a hit is only served
+when the upstream request would have been identical.
+
+Two tiers: a per-worker TTL/LRU cache and an optional shared tier
+(Redis-compatible, see REDIS_URL) that lets gunicorn workers reuse each
+other's answers.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.cache import TTLCache, create_shared_backend
+from app.services.domain_validator import normalize_query
+
+
+class ResponseCache:
+    """Two-tier cache of LLM responses with hit/miss counters."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        history_turns: int = 0,
+        shared_backend=None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.history_turns = history_turns
+        self.local = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared = shared_backend
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+        self.stores = 0
+        self.shared_errors = 0
+
+    def make_key(
+        self,
+        user_message: str,
+        language: str,
+        context: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> Optional[str]:
+        """
+        Build the cache key for a request, or None if it must not be cached.
+
+        Turns with history are only cacheable when `history_turns` > 0, and
+        are then keyed on a digest of that many trailing messages.
+        """
+        if not self.enabled:
+            return None
+
+        history_digest = ""
+        if conversation_history:
+            if self.history_turns <= 0:
+                return None
+            tail = [
+                [msg["role"], normalize_query(msg["content"])]
+                for msg in conversation_history[-self.history_turns:]
+            ]
+            history_digest = _digest(tail)
+
+        return "llm:" + request_fingerprint(
+            user_message, language, context, model, temperature, max_tokens, history_digest
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            self.hits_local += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ Shared response cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.hits_shared += 1
+                self.local.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        self.local.set(key, value)
+        self.stores += 1
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ Shared response cache write failed: {e}")
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_local + self.hits_shared + self.misses
+        hits = self.hits_local + self.hits_shared
+        return {
+            "enabled": self.enabled,
+            "hits_local": self.hits_local,
+            "hits_shared": self.hits_shared,
+            "misses": self.misses,
+            "stores": self.stores,
+            "shared_errors": self.shared_errors,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local": self.local.stats(),
+            "shared_tier": self.shared is not None,
+        }
+
+
+def request_fingerprint(
+    user_message: str,
+    language: str,
+    context: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    history_digest: str = "",
+) -> str:
+    """Digest of everything that determines the upstream LLM request."""
+    material = [
+        normalize_query(user_message),
+        language,
+        _context_digest(context),
+        model,
+        temperature,
+        max_tokens,
+        history_digest,
+    ]
+    return _digest(material)
+
+
+@lru_cache(maxsize=256)
+def _context_digest(context: str) -> str:
+    # Contexts repeat (one per passage combination); hash each only once
+    return _digest(context)
+
+
+def _digest(value: Any) -> str:
+    data = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    history_turns=settings.response_cache_history_turns,
+    shared_backend=create_shared_backend(settings.redis_url),
+    enabled=settings.response_cache_enabled,
+)
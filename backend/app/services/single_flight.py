@@ -0,0 +1,244 @@
+"""
+Single-Flight Request Coalescing
+
+When many users send the same first message within seconds (a trending
+question), only one upstream LLM call runs per worker. Requests arriving
+while an identical one is in flight follow it:
+
+- Completions: followers await the leader's result, for at most
+  LLM_COALESCE_MAX_WAIT_SECONDS, then make their own call.
+- Streams: the upstream stream runs in a background task that records
+  its deltas; every subscriber (the leader included) replays them and
+  then follows live. The upstream call is cancelled once the last
+  subscriber disconnects, and the flight is dropped at once so later
+  requests start afresh. A follower that sees no delta within the wait
+  limit starts its own stream. A stream that fails or is cancelled after
+  the first delta raises StreamInterruptedError (or the upstream error)
+  in every subscriber that already received part of it.
+
+Only requests without conversation history are coalesced; the key covers
+the normalized message, language, knowledge context and model settings
+(see response_cache.request_fingerprint).
+"""
+
+import asyncio
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.config import settings
+from app.metrics import LLM_COALESCED, LLM_COALESCED_FOLLOWERS
+from app.services.resilience import StreamInterruptedError
+
+T = TypeVar("T")
+
+# Result handed to followers when the leader raised or was cancelled
+_FAILED = object()
+
+
+class _Flight:
+    """One in-flight request and its followers."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.started = time.monotonic()
+        self.followers = 0
+        # Completions: resolved with the leader's result
+        self.future: Optional[asyncio.Future] = None
+        # Streams: deltas so far, and the task producing them
+        self.chunks: List[str] = []
+        self.done = False
+        self.failed = False
+        # Streams: what the upstream raised, re-raised to subscribers mid-reply
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, failed: bool = False) -> None:
+        self.done = True
+        self.failed = failed
+        self._notify()
+
+    def _notify(self) -> None:
+        # Wake every waiter, then start a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self, timeout: Optional[float]) -> bool:
+        """Wait for a new chunk or the end of the stream; False on timeout."""
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class SingleFlight:
+    """Coalesces identical in-flight LLM requests within one worker."""
+
+    def __init__(self, max_wait_seconds: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_wait_seconds = max_wait_seconds
+        self._flights: Dict[str, _Flight] = {}
+
+    async def do(self, key: Optional[str], fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn`, or share the result of an identical call already running.
+
+        Args:
+            key: Coalescing key, or None to always run `fn`
+            fn: The upstream call
+
+        Returns:
+            The result of `fn`, from this call or the leader's
+        """
+        if not self.enabled or key is None:
+            return await fn()
+
+        key = "complete:" + key
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.followers += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight.future), self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                result = _FAILED
+            if result is not _FAILED:
+                LLM_COALESCED.labels("complete", "follower").inc()
+                return result
+            LLM_COALESCED.labels("complete", "fallback").inc()
+            return await fn()
+
+        flight = _Flight("complete")
+        flight.future = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        LLM_COALESCED.labels("complete", "leader").inc()
+        result = _FAILED
+        try:
+            result = await fn()
+            return result
+        finally:
+            flight.future.set_result(result)
+            self._end(key, flight)
+
+    async def stream(self, key: Optional[str], fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Stream `fn`, or follow an identical stream already running.
+
+        Args:
+            key: Coalescing key, or None to always run `fn`
+            fn: Starts the upstream stream
+
+        Yields:
+            The stream's chunks, from the beginning
+        """
+        if not self.enabled or key is None:
+            async with aclosing(fn()) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            return
+
+        key = "stream:" + key
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight("stream")
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, fn))
+            LLM_COALESCED.labels("stream", "leader").inc()
+        else:
+            flight.followers += 1
+
+        sent = 0
+        fallback = False
+        flight.subscribers += 1
+        try:
+            while True:
+                if sent < len(flight.chunks):
+                    chunk = flight.chunks[sent]
+                    sent += 1
+                    yield chunk
+                    continue
+                if flight.done:
+                    if flight.failed and sent:
+                        # Failed or cancelled mid-reply: subscribers must not
+                        # take it as complete
+                        raise flight.error or StreamInterruptedError(
+                            f"Coalesced stream ended after {sent} deltas"
+                        )
+                    # A stream that failed before its first chunk is retried alone
+                    fallback = flight.failed and sent == 0
+                    break
+                # Followers only wait so long for the first chunk
+                timeout = None if leader or sent else self.max_wait_seconds
+                if not await flight.wait_for_change(timeout):
+                    fallback = True
+                    break
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more: abort the upstream stream,
+                # and stop new requests joining it before the task ends
+                self._detach(key, flight)
+                flight.task.cancel()
+
+        if not leader:
+            LLM_COALESCED.labels("stream", "fallback" if fallback else "follower").inc()
+        if fallback:
+            async with aclosing(fn()) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+
+    async def _pump(self, key: str, flight: _Flight, fn: Callable[[], AsyncIterator[str]]) -> None:
+        """Run the upstream stream of a flight, recording its chunks."""
+        failed = True
+        try:
+            async with aclosing(fn()) as chunks:
+                async for chunk in chunks:
+                    flight.push(chunk)
+            failed = False
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            flight.error = e
+            print(f"⚠️ Coalesced stream failed: {e}")
+        finally:
+            flight.finish(failed=failed)
+            self._end(key, flight)
+
+    def _detach(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _end(self, key: str, flight: _Flight) -> None:
+        self._detach(key, flight)
+        LLM_COALESCED_FOLLOWERS.labels(flight.mode).observe(flight.followers)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "in_flight": [
+                {
+                    "key": key[:24],
+                    "followers": flight.followers,
+                    "subscribers": flight.subscribers,
+                    "chunks": len(flight.chunks),
+                    "age_seconds": round(now - flight.started, 3),
+                }
+                for key, flight in self._flights.items()
+            ],
+        }
+
+
+# Global single-flight instance
+single_flight = SingleFlight(
+    max_wait_seconds=settings.llm_coalesce_max_wait_seconds,
+    enabled=settings.llm_coalesce_enabled,
+)
@@ -2,9 +2,17 @@
 Tamil Nadu Real Estate Knowledge Base
 
 Contains comprehensive information about real estate processes,
-regulations, and requirements specific to Tamil Nadu, India.
+regulations, and requirements specific to Tamil Nadu, India, and an
+inverted index (BM25) that retrieves the passages relevant to a query.
 """
 
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
 TN_KNOWLEDGE_BASE = {
     "property_registration": {
         "process": [
@@ -157,58 +165,325 @@ TN_KNOWLEDGE_BASE = {
 }
 
 
-def get_knowledge_context(query_lower: str) -> str:
+# ---------------- RETRIEVAL ---------------- #
+
+@dataclass(frozen=True)
+class KnowledgePassage:
+    """
+    One retrievable block of knowledge, rendered once at import.
+    
+    Attributes:
+        key: Stable identifier (used for ordering and prompt caching)
+        text: Rendered passage exactly as it goes into the prompt
+        keywords: Trigger terms in English, Tanglish and Tamil script;
+            a passage is only returned when at least one of them matches
+    """
+    key: str
+    text: str
+    keywords: Tuple[str, ...]
+
+
+def _render_passages() -> List[KnowledgePassage]:
+    """Render the knowledge base into prompt-ready passages."""
+    kb = TN_KNOWLEDGE_BASE
+    docs = kb['required_documents']
+    loan = kb['bank_loan']
+    stamp = kb['stamp_duty_registration']
+    units = kb['measurement_units']
+    chennai = kb['chennai_specific']
+    
+    return [
+        KnowledgePassage(
+            key="property_registration",
+            text="PROPERTY REGISTRATION PROCESS:\n" +
+                 "\n".join(kb['property_registration']['process']),
+            keywords=('register', 'registration', 'sub-registrar', 'registrar',
+                      'pathivu', 'pativu', 'பதிவு'),
+        ),
+        KnowledgePassage(
+            key="required_documents",
+            text=f"REQUIRED DOCUMENTS:\nBuyer: {', '.join(docs['buyer'])}\n" +
+                 f"Seller: {', '.join(docs['seller'][:5])}\n" +
+                 f"Property: {', '.join(docs['property'][:4])}",
+            keywords=('document', 'documents', 'papers', 'aavanam', 'avanam',
+                      'ஆவணம்', 'ஆவணங்கள்'),
+        ),
+        KnowledgePassage(
+            key="bank_loan",
+            text=f"BANK LOAN INFORMATION:\nEligibility: {', '.join(loan['eligibility'][:3])}\n" +
+                 f"Process: {', '.join(loan['process'][:4])}",
+            keywords=('loan', 'bank', 'finance', 'emi', 'mortgage', 'kadan',
+                      'கடன்', 'வங்கி'),
+        ),
+        KnowledgePassage(
+            key="stamp_duty_registration",
+            text="STAMP DUTY & REGISTRATION:\n" +
+                 f"Stamp Duty: {stamp['stamp_duty']}\n" +
+                 f"Registration Fee: {stamp['registration_fee']}\n" +
+                 f"Women Benefit: {stamp['women_benefit']}",
+            keywords=('stamp', 'duty', 'fee', 'fees', 'charges', 'முத்திரை'),
+        ),
+        KnowledgePassage(
+            key="measurement_units",
+            text="LAND MEASUREMENT UNITS IN TAMIL NADU:\n" +
+                 f"Cent: {units['cent']['conversion']} - {units['cent']['usage']}\n" +
+                 f"Ground: {units['ground']['conversion']} - {units['ground']['relation']}\n" +
+                 f"Acre: {units['acre']['conversion']}\n" +
+                 f"Common conversions: {', '.join(units['common_conversions'][:3])}",
+            keywords=('cent', 'cents', 'ground', 'acre', 'gunta', 'sqft', 'sq ft',
+                      'square feet', 'measurement', 'size', 'area',
+                      'சென்ட்', 'ஏக்கர்', 'சதுர அடி'),
+        ),
+        KnowledgePassage(
+            key="authorities",
+            text="KEY AUTHORITIES:\n" +
+                 "TNRERA: Regulates real estate projects\n" +
+                 "DTCP: Approves layouts outside Chennai\n" +
+                 "CMDA: Planning authority for Chennai",
+            keywords=('tnrera', 'rera', 'dtcp', 'cmda', 'authority'),
+        ),
+        KnowledgePassage(
+            key="red_flags",
+            text="RED FLAGS WHEN BUYING PROPERTY:\n" +
+                 "\n".join(f"- {flag}" for flag in kb['red_flags']),
+            keywords=('red flag', 'red flags', 'risk', 'risks', 'fraud', 'fake',
+                      'dispute', 'disputed', 'poramboke', 'safe', 'verify'),
+        ),
+        KnowledgePassage(
+            key="chennai_specific",
+            text="CHENNAI CIVIC SERVICES:\n" +
+                 f"Planning Authority: {chennai['planning_authority']}\n" +
+                 f"Property Tax: {chennai['property_tax']}\n" +
+                 f"Water Connection: {chennai['water_connection']}\n" +
+                 f"Electricity: {chennai['electricity']}",
+            keywords=('property tax', 'water connection', 'metro water', 'cmwssb',
+                      'electricity', 'eb connection', 'tangedco', 'corporation'),
+        ),
+    ]
+
+
+# Tokens: runs of Latin letters/digits or Tamil script (incl. vowel signs)
+_TOKEN_RE = re.compile(r'[0-9a-z\u0B80-\u0BFF]+')
+_TAMIL_RE = re.compile(r'[\u0B80-\u0BFF]')
+
+# English inflections folded onto a keyword stem ('registered' -> 'register').
+# Tamil keywords match anywhere inside a token instead, since Tamil words
+# take suffixes and form compounds ('பதிவுக்கு', 'பத்திரப்பதிவு' -> 'பதிவு').
+_ENGLISH_INFLECTIONS = ('s', 'es', 'ed', 'ing', 'er', 'ers')
+
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from if in is it of on or the to with'.split()
+)
+
+# BM25 parameters and the weight of keyword hits relative to body text
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_KEYWORD_TF = 3
+
+DEFAULT_TOP_K = 6
+DEFAULT_MAX_CHARS = 3000
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class KnowledgeIndex:
+    """
+    Inverted index with BM25 scoring over knowledge passages.
+    
+    Built once; BM25 weights are precomputed per (term, passage), so a
+    lookup costs one tokenization of the query plus a dict probe per
+    distinct query term, independent of how many passages are indexed.
+    """
+    
+    def __init__(self, passages: List[KnowledgePassage]):
+        self.passages = passages
+        self._keyword_terms: Dict[str, Tuple[int, ...]] = {}
+        self._phrase_starts: Dict[str, Tuple[str, ...]] = {}
+        self._tamil_keywords: Tuple[str, ...] = ()
+        
+        term_counts_per_doc: List[Counter] = []
+        keyword_docs: Dict[str, Set[int]] = {}
+        phrases: Dict[str, Set[str]] = {}
+        tamil_keywords: Set[str] = set()
+        
+        for doc_id, passage in enumerate(passages):
+            term_counts: Counter = Counter(
+                token for token in _tokenize(passage.text) if token not in _STOPWORDS
+            )
+            for keyword in passage.keywords:
+                words = _tokenize(keyword)
+                term = " ".join(words)
+                term_counts[term] += _KEYWORD_TF
+                keyword_docs.setdefault(term, set()).add(doc_id)
+                if len(words) > 1:
+                    phrases.setdefault(words[0], set()).add(term)
+                elif _TAMIL_RE.match(term):
+                    tamil_keywords.add(term)
+            term_counts_per_doc.append(term_counts)
+        
+        self._keyword_terms = {term: tuple(sorted(docs)) for term, docs in keyword_docs.items()}
+        self._phrase_starts = {
+            first: tuple(sorted(terms, key=len, reverse=True)) for first, terms in phrases.items()
+        }
+        self._tamil_keywords = tuple(sorted(tamil_keywords))
+        self._inflections = {
+            term + suffix: term
+            for term in keyword_docs
+            if " " not in term and not _TAMIL_RE.match(term)
+            for suffix in _ENGLISH_INFLECTIONS
+            if term + suffix not in keyword_docs
+        }
+        
+        # Precompute BM25 weight of every (term, passage) pair
+        total = len(passages)
+        doc_lengths = [sum(counts.values()) for counts in term_counts_per_doc]
+        avg_doc_length = (sum(doc_lengths) / total) if total else 1.0
+        document_frequency: Counter = Counter()
+        for counts in term_counts_per_doc:
+            document_frequency.update(counts.keys())
+        
+        self._weights: Dict[str, Dict[int, float]] = {}
+        for doc_id, counts in enumerate(term_counts_per_doc):
+            norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * doc_lengths[doc_id] / avg_doc_length)
+            for term, tf in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                self._weights.setdefault(term, {})[doc_id] = idf * tf * (_BM25_K1 + 1) / (tf + norm)
+    
+    def _query_terms(self, query: str) -> Counter:
+        """Unigrams, keyword phrases and folded stems found in the query."""
+        tokens = _tokenize(query)
+        terms: Counter = Counter(tokens)
+        keyword_terms = self._keyword_terms
+        
+        # Multi-word keywords ('square feet', 'sub registrar')
+        if self._phrase_starts:
+            for index, token in enumerate(tokens):
+                for phrase in self._phrase_starts.get(token, ()):
+                    length = phrase.count(" ") + 1
+                    if " ".join(tokens[index:index + length]) == phrase:
+                        terms[phrase] += 1
+        
+        # Fold inflected forms onto keyword stems
+        inflections = self._inflections
+        for token, count in list(terms.items()):
+            stem = inflections.get(token)
+            if stem is not None:
+                terms[stem] += count
+            elif token >= "\u0b80" and token not in keyword_terms:
+                for keyword in self._tamil_keywords:
+                    if keyword in token:
+                        terms[keyword] += count
+        return terms
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        max_chars: int = DEFAULT_MAX_CHARS
+    ) -> List[KnowledgePassage]:
+        """
+        Return the best-matching passages within the budget.
+        
+        Args:
+            query: User query (any case)
+            top_k: Maximum number of passages
+            max_chars: Maximum combined length of the returned passages
+            
+        Returns:
+            Passages in knowledge-base order (stable prompt bytes)
+        """
+        terms = self._query_terms(query)
+        
+        eligible: Set[int] = set()
+        for term in terms:
+            docs = self._keyword_terms.get(term)
+            if docs:
+                eligible.update(docs)
+        if not eligible:
+            return []
+        
+        scores = dict.fromkeys(eligible, 0.0)
+        for term, query_tf in terms.items():
+            weights = self._weights.get(term)
+            if not weights:
+                continue
+            for doc_id, weight in weights.items():
+                if doc_id in scores:
+                    scores[doc_id] += query_tf * weight
+        
+        selected = []
+        used = 0
+        for doc_id in sorted(scores, key=lambda d: (-scores[d], d)):
+            if len(selected) >= top_k:
+                break
+            cost = len(self.passages[doc_id].text) + (2 if selected else 0)
+            if used + cost > max_chars:
+                continue
+            selected.append(doc_id)
+            used += cost
+        
+        return [self.passages[doc_id] for doc_id in sorted(selected)]
+
+
+KNOWLEDGE_PASSAGES = _render_passages()
+PASSAGES_BY_KEY = {passage.key: passage for passage in KNOWLEDGE_PASSAGES}
+knowledge_index = KnowledgeIndex(KNOWLEDGE_PASSAGES)
+
+
+@lru_cache(maxsize=256)
+def context_for_keys(keys: Tuple[str, ...]) -> str:
+    """
+    Join passages into a context block, cached per set of passage keys.
+    
+    Repeated key sets return the same string object, which lets prompt
+    assembly downstream be cached cheaply.
+    
+    Args:
+        keys: Passage keys in knowledge-base order
+        
+    Returns:
+        Context string (empty when no keys)
+    """
+    return "\n\n".join(PASSAGES_BY_KEY[key].text for key in keys)
+
+
+def retrieve_passages(
+    query: str,
+    top_k: int = DEFAULT_TOP_K,
+    max_chars: int = DEFAULT_MAX_CHARS
+) -> List[KnowledgePassage]:
+    """
+    Get the knowledge passages relevant to a query.
+    
+    Args:
+        query: User query
+        top_k: Maximum number of passages
+        max_chars: Maximum combined length of the passages
+        
+    Returns:
+        Matching passages in knowledge-base order
+    """
+    return knowledge_index.search(query, top_k=top_k, max_chars=max_chars)
+
+
+def get_knowledge_context(
+    query_lower: str,
+    top_k: int = DEFAULT_TOP_K,
+    max_chars: int = DEFAULT_MAX_CHARS
+) -> str:
     """
     Get relevant knowledge base context based on query keywords.
     
     Args:
         query_lower: Lowercase user query
+        top_k: Maximum number of passages
+        max_chars: Maximum combined length of the passages
         
     Returns:
         Relevant context string
     """
-    context_parts = []
-    
-    # Check for registration-related queries
-    if any(word in query_lower for word in ['register', 'registration', 'sub-registrar', 'பதிவு']):
-        context_parts.append("PROPERTY REGISTRATION PROCESS:\n" + 
-                           "\n".join(TN_KNOWLEDGE_BASE['property_registration']['process']))
-    
-    # Check for document-related queries
-    if any(word in query_lower for word in ['document', 'documents', 'papers', 'ஆவணம்', 'ஆவணங்கள்']):
-        docs = TN_KNOWLEDGE_BASE['required_documents']
-        context_parts.append(f"REQUIRED DOCUMENTS:\nBuyer: {', '.join(docs['buyer'])}\n" +
-                           f"Seller: {', '.join(docs['seller'][:5])}\n" +
-                           f"Property: {', '.join(docs['property'][:4])}")
-    
-    # Check for loan-related queries
-    if any(word in query_lower for word in ['loan', 'bank', 'finance', 'கடன்', 'வங்கி']):
-        loan = TN_KNOWLEDGE_BASE['bank_loan']
-        context_parts.append(f"BANK LOAN INFORMATION:\nEligibility: {', '.join(loan['eligibility'][:3])}\n" +
-                           f"Process: {', '.join(loan['process'][:4])}")
-    
-    # Check for stamp duty queries
-    if any(word in query_lower for word in ['stamp', 'duty', 'fee', 'charges', 'முத்திரை']):
-        stamp = TN_KNOWLEDGE_BASE['stamp_duty_registration']
-        context_parts.append(f"STAMP DUTY & REGISTRATION:\n" +
-                           f"Stamp Duty: {stamp['stamp_duty']}\n" +
-                           f"Registration Fee: {stamp['registration_fee']}\n" +
-                           f"Women Benefit: {stamp['women_benefit']}")
-    
-    # Check for measurement unit queries
-    if any(word in query_lower for word in ['cent', 'cents', 'ground', 'acre', 'gunta', 'sqft', 'square feet', 'measurement', 'size', 'area']):
-        units = TN_KNOWLEDGE_BASE['measurement_units']
-        context_parts.append(f"LAND MEASUREMENT UNITS IN TAMIL NADU:\n" +
-                           f"Cent: {units['cent']['conversion']} - {units['cent']['usage']}\n" +
-                           f"Ground: {units['ground']['conversion']} - {units['ground']['relation']}\n" +
-                           f"Acre: {units['acre']['conversion']}\n" +
-                           f"Common conversions: {', '.join(units['common_conversions'][:3])}")
-    
-    # Check for authority-related queries
-    if any(word in query_lower for word in ['tnrera', 'rera', 'dtcp', 'cmda', 'authority']):
-        context_parts.append("KEY AUTHORITIES:\n" +
-                           "TNRERA: Regulates real estate projects\n" +
-                           "DTCP: Approves layouts outside Chennai\n" +
-                           "CMDA: Planning authority for Chennai")
-    
-    return "\n\n".join(context_parts) if context_parts else ""
+    passages = retrieve_passages(query_lower, top_k=top_k, max_chars=max_chars)
+    return context_for_keys(tuple(passage.key for passage in passages))
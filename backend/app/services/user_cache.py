@@ -0,0 +1,218 @@
+"""
+Authenticated User Cache
+
+Skips the per-request `find_one(User)` in get_current_user. Two tiers:
+
+- Local: hash of the bearer token -> user snapshot. An entry never
+  outlives the token's own `exp`, so a hit can skip JWT decoding too.
+- Shared (optional, see REDIS_URL): user id -> user snapshot, so other
+  workers can skip Mongo for tokens they have not seen yet.
+
+Snapshots are stored as documents and rebuilt into a fresh User on every
+hit, so one request mutating its user cannot leak into another.
+invalidate_user() drops a user everywhere after their record changes.
+
+Snapshots leave out the password hash: a cached User carries
+NO_PASSWORD_HASH, which verifies no password. Code that checks passwords
+(login) loads the user from Mongo.
+"""
+
+import hashlib
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from bson import json_util
+
+from app.config import settings
+from app.models import User
+from app.services.cache import TTLCache, create_shared_backend
+
+# Stands in for the password hash on cached users; not a valid bcrypt hash
+NO_PASSWORD_HASH = "!"
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    """Cacheable document of a user, without the password hash."""
+    fields = set(User.__odm_fields__) - {"hashed_password"}
+    return user.model_dump_doc(include=fields)
+
+
+def _restore(doc: Dict[str, Any]) -> User:
+    """Fresh User from a snapshot, unmodified as if loaded by the engine."""
+    user = User.model_validate_doc({**doc, "hashed_password": NO_PASSWORD_HASH})
+    # Saving it back writes only fields a request changes, never the placeholder
+    object.__setattr__(user, "__fields_modified__", set())
+    return user
+
+
+class UserCache:
+    """Two-tier cache of token -> User with hit/miss counters."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        shared_backend=None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.local = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared = shared_backend
+        # user id -> (generation, when invalidated), bumped by invalidate_user();
+        # local entries from an older generation are stale. A record is pruned
+        # once every entry it could outdate has expired (after ttl_seconds).
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._next_prune = time.monotonic() + ttl_seconds
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Never keep raw bearer tokens in memory longer than the request
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _shared_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def _generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, (0, 0.0))[0]
+
+    def _prune_generations(self, now: float) -> None:
+        """Drop invalidation records older than the longest local entry."""
+        if now < self._next_prune:
+            return
+        cutoff = now - self.ttl_seconds
+        self._generations = {
+            user_id: record for user_id, record in self._generations.items() if record[1] > cutoff
+        }
+        self._next_prune = now + self.ttl_seconds
+
+    def lookup(self, token: str) -> Optional[User]:
+        """
+        User for a token from the local tier, or None.
+
+        Args:
+            token: Raw bearer token
+
+        Returns:
+            A fresh User instance, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        entry = self.local.get(self._token_key(token))
+        if entry is not None:
+            user_id, generation, doc = entry
+            if generation == self._generation(user_id):
+                self.hits_local += 1
+                return _restore(doc)
+            self.local.delete(self._token_key(token))
+        return None
+
+    async def lookup_shared(self, user_id: str) -> Optional[User]:
+        """User by id from the shared tier, or None (counts the miss)."""
+        if not self.enabled:
+            return None
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(self._shared_key(user_id))
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ Shared user cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.hits_shared += 1
+                return _restore(json_util.loads(value))
+
+        self.misses += 1
+        return None
+
+    async def store(
+        self,
+        token: str,
+        user: User,
+        expires_at: Optional[float] = None,
+        shared: bool = True,
+    ) -> None:
+        """
+        Cache a user for a token.
+
+        Args:
+            token: Raw bearer token
+            user: User the token resolved to
+            expires_at: Token `exp` (epoch seconds); the entry never outlives it
+            shared: Also write the shared tier (skip when the user came from it)
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+
+        user_id = str(user.id)
+        doc = _snapshot(user)
+        generation = self._generation(user_id)
+        self.local.set(self._token_key(token), (user_id, generation, doc), ttl_seconds=ttl)
+
+        if shared and self.shared is not None:
+            try:
+                await self.shared.set(self._shared_key(user_id), json_util.dumps(doc), self.ttl_seconds)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ Shared user cache write failed: {e}")
+
+    async def invalidate_user(self, user_id: str) -> None:
+        """
+        Forget every cached snapshot of a user.
+
+        Local entries of this worker are dropped at once; other workers'
+        local entries expire within the TTL.
+        """
+        now = time.monotonic()
+        self._prune_generations(now)
+        self._generations[user_id] = (self._generation(user_id) + 1, now)
+        self.invalidations += 1
+        if self.shared is not None:
+            try:
+                await self.shared.delete(self._shared_key(user_id))
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ Shared user cache delete failed: {e}")
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_local + self.hits_shared
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits_local": self.hits_local,
+            "hits_shared": self.hits_shared,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "tracked_invalidations": len(self._generations),
+            "shared_errors": self.shared_errors,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local": self.local.stats(),
+            "shared_tier": self.shared is not None,
+        }
+
+
+# Global user cache instance
+user_cache = UserCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl_seconds=settings.user_cache_ttl_seconds,
+    shared_backend=create_shared_backend(settings.redis_url),
+    enabled=settings.user_cache_enabled,
+)
@@ -0,0 +1,170 @@
+"""
+Domain Classifier Benchmark
+
+Compares the keyword rules alone with the rules plus the domain classifier
+(and the classifier alone) on the held-out part of app/data/domain_corpus.tsv:
+
+    precision       share of accepted queries that are about real estate
+    recall          share of real estate queries accepted
+    false accepts   off-topic queries let through to the LLM (wasted calls)
+    false rejects   real estate queries turned away (users retry)
+
+and times each gate per query, including the classifier on its own at
+MAX_QUERY_LENGTH.
+
+Exits non-zero unless rules + classifier lets through fewer off-topic
+queries than the rules alone (the point of the classifier: each false
+accept is a wasted LLM call), or if it is less precise, has lower recall,
+rejects any of the REGRESSION_ACCEPTS, or the classifier's p99 latency
+exceeds the budget, so a retrained model can be checked before it is
+committed.
+
+Usage:
+    python -m benchmarks.classifier
+    python -m benchmarks.classifier --all          # whole corpus, incl. training queries
+    python -m benchmarks.classifier --show-errors
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("DATABASE_URL", "mongodb://127.0.0.1:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+from app.services.domain_classifier import domain_classifier  # noqa: E402
+from app.services.domain_validator import (  # noqa: E402
+    MAX_QUERY_LENGTH, is_real_estate_query, keyword_verdict, normalize_query
+)
+from benchmarks.corpus import long_query  # noqa: E402
+from train_domain_classifier import load_corpus, precision_recall, split_corpus  # noqa: E402
+
+# p99 microseconds per classifier call
+CLASSIFIER_BUDGET_US = 1000.0
+
+# Real estate queries made of everyday words, which an earlier model scored
+# as off-topic; the gate must still accept them
+REGRESSION_ACCEPTS = [
+    "home loan interest rate",
+    "land rate in salem",
+    "plot rate near vellore",
+    "ground rate in velachery",
+    "land price trend salem",
+    "plot price in coimbatore",
+]
+
+
+def gates() -> Dict[str, Callable[[str], bool]]:
+    return {
+        "rules": lambda query: keyword_verdict(query)[0],
+        "rules + classifier": lambda query: is_real_estate_query(query)[0],
+        "classifier": lambda query: domain_classifier.probability(normalize_query(query)) >= 0.5,
+    }
+
+
+def latencies_us(func: Callable[[str], object], queries: List[str], rounds: int) -> List[float]:
+    """Per-call times in microseconds, best of `rounds` for each query."""
+    samples = []
+    for query in queries:
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func(query)
+            best = min(best, time.perf_counter() - start)
+        samples.append(best * 1e6)
+    return samples
+
+
+def p99(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[int(0.99 * (len(ordered) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword rules vs domain classifier")
+    parser.add_argument("--all", action="store_true", help="Evaluate the whole corpus, not just held-out queries")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed calls per query")
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    if domain_classifier is None:
+        print("❌ No domain classifier loaded; run train_domain_classifier.py first")
+        sys.exit(1)
+
+    train_set, test_set = split_corpus(load_corpus())
+    examples = train_set + test_set if args.all else test_set
+    queries = [query for _, _, query in examples]
+    labels = [label for label, _, _ in examples]
+    print(f"📚 {len(examples)} queries ({'whole corpus' if args.all else 'held out'}), "
+          f"{sum(labels)} about real estate\n")
+
+    failures = []
+    quality = {}
+    false_accept_counts = {}
+    print(f"{'gate':<22}{'precision':>10}{'recall':>8}{'f. acc':>8}{'f. rej':>8}"
+          f"{'p50 us':>9}{'p99 us':>9}")
+    for name, gate in gates().items():
+        predicted = [gate(query) for query in queries]
+        precision, recall = precision_recall(predicted, labels)
+        false_accepts = sum(1 for p, label in zip(predicted, labels) if p and not label)
+        false_rejects = sum(1 for p, label in zip(predicted, labels) if not p and label)
+        times = latencies_us(gate, queries, args.rounds)
+        quality[name] = (precision, recall)
+        false_accept_counts[name] = false_accepts
+        print(f"{name:<22}{precision:>10.3f}{recall:>8.3f}{false_accepts:>8}{false_rejects:>8}"
+              f"{statistics.median(times):>9.1f}{p99(times):>9.1f}")
+
+        if args.show_errors:
+            for query, p, label in zip(queries, predicted, labels):
+                if p != bool(label):
+                    print(f"     {'false accept' if p else 'false reject'}: {query}")
+
+    per_language = {}
+    for (label, language, query) in examples:
+        per_language.setdefault(language, []).append((label, query))
+    print()
+    for language, rows in sorted(per_language.items()):
+        cells = []
+        for name in ("rules", "rules + classifier"):
+            gate = gates()[name]
+            precision, recall = precision_recall([gate(q) for _, q in rows], [label for label, _ in rows])
+            cells.append(f"{name} {precision:.2f}/{recall:.2f}")
+        print(f"   {language:<9} (P/R)  " + "   ".join(cells))
+
+    worst = [long_query(language, MAX_QUERY_LENGTH) for language in ("english", "tanglish", "tamil")]
+    worst_times = latencies_us(lambda q: domain_classifier.probability(normalize_query(q)), worst, args.rounds)
+    classifier_p99 = max(p99(latencies_us(
+        lambda q: domain_classifier.probability(normalize_query(q)), queries, args.rounds
+    )), max(worst_times))
+    print(f"\n⏱️ Classifier p99 {classifier_p99:.1f}us (budget {CLASSIFIER_BUDGET_US:.0f}us), "
+          f"{max(worst_times):.1f}us at {MAX_QUERY_LENGTH} chars")
+
+    rules_precision, rules_recall = quality["rules"]
+    hybrid_precision, hybrid_recall = quality["rules + classifier"]
+    if false_accept_counts["rules + classifier"] >= false_accept_counts["rules"]:
+        failures.append(f"false accepts: rules + classifier {false_accept_counts['rules + classifier']} "
+                        f">= rules {false_accept_counts['rules']}")
+    if hybrid_precision < rules_precision:
+        failures.append(f"precision: rules + classifier {hybrid_precision:.3f} < rules {rules_precision:.3f}")
+    if hybrid_recall < rules_recall:
+        failures.append(f"recall: rules + classifier {hybrid_recall:.3f} < rules {rules_recall:.3f}")
+    for query in REGRESSION_ACCEPTS:
+        if not is_real_estate_query(query)[0]:
+            failures.append(f"regression: rules + classifier rejects {query!r}")
+    if classifier_p99 > CLASSIFIER_BUDGET_US:
+        failures.append(f"latency: classifier p99 {classifier_p99:.1f}us > {CLASSIFIER_BUDGET_US:.0f}us")
+
+    if failures:
+        print("\n❌ FAILED")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ Classifier improves on the keyword rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark Query Corpus
+
+Realistic user queries in the three supported languages, plus off-topic
+queries the domain validator must reject. Shared by the load test and
+the micro-benchmarks so both exercise the same traffic.
+"""
+
+ENGLISH_QUERIES = [
+    "What documents are required for property registration in Tamil Nadu?",
+    "How much is the stamp duty for buying a flat in Chennai?",
+    "Can I get a home loan for a DTCP approved plot?",
+    "What is the difference between patta and chitta?",
+    "How do I check the encumbrance certificate online?",
+    "Is a CMDA approval needed for an apartment in Tambaram?",
+    "What are the red flags when buying a resale house?",
+    "How many square feet is one cent of land?",
+    "What is the guideline value of land in Coimbatore?",
+    "Which bank gives the lowest interest rate for a housing loan?",
+    "How long does the sub-registrar office take to register a sale deed?",
+    "Should I verify the builder's RERA registration before booking?",
+    "What is the registration fee for a gift deed to my son?",
+    "How do I transfer the patta after purchasing agricultural land?",
+    "Can an NRI buy residential property in Madurai?",
+    "how much loan can i get on a 40 lakh apartment",
+    "what is a ground in chennai measurement",
+    "Is it safe to buy unapproved layout plots near OMR?",
+]
+
+TANGLISH_QUERIES = [
+    "Veedu vaanga enna documents venum?",
+    "Chennai la flat vaanganum, stamp duty evlo?",
+    "Patta transfer panna evlo naal aagum?",
+    "Bank loan kedaikuma plot ku?",
+    "Nilam vaangum bodhu enna check pannanum?",
+    "EC eppadi online la edukanum?",
+    "Registration office la enna kudukanum?",
+    "Indha property ku DTCP approval irukka nu eppadi therinjukalam?",
+    "Resale veedu vaanguradhu safe ah?",
+    "Oru ground evlo square feet?",
+    "Builder RERA la register pannirukkara nu paakanuma?",
+    "Agricultural land vaanga mudiyuma?",
+]
+
+TAMIL_QUERIES = [
+    "சொத்து பதிவுக்கு என்ன ஆவணங்கள் தேவை?",
+    "சென்னையில் வீடு வாங்க முத்திரை கட்டணம் எவ்வளவு?",
+    "பட்டா மாற்றம் செய்வது எப்படி?",
+    "வீட்டுக் கடன் பெற என்ன தகுதி வேண்டும்?",
+    "நிலம் வாங்கும் போது கவனிக்க வேண்டியவை என்ன?",
+    "வில்லங்கச் சான்றிதழ் எப்படி பெறுவது?",
+    "ஒரு சென்ட் என்பது எத்தனை சதுர அடி?",
+    "அடுக்குமாடி குடியிருப்பு வாங்க CMDA அனுமதி தேவையா?",
+]
+
+OFF_TOPIC_QUERIES = [
+    "Tell me a joke",
+    "Who won the cricket match yesterday?",
+    "Write me a python program to sort a list",
+    "What is the weather in Chennai today?",
+    "Suggest a good movie for the weekend",
+    "How do I cook chicken biryani?",
+    "padam paakalama inniki",
+    "hi",
+]
+
+QUERIES_BY_LANGUAGE = {
+    "english": ENGLISH_QUERIES,
+    "tanglish": TANGLISH_QUERIES,
+    "tamil": TAMIL_QUERIES,
+}
+
+
+def long_query(language: str = "english", length: int = 1000) -> str:
+    """
+    Worst-case input: queries of one language repeated up to `length` chars.
+
+    Used at MAX_QUERY_LENGTH, where validation and detection cost the most.
+    """
+    base = " ".join(QUERIES_BY_LANGUAGE[language])
+    text = base
+    while len(text) < length:
+        text = f"{text} {base}"
+    return text[:length]
@@ -0,0 +1,166 @@
+"""
+Fake Groq / OpenAI-compatible Chat Completions Server
+
+Stand-in for the Groq API during load tests: answers
+POST /openai/v1/chat/completions with canned text after a configurable
+delay, supports `stream: true` (SSE chunks, usage on the last chunk under
+`x_groq`, as Groq sends it) and injects upstream errors at a given rate.
+
+Usage:
+    python -m benchmarks.fake_llm --port 9100 --latency-ms 400 --error-rate 0.01
+
+Point the backend at it with
+    LLM_API_URL=http://127.0.0.1:9100/openai/v1/chat/completions
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY_WORDS = (
+    "Property registration in Tamil Nadu happens at the Sub-Registrar Office. "
+    "Keep the sale deed, patta, chitta, encumbrance certificate and approved plan ready. "
+    "Stamp duty is 7% and the registration fee is 4% of the guideline value. "
+    "Always verify DTCP or CMDA approval and check the builder's TNRERA registration."
+).split()
+
+
+def create_app(
+    latency_ms: float = 300.0,
+    jitter_ms: float = 100.0,
+    token_delay_ms: float = 5.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    reply_tokens: int = 60,
+) -> FastAPI:
+    """
+    Build the fake server.
+
+    Args:
+        latency_ms: Base time to first token
+        jitter_ms: Uniform random extra latency
+        token_delay_ms: Delay between streamed chunks
+        error_rate: Fraction of requests answered with a 500
+        rate_limit_rate: Fraction of requests answered with a 429 + Retry-After
+        reply_tokens: Words per reply (reported as completion tokens)
+    """
+    app = FastAPI()
+    app.state.requests = 0
+
+    def reply_text() -> str:
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(reply_tokens)]
+        return " ".join(words)
+
+    def usage(messages) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": reply_tokens,
+            "total_tokens": prompt_tokens + reply_tokens,
+        }
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "requests": app.state.requests}
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "fake-model")
+
+        roll = random.random()
+        if roll < rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        if roll < rate_limit_rate + error_rate:
+            return JSONResponse({"error": {"message": "Injected upstream error"}}, status_code=500)
+
+        await asyncio.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+        completion_id = f"chatcmpl-fake-{app.state.requests}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply_text()},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(messages),
+            }
+
+        async def chunks():
+            words = reply_text().split(" ")
+            for index, word in enumerate(words):
+                delta = {"content": word if index == 0 else " " + word}
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if token_delay_ms:
+                    await asyncio.sleep(token_delay_ms / 1000)
+
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage(messages)},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_delay_ms=args.token_delay_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        reply_tokens=args.reply_tokens,
+    )
+    print(f"🤖 Fake LLM listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms}ms, errors {args.error_rate:.1%}, 429s {args.rate_limit_rate:.1%})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
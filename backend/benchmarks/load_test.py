@@ -0,0 +1,324 @@
+"""
+End-to-End Load Test
+
+Drives mixed, realistic traffic at the backend and reports throughput,
+p50/p95/p99 latency and error rate per endpoint.
+
+By default it starts its own stand-ins (fake LLM + backend on in-memory
+Mongo, see fake_llm.py and serve_app.py) as subprocesses; pass --target
+to load an already running backend instead.
+
+Traffic mix per virtual user loop (weights):
+    chat (English/Tanglish/Tamil/off-topic)  50
+    chat stream                              10
+    history page read                        20
+    new session                               5
+    login                                    10
+    /auth/me                                  5
+
+Usage:
+    python -m benchmarks.load_test --users 50 --duration 60
+    python -m benchmarks.load_test --llm-latency-ms 800 --llm-error-rate 0.02 --json results.json
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --users 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.corpus import OFF_TOPIC_QUERIES, QUERIES_BY_LANGUAGE
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ACTION_WEIGHTS = {
+    "chat": 50,
+    "chat_stream": 10,
+    "history": 20,
+    "new_session": 5,
+    "login": 10,
+    "me": 5,
+}
+
+# Share of chat traffic per language; the remainder is off-topic
+LANGUAGE_MIX = {"english": 0.55, "tanglish": 0.25, "tamil": 0.12}
+
+PASSWORD = "LoadTest123!"
+
+
+class Recorder:
+    """Collects per-endpoint latencies and failures."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.first_byte: List[float] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        report = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            report[endpoint] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+                "error_rate": round(self.errors[endpoint] / len(samples), 4),
+            }
+        if self.first_byte:
+            first_byte = sorted(self.first_byte)
+            report["chat_stream"]["first_delta_p50_ms"] = round(_percentile(first_byte, 50) * 1000, 1)
+            report["chat_stream"]["first_delta_p95_ms"] = round(_percentile(first_byte, 95) * 1000, 1)
+        return report
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples) + 0.5)) - 1))
+    return samples[rank]
+
+
+def pick_query() -> str:
+    roll = random.random()
+    for language, share in LANGUAGE_MIX.items():
+        if roll < share:
+            return random.choice(QUERIES_BY_LANGUAGE[language])
+        roll -= share
+    return random.choice(OFF_TOPIC_QUERIES)
+
+
+class VirtualUser:
+    """One simulated user: an account, a few sessions and a request loop."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, index: int):
+        self.client = client
+        self.recorder = recorder
+        self.email = f"loadtest-{index}-{uuid.uuid4().hex[:8]}@example.com"
+        self.token: Optional[str] = None
+        self.sessions: List[str] = []
+
+    async def timed(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - start, ok=False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+    async def setup(self) -> None:
+        response = await self.timed("register", "POST", "/api/auth/register", json={
+            "email": self.email, "password": PASSWORD, "name": "Load Test",
+        })
+        if response is not None and response.status_code == 201:
+            self.token = response.json()["access_token"]
+        await self.new_session()
+
+    async def new_session(self) -> None:
+        response = await self.timed("new_session", "POST", "/api/sessions", json={})
+        if response is not None and response.status_code == 200:
+            self.sessions.append(response.json()["session_id"])
+
+    async def chat(self) -> None:
+        if not self.sessions:
+            return await self.new_session()
+        await self.timed("chat", "POST", "/api/chat", json={
+            "session_id": random.choice(self.sessions), "message": pick_query(),
+        })
+
+    async def chat_stream(self) -> None:
+        if not self.sessions:
+            return await self.new_session()
+        payload = {"session_id": random.choice(self.sessions), "message": pick_query()}
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with self.client.stream("POST", "/api/chat/stream", json=payload) as response:
+                got_delta = False
+                async for line in response.aiter_lines():
+                    if line == "event: delta" and not got_delta:
+                        self.recorder.first_byte.append(time.perf_counter() - start)
+                        got_delta = True
+                    elif line == "event: done":
+                        break
+                ok = got_delta and response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        self.recorder.record("chat_stream", time.perf_counter() - start, ok=ok)
+
+    async def history(self) -> None:
+        if not self.sessions:
+            return await self.new_session()
+        session_id = random.choice(self.sessions)
+        await self.timed("history", "GET", f"/api/sessions/{session_id}/messages", params={"limit": 20})
+
+    async def login(self) -> None:
+        response = await self.timed("login", "POST", "/api/auth/login", json={
+            "email": self.email, "password": PASSWORD,
+        })
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+    async def me(self) -> None:
+        if not self.token:
+            return await self.login()
+        await self.timed("me", "GET", "/api/auth/me", headers={"Authorization": f"Bearer {self.token}"})
+
+    async def run(self, deadline: float, think_time: float) -> None:
+        actions = list(ACTION_WEIGHTS)
+        weights = list(ACTION_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            action = random.choices(actions, weights)[0]
+            await getattr(self, action)()
+            if think_time:
+                await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+
+async def run_load(target: str, users: int, duration: float, think_time: float, ramp_up: float) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=target, timeout=60.0, limits=limits) as client:
+        virtual_users = [VirtualUser(client, recorder, i) for i in range(users)]
+
+        # Registration is part of setup; spread it over the ramp-up window
+        async def start(user: VirtualUser, delay: float):
+            await asyncio.sleep(delay)
+            await user.setup()
+
+        await asyncio.gather(*(
+            start(user, ramp_up * i / max(1, users)) for i, user in enumerate(virtual_users)
+        ))
+
+        setup_report = recorder.summary()
+        recorder = Recorder()
+        for user in virtual_users:
+            user.recorder = recorder
+
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(user.run(deadline, think_time) for user in virtual_users))
+        recorder.finished = time.perf_counter()
+
+    return {"setup": setup_report, "steady": recorder.summary()}
+
+
+def print_report(report: dict) -> None:
+    for phase in ("setup", "steady"):
+        print(f"\n📊 {phase.upper()}")
+        print(f"{'endpoint':<14}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+        for endpoint, row in report[phase].items():
+            print(f"{endpoint:<14}{row['requests']:>8}{row['rps']:>9}{row['p50_ms']:>10}"
+                  f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['error_rate']:>9.2%}")
+            if "first_delta_p50_ms" in row:
+                print(f"{'  first delta':<14}{'':>8}{'':>9}{row['first_delta_p50_ms']:>10}"
+                      f"{row['first_delta_p95_ms']:>10}")
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"❌ {url} did not come up within {timeout}s")
+
+
+def start_stand_ins(args) -> List[subprocess.Popen]:
+    """Start the fake LLM and the backend as subprocesses."""
+    output = None if args.verbose else subprocess.DEVNULL
+    fake_llm = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_llm",
+        "--port", str(args.llm_port),
+        "--latency-ms", str(args.llm_latency_ms),
+        "--error-rate", str(args.llm_error_rate),
+        "--rate-limit-rate", str(args.llm_rate_limit_rate),
+    ], cwd=BACKEND_DIR, stdout=output, stderr=output)
+
+    backend_cmd = [
+        sys.executable, "-m", "benchmarks.serve_app",
+        "--port", str(args.app_port),
+        "--llm-url", f"http://127.0.0.1:{args.llm_port}/openai/v1/chat/completions",
+        "--mongo", args.mongo,
+    ]
+    if args.bcrypt_rounds is not None:
+        backend_cmd += ["--bcrypt-rounds", str(args.bcrypt_rounds)]
+    if args.rate_limit:
+        backend_cmd += ["--rate-limit"]
+    backend = subprocess.Popen(backend_cmd, cwd=BACKEND_DIR, stdout=output, stderr=output)
+    return [fake_llm, backend]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the backend")
+    parser.add_argument("--target", help="Base URL of a running backend (skips the stand-ins)")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Steady-state seconds")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to spread registrations over")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a user's requests")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--llm-port", type=int, default=9100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mongo", default="memory", help="'memory' or a MongoDB URL")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep the backend's rate limiter on (expect 429s: users share one IP)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show stand-in server output")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    processes = []
+    target = args.target
+    try:
+        if not target:
+            processes = start_stand_ins(args)
+            target = f"http://127.0.0.1:{args.app_port}"
+            asyncio.run(wait_until_up(f"http://127.0.0.1:{args.llm_port}/health"))
+
+        asyncio.run(wait_until_up(f"{target}/api/health"))
+        print(f"🔥 {args.users} users for {args.duration:.0f}s against {target}")
+        report = asyncio.run(run_load(target, args.users, args.duration, args.think_time, args.ramp_up))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Micro-Benchmarks for the CPU-Bound Request Pipeline
+
+Times the per-request CPU work of a chat turn over the benchmark corpus
+(benchmarks/corpus.py), including worst-case inputs at MAX_QUERY_LENGTH:
+
+    is_real_estate_query   domain gate
+    detect_language        language detection
+    get_knowledge_context  knowledge retrieval
+    _get_system_prompt     system prompt assembly
+    answer_locally         deterministic fast-path answers
+    classification_cache   memoized domain gate + language (hit path)
+
+For each it reports the median time per call and the peak memory
+allocated per call (tracemalloc), then checks:
+
+- Parity: every corpus query must still get the accept/reject decision,
+  reason and language recorded in micro_expected.json, both directly and
+  through the classification cache, so an optimization cannot silently
+  change classification.
+- Regressions: times must stay within --tolerance of the saved baseline
+  (micro_baseline.json) and under the absolute budgets below. The baseline
+  is machine specific, so it is not committed: record it on the base
+  revision, on the same machine, before checking a change.
+
+Exits non-zero on any failure, including a missing baseline or
+micro_expected.json, so it can gate CI.
+
+Usage:
+    git checkout <base> && python -m benchmarks.micro --save-baseline && git checkout -
+    python -m benchmarks.micro
+    python -m benchmarks.micro --update-expected   # after an intended behaviour change
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.corpus import OFF_TOPIC_QUERIES, QUERIES_BY_LANGUAGE, long_query
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("DATABASE_URL", "mongodb://127.0.0.1:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+from app.services.classification_cache import classification_cache  # noqa: E402
+from app.services.domain_validator import MAX_QUERY_LENGTH, detect_language, is_real_estate_query  # noqa: E402
+from app.services.fast_answers import answer_locally  # noqa: E402
+from app.services.llm_service import llm_service  # noqa: E402
+from app.services.tn_knowledge_base import get_knowledge_context  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXPECTED_PATH = os.path.join(HERE, "micro_expected.json")
+BASELINE_PATH = os.path.join(HERE, "micro_baseline.json")
+
+# Absolute ceilings (microseconds per call), far above current numbers on
+# any reasonable machine; they catch accidental algorithmic blow-ups
+BUDGET_US = {
+    "is_real_estate_query": 200.0,
+    "is_real_estate_query[max_len]": 1000.0,
+    "detect_language": 200.0,
+    "detect_language[max_len]": 1500.0,
+    "get_knowledge_context": 500.0,
+    "get_knowledge_context[max_len]": 3000.0,
+    "_get_system_prompt": 50.0,
+    "answer_locally": 200.0,
+    "classification_cache": 20.0,
+}
+
+
+def corpus() -> List[str]:
+    queries = [query for group in QUERIES_BY_LANGUAGE.values() for query in group]
+    return queries + OFF_TOPIC_QUERIES
+
+
+def worst_case_corpus() -> List[str]:
+    return [long_query(language, MAX_QUERY_LENGTH) for language in QUERIES_BY_LANGUAGE]
+
+
+def classify(query: str) -> Dict[str, object]:
+    is_valid, reason = is_real_estate_query(query)
+    return {"valid": is_valid, "reason": reason, "language": detect_language(query)}
+
+
+def classify_cached(query: str) -> Dict[str, object]:
+    return classification_cache.classify(query)._asdict()
+
+
+def time_per_call(func: Callable, inputs: List, rounds: int) -> float:
+    """Median seconds per call over `rounds` passes of the inputs."""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for args in inputs:
+            func(*args)
+        samples.append((time.perf_counter() - start) / len(inputs))
+    return statistics.median(samples)
+
+
+def peak_alloc_per_call(func: Callable, inputs: List) -> float:
+    """Largest traced peak (bytes) of a single call across the inputs."""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for args in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def build_cases() -> List[Tuple[str, Callable, List]]:
+    queries = corpus()
+    worst = worst_case_corpus()
+    contexts = [
+        (language, get_knowledge_context(query.lower()))
+        for language, group in QUERIES_BY_LANGUAGE.items()
+        for query in group
+    ]
+    return [
+        ("is_real_estate_query", is_real_estate_query, [(q,) for q in queries]),
+        ("is_real_estate_query[max_len]", is_real_estate_query, [(q,) for q in worst]),
+        ("detect_language", detect_language, [(q,) for q in queries]),
+        ("detect_language[max_len]", detect_language, [(q,) for q in worst]),
+        ("get_knowledge_context", get_knowledge_context, [(q.lower(),) for q in queries]),
+        ("get_knowledge_context[max_len]", get_knowledge_context, [(q.lower(),) for q in worst]),
+        ("_get_system_prompt", llm_service._get_system_prompt, contexts),
+        ("answer_locally", answer_locally, [(q, language) for language, group in QUERIES_BY_LANGUAGE.items()
+                                            for q in group]),
+        ("classification_cache", classification_cache.classify, [(q,) for q in queries]),
+    ]
+
+
+def check_parity(update: bool) -> List[str]:
+    actual = {query: classify(query) for query in corpus() + worst_case_corpus()}
+    if update:
+        with open(EXPECTED_PATH, "w", encoding="utf-8") as f:
+            json.dump(actual, f, ensure_ascii=False, indent=2)
+        print(f"💾 Recorded {len(actual)} expected classifications in {EXPECTED_PATH}")
+        return []
+    if not os.path.exists(EXPECTED_PATH):
+        return [f"parity: {EXPECTED_PATH} is missing; restore it from git "
+                "(--update-expected records the current behaviour, only after an intended change)"]
+
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        expected = json.load(f)
+    failures = []
+    for query, decision in expected.items():
+        got = classify(query)
+        if got != decision:
+            failures.append(f"parity: {query[:60]!r} expected {decision}, got {got}")
+        # Twice: once filling the cache, once served from it
+        for _ in range(2):
+            got = classify_cached(query)
+            if got != decision:
+                failures.append(f"parity (cached): {query[:60]!r} expected {decision}, got {got}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the request pipeline")
+    parser.add_argument("--rounds", type=int, default=50, help="Timed passes over each input set")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--update-expected", action="store_true")
+    args = parser.parse_args()
+
+    failures = check_parity(args.update_expected)
+
+    baseline = {}
+    if not args.save_baseline:
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                baseline = json.load(f)
+        else:
+            failures.append(
+                f"baseline: {BASELINE_PATH} is missing, so regressions cannot be checked; record it on "
+                "the base revision first: git checkout <base> && python -m benchmarks.micro "
+                "--save-baseline && git checkout -"
+            )
+
+    results = {}
+    print(f"{'benchmark':<32}{'us/call':>10}{'baseline':>10}{'peak KiB':>10}")
+    for name, func, inputs in build_cases():
+        # Warm up caches and the regex engine before timing
+        time_per_call(func, inputs, 3)
+        seconds = time_per_call(func, inputs, args.rounds)
+        peak = peak_alloc_per_call(func, inputs)
+        micros = seconds * 1e6
+        results[name] = {"us_per_call": round(micros, 3), "peak_bytes": peak}
+
+        base = baseline.get(name, {}).get("us_per_call")
+        print(f"{name:<32}{micros:>10.2f}{(f'{base:.2f}' if base else '-'):>10}{peak / 1024:>10.1f}")
+
+        if micros > BUDGET_US[name]:
+            failures.append(f"budget: {name} took {micros:.1f}us > {BUDGET_US[name]}us")
+        if base and micros > base * (1 + args.tolerance):
+            failures.append(f"regression: {name} {micros:.2f}us vs baseline {base:.2f}us "
+                            f"(+{micros / base - 1:.0%})")
+        base_peak = baseline.get(name, {}).get("peak_bytes")
+        if base_peak and peak > base_peak * (1 + args.tolerance) + 1024:
+            failures.append(f"allocation: {name} peaks at {peak} bytes vs baseline {base_peak}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline written to {BASELINE_PATH}")
+
+    if failures:
+        print("\n❌ FAILED")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ All micro-benchmarks within limits")
+
+
+if __name__ == "__main__":
+    main()
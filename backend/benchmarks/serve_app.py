@@ -0,0 +1,93 @@
+"""
+Serve main.app for Load Tests
+
+Boots the real backend under uvicorn with its LLM calls pointed at the
+fake server and, optionally, an in-memory Mongo stand-in, so load tests
+cost neither Groq tokens nor Atlas traffic.
+
+Usage:
+    python -m benchmarks.serve_app --port 8100 --llm-url http://127.0.0.1:9100/openai/v1/chat/completions
+    python -m benchmarks.serve_app --mongo mongodb://localhost:27017   # local mongod
+
+`--mongo memory` (default) needs the `mongomock-motor` package, which is
+a benchmark-only dependency and not part of requirements.txt. Use a real
+local mongod when Mongo-side latency matters.
+"""
+
+import argparse
+import os
+
+
+def _install_memory_engine(database_name: str) -> None:
+    """Make app.database hand out an in-memory engine instead of connecting."""
+    try:
+        import mongomock
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("❌ --mongo memory needs: pip install mongomock-motor")
+
+    from odmantic import AIOEngine
+    from app import database
+
+    class _NoopSession:
+        """mongomock has no sessions; odmantic only needs the context manager."""
+        in_transaction = False
+        has_ended = False
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def end_session(self):
+            pass
+
+    async def start_session(*args, **kwargs):
+        return _NoopSession()
+
+    mongomock.ignore_feature("session")
+    client = AsyncMongoMockClient()
+    client.start_session = start_session
+    database._client = client
+    database._engine = AIOEngine(client=client, database=database_name)
+    print("🧪 Using in-memory Mongo stand-in")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the backend against local stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--llm-url", default="http://127.0.0.1:9100/openai/v1/chat/completions")
+    parser.add_argument("--mongo", default="memory", help="'memory' or a MongoDB URL")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None,
+                        help="Override BCRYPT_ROUNDS (default: production setting)")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep per-client rate limiting on (all virtual users share one IP)")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the environment first
+    os.environ["LLM_API_URL"] = args.llm_url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    os.environ["DATABASE_URL"] = "mongodb://127.0.0.1:27017" if args.mongo == "memory" else args.mongo
+    os.environ.setdefault("DATABASE_NAME", "purityprop_benchmark")
+    if args.bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    if not args.rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from app.config import settings
+
+    if args.mongo == "memory":
+        _install_memory_engine(settings.database_name)
+
+    import uvicorn
+    from main import app
+
+    print(f"🚀 Backend listening on http://{args.host}:{args.port} (LLM: {args.llm_url})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
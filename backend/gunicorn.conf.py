@@ -1,5 +1,7 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
+import shutil
 
 # Use uvicorn worker for FastAPI (ASGI) application
 # This is critical for avoiding the 'FastAPI.__call__() missing 1 required positional argument: 'send'' error
@@ -11,5 +13,23 @@ workers = multiprocessing.cpu_count() * 2 + 1  # Standard worker calculation
 timeout = 120  # Increase timeout for long-running requests
 keepalive = 5  # Keep connections alive
 
+# Prometheus multi-process mode: every worker writes its metrics to files
+# in this directory and /metrics aggregates them. Must be set before the
+# workers import the app, so it is set here in the master.
+prometheus_multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/purityprop_metrics")
+
+
+def on_starting(server):
+    # Start from an empty directory so metrics of a previous run do not leak in
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that exited; its counters are kept
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
 print(f"Using worker class: {worker_class}")
 print(f"Starting {workers} workers")
@@ -1,16 +1,55 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router
 from app.auth_routes import router as auth_router
+from app.auth import shutdown_password_hasher
 from app.config import settings
+from app.database import connect_db, close_db
+from app.metrics import MetricsMiddleware, metrics_response
+from app.rate_limit import RateLimitMiddleware, rate_limiter
+from app.services.classification_cache import classification_cache
+from app.services.llm_service import llm_service
+from app.services.response_cache import response_cache
+from app.services.single_flight import single_flight
+from app.services.user_cache import user_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Process-wide resources: opened once per worker, closed on shutdown.
+    """
+    await connect_db()
+    await llm_service.startup()
+    if settings.classification_cache_prewarm_path:
+        try:
+            loaded = classification_cache.prewarm(settings.classification_cache_prewarm_path)
+            print(f"✅ Classification cache prewarmed with {loaded} queries")
+        except OSError as e:
+            print(f"⚠️ Classification cache prewarm skipped: {e}")
+    try:
+        yield
+    finally:
+        await llm_service.shutdown()
+        await response_cache.close()
+        await user_cache.close()
+        await rate_limiter.close()
+        shutdown_password_hasher()
+        close_db()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.app_name,
     version="1.0.0",
     docs_url="/docs" if settings.debug else None,
     redoc_url=None,
 )
 
+# ✅ Per-client rate limiting (inside CORS, so 429s stay readable by the browser)
+app.add_middleware(RateLimitMiddleware)
+
 # ✅ CENTRALIZED CORS CONFIGURATION
 # Loaded dynamically from verified settings
 origins = settings.get_cors_origins()
@@ -21,8 +60,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+# ✅ Request latency metrics (outermost, so it times the whole request)
+app.add_middleware(MetricsMiddleware)
+
 # ✅ Routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(router, prefix="/api")
@@ -51,3 +94,59 @@ async def db_health_check():
     except Exception:
         # Do not expose error details in production
         return {"status": "error", "message": "Database connection failed"}
+
+
+# ✅ Response Cache Stats
+@app.get("/api/health/cache")
+def cache_stats():
+    """
+    Hit/miss counters for the LLM response cache of this worker.
+    """
+    return response_cache.stats()
+
+
+# ✅ Classification Cache Stats
+@app.get("/api/health/classification-cache")
+def classification_cache_stats():
+    """
+    Size, hit/miss and eviction counters for the query classification
+    cache of this worker.
+    """
+    return classification_cache.stats()
+
+
+# ✅ LLM Upstream Health
+@app.get("/api/health/llm")
+def llm_health():
+    """
+    Per-provider latency/error averages, circuit breaker state, quota
+    limiter and retry/hedge counters of this worker.
+    """
+    return llm_service.registry.stats()
+
+
+# ✅ Request Coalescing
+@app.get("/api/health/coalescing")
+def coalescing_stats():
+    """
+    LLM requests currently in flight in this worker and their followers.
+    """
+    return single_flight.stats()
+
+
+# ✅ User Cache Stats
+@app.get("/api/health/user-cache")
+def user_cache_stats():
+    """
+    Hit/miss counters for the authenticated-user cache of this worker.
+    """
+    return user_cache.stats()
+
+
+# ✅ Prometheus Metrics
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint, aggregated across gunicorn workers.
+    """
+    return metrics_response()
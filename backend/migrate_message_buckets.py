@@ -0,0 +1,206 @@
+"""
+Message Bucket Migration Script
+Moves embedded ChatSession.messages into fixed-size message_bucket documents.
+
+Safe to re-run: only sessions that still carry embedded messages are
+touched. Messages already appended to buckets after the deploy are kept
+and renumbered after the legacy ones.
+
+Safe against live traffic: each session is locked (migrating_since, see
+app/message_store.py) while it is rewritten, so chat appends to it wait,
+and the rewrite starts only once appends that were already in flight have
+reached their buckets. A session whose appends do not settle within
+MIGRATION_SETTLE_SECONDS is skipped and picked up by the next run.
+
+Each session's buckets and session document are rewritten in one
+transaction, so DATABASE_URL must point at a replica set (MongoDB Atlas
+always is). The rolling history summary is reset, since renumbering moves
+the seq boundary it was built against; it is rebuilt on the next chat.
+
+Usage:
+    python migrate_message_buckets.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+# Load env vars if present (local dev)
+load_dotenv()
+
+DATABASE_NAME = os.getenv("DATABASE_NAME", "real_estate_ai")
+BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "50"))
+# Must stay well below the app's MESSAGE_MIGRATION_WAIT_SECONDS (default 10)
+SETTLE_SECONDS = float(os.getenv("MIGRATION_SETTLE_SECONDS", "3"))
+
+# Same field as app.message_store.MIGRATION_LOCK
+MIGRATION_LOCK = "migrating_since"
+
+
+async def read_bucket_messages(db, session_id: str) -> List[dict]:
+    """Messages already in a session's buckets, in seq order."""
+    existing = []
+    async for bucket in db.message_bucket.find({"session_id": session_id}, sort=[("bucket", 1)]):
+        existing.extend(bucket["messages"])
+    existing.sort(key=lambda message: message.get("seq") or 0)
+    return existing
+
+
+async def lock_session(db, session: dict) -> Optional[Tuple[dict, List[dict]]]:
+    """
+    Lock a session against appends and wait for in-flight ones to land.
+
+    Returns:
+        (session, bucket messages) read under the lock, or None if the
+        session is locked by another run or its appends did not settle
+        (the lock is released again)
+    """
+    locked = await db.chat_session.find_one_and_update(
+        {"_id": session["_id"], MIGRATION_LOCK: None},
+        {"$set": {MIGRATION_LOCK: datetime.utcnow()}},
+        projection={"session_id": 1, "messages": 1, "message_count": 1, "updated_at": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if locked is None:
+        return None
+
+    # An append that reserved its seq before the lock may still be pushing
+    deadline = time.monotonic() + SETTLE_SECONDS
+    while True:
+        existing = await read_bucket_messages(db, locked["session_id"])
+        if len(existing) >= locked.get("message_count", 0):
+            return locked, existing
+        if time.monotonic() >= deadline:
+            await unlock_session(db, session)
+            return None
+        await asyncio.sleep(0.05)
+
+
+async def unlock_session(db, session: dict) -> None:
+    await db.chat_session.update_one({"_id": session["_id"]}, {"$unset": {MIGRATION_LOCK: ""}})
+
+
+async def migrate_session(db, session: dict, dry_run: bool) -> Optional[int]:
+    """
+    Split one session's embedded messages into buckets.
+
+    Returns:
+        Messages moved, or None if the session was skipped
+    """
+    if dry_run:
+        return len(session.get("messages") or [])
+
+    state = await lock_session(db, session)
+    if state is None:
+        return None
+    session, existing = state
+    try:
+        return await rewrite_session(db, session, existing)
+    except BaseException:
+        await unlock_session(db, session)
+        raise
+
+
+async def rewrite_session(db, session: dict, existing: List[dict]) -> int:
+    """
+    Rewrite a locked session's buckets (legacy messages first) and unlock it.
+
+    Runs as one transaction: messages appended since the deploy exist only
+    in `existing` once their buckets are deleted, so a failure part-way
+    must leave the old buckets in place.
+    """
+    session_id = session["session_id"]
+    legacy = session.get("messages") or []
+
+    # Messages written to buckets since the deploy go after the legacy ones
+    messages = legacy + existing
+    for seq, message in enumerate(messages):
+        message["seq"] = seq
+
+    buckets = [
+        {
+            "session_id": session_id,
+            "bucket": start // BUCKET_SIZE,
+            "messages": messages[start:start + BUCKET_SIZE],
+            "count": len(messages[start:start + BUCKET_SIZE]),
+        }
+        for start in range(0, len(messages), BUCKET_SIZE)
+    ]
+
+    async def write(mongo_session) -> None:
+        await db.message_bucket.delete_many({"session_id": session_id}, session=mongo_session)
+        if buckets:
+            await db.message_bucket.insert_many(buckets, session=mongo_session)
+        await db.chat_session.update_one(
+            {"_id": session["_id"]},
+            {
+                "$set": {
+                    "message_count": len(messages),
+                    "stored_count": len(messages),
+                    "messages": [],
+                    # The summary covered post-deploy seqs that now belong
+                    # to other messages; history_window rebuilds it
+                    "summary": None,
+                    "summary_upto": 0,
+                },
+                "$max": {"updated_at": session.get("updated_at") or datetime.utcnow()},
+                "$unset": {MIGRATION_LOCK: ""},
+            },
+            session=mongo_session,
+        )
+
+    async with await db.client.start_session() as mongo_session:
+        await mongo_session.with_transaction(write)
+    return len(legacy)
+
+
+async def migrate_message_buckets(dry_run: bool = False):
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ Error: DATABASE_URL environment variable is not set.")
+        return
+
+    client = AsyncIOMotorClient(database_url)
+    db = client[DATABASE_NAME]
+
+    try:
+        await db.message_bucket.create_index([("session_id", 1), ("bucket", 1)], unique=True)
+
+        sessions = db.chat_session.find(
+            {"messages.0": {"$exists": True}},
+            projection={"session_id": 1, "messages": 1, "updated_at": 1},
+        )
+        migrated = 0
+        moved = 0
+        skipped = 0
+        async for session in sessions:
+            count = await migrate_session(db, session, dry_run)
+            if count is None:
+                skipped += 1
+                continue
+            moved += count
+            migrated += 1
+
+        prefix = "🔎 [dry run] Would migrate" if dry_run else "✅ Migrated"
+        print(f"{prefix} {migrated} sessions ({moved} messages, {BUCKET_SIZE} per bucket)")
+        if skipped:
+            print(f"⚠️ Skipped {skipped} busy sessions; run the migration again to finish them")
+        if not dry_run:
+            print("\n🎉 Message bucket migration completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(migrate_message_buckets(dry_run="--dry-run" in sys.argv))
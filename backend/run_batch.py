@@ -0,0 +1,151 @@
+"""
+Batch Chat Evaluation Runner
+Runs a JSONL file of queries through the chat pipeline and writes NDJSON
+results with per-item timings (see app/services/batch.py for the format).
+
+Two modes:
+- Offline (default): runs the pipeline in this process. No server or
+  MongoDB needed; point --llm-url at the fake provider
+  (python -m benchmarks.fake_llm) to test without Groq.
+- Remote (--target): posts the file to POST /api/chat/batch of a running
+  backend, logging in with --email/--password. The account's user id
+  must be listed in the server's ADMIN_USER_IDS.
+
+Usage:
+    python run_batch.py faq.jsonl --out results.ndjson
+    python run_batch.py faq.jsonl --llm-url http://127.0.0.1:9100/openai/v1/chat/completions
+    python run_batch.py faq.jsonl --target http://127.0.0.1:8000 --email me@example.com --password ...
+    python run_batch.py faq.jsonl --no-cache --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, Optional, TextIO
+
+import httpx
+from dotenv import load_dotenv
+
+# Load env vars if present (local dev)
+load_dotenv()
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"\n📊 {summary['items']} queries in {summary['wall_ms'] / 1000:.1f}s", file=sys.stderr)
+    for outcome, count in sorted(summary["outcomes"].items()):
+        print(f"   {outcome:<10}{count:>8}", file=sys.stderr)
+    if summary.get("generate_p50_ms") is not None:
+        print(f"   generate p50 {summary['generate_p50_ms']:.0f}ms, "
+              f"p95 {summary['generate_p95_ms']:.0f}ms", file=sys.stderr)
+
+
+def write_record(record: Dict[str, Any], out: TextIO) -> Optional[Dict[str, Any]]:
+    """Write one result line; returns the record if it is the summary."""
+    if record.get("type") == "summary":
+        return record
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if record.get("type") == "error":
+        print(f"⚠️ Line {record['line']}: {record['error']}", file=sys.stderr)
+    return None
+
+
+async def run_offline(text: str, concurrency: int, use_cache: bool, out: TextIO) -> Optional[Dict[str, Any]]:
+    from app.services.batch import parse_jsonl, run_batch
+    from app.services.llm_service import llm_service
+
+    items, errors = parse_jsonl(text)
+    for error in errors:
+        write_record(error, out)
+
+    summary = None
+    await llm_service.startup()
+    try:
+        async for record in run_batch(items, concurrency, use_cache):
+            summary = write_record(record, out) or summary
+    finally:
+        await llm_service.shutdown()
+    return summary
+
+
+async def run_remote(
+    text: str,
+    target: str,
+    email: str,
+    password: str,
+    concurrency: int,
+    use_cache: bool,
+    out: TextIO,
+) -> Optional[Dict[str, Any]]:
+    async with httpx.AsyncClient(base_url=target, timeout=httpx.Timeout(60.0, read=None)) as client:
+        login = await client.post("/api/auth/login", json={"email": email, "password": password})
+        if login.status_code != 200:
+            raise SystemExit(f"❌ Login failed: {login.status_code} {login.text}")
+        token = login.json()["access_token"]
+
+        summary = None
+        async with client.stream(
+            "POST",
+            "/api/chat/batch",
+            params={"concurrency": concurrency, "cache": str(use_cache).lower()},
+            content=text.encode("utf-8"),
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise SystemExit(f"❌ Batch rejected: {response.status_code} {response.text}")
+            async for line in response.aiter_lines():
+                if line.strip():
+                    summary = write_record(json.loads(line), out) or summary
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL batch of queries through the chat pipeline")
+    parser.add_argument("input", help="JSONL file: one {\"id\", \"message\"} per line")
+    parser.add_argument("--out", help="Write NDJSON results here (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--llm-url", help="Offline mode: chat-completions URL (e.g. the fake provider)")
+    parser.add_argument("--target", help="Remote mode: base URL of a running backend")
+    parser.add_argument("--email", default=os.getenv("BATCH_EMAIL"))
+    parser.add_argument("--password", default=os.getenv("BATCH_PASSWORD"))
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        text = f.read()
+
+    if not args.target:
+        # Settings are read at import time, so configure the environment first;
+        # offline runs never touch MongoDB or issue tokens
+        if args.llm_url:
+            os.environ["LLM_API_URL"] = args.llm_url
+            os.environ.setdefault("GROQ_API_KEY", "batch-runner")
+        os.environ.setdefault("DATABASE_URL", "mongodb://127.0.0.1:27017")
+        os.environ.setdefault("JWT_SECRET_KEY", "batch-runner")
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        if args.target:
+            if not args.email or not args.password:
+                raise SystemExit("❌ --target needs --email and --password (or BATCH_EMAIL/BATCH_PASSWORD)")
+            summary = asyncio.run(run_remote(
+                text, args.target, args.email, args.password, args.concurrency, not args.no_cache, out
+            ))
+        else:
+            summary = asyncio.run(run_offline(text, args.concurrency, not args.no_cache, out))
+    finally:
+        if args.out:
+            out.close()
+
+    if summary:
+        print_summary(summary)
+        if args.out:
+            print(f"💾 Results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    main()
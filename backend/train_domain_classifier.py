@@ -0,0 +1,171 @@
+"""
+Domain Classifier Training
+Trains the hashed character n-gram classifier (app/services/domain_classifier.py)
+on the labeled corpus app/data/domain_corpus.tsv and exports it to
+app/data/domain_classifier.npz, which the API loads at startup.
+
+One query in five (picked by a hash of its normalized text, so the split
+is stable as the corpus grows) is held out of training; the script reports
+precision/recall on it, and benchmarks/classifier.py compares it with the
+keyword rules. Retrain after editing the corpus and commit both files.
+
+Usage:
+    python train_domain_classifier.py
+    python train_domain_classifier.py --epochs 600 --l2 1e-5
+    python train_domain_classifier.py --out /tmp/domain_classifier.npz
+"""
+
+import argparse
+import os
+import time
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+# Settings are read at import time; training needs no real credentials
+os.environ.setdefault("GROQ_API_KEY", "training")
+os.environ.setdefault("DATABASE_URL", "mongodb://127.0.0.1:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "training")
+
+from app.services.domain_classifier import DEFAULT_MODEL_PATH, DomainClassifier, hash_features  # noqa: E402
+from app.services.domain_validator import normalize_query  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(DEFAULT_MODEL_PATH), "domain_corpus.tsv")
+
+# Corpus rows: (label, language, query); label 1 = real estate
+Example = Tuple[int, str, str]
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Example]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+            label, language, query = line.split("\t", 2)
+            examples.append((1 if label == "real_estate" else 0, language, query))
+    return examples
+
+
+def is_held_out(query: str) -> bool:
+    """True for the fifth of the corpus kept out of training."""
+    return zlib.crc32(normalize_query(query).encode("utf-8")) % 5 == 0
+
+
+def split_corpus(examples: List[Example]) -> Tuple[List[Example], List[Example]]:
+    train = [example for example in examples if not is_held_out(example[2])]
+    test = [example for example in examples if is_held_out(example[2])]
+    return train, test
+
+
+def train(
+    queries: List[str],
+    labels: List[int],
+    bits: int,
+    min_n: int,
+    max_n: int,
+    epochs: int,
+    learning_rate: float,
+    l2: float,
+) -> Tuple[np.ndarray, float]:
+    """
+    Fit logistic regression weights with full-batch Adam.
+
+    Each query is a sparse row of unit-length binary features; rows are
+    kept flat (feature index per entry, row per entry) so scores and
+    gradients are single bincount calls. Classes are weighted equally.
+
+    Returns:
+        Tuple of (weights, bias)
+    """
+    rows = [hash_features(normalize_query(query), bits, min_n, max_n) for query in queries]
+    lengths = np.array([len(row) for row in rows])
+    columns = np.concatenate(rows).astype(np.int64)
+    row_of = np.repeat(np.arange(len(rows)), lengths)
+    scale = 1.0 / np.sqrt(np.maximum(lengths, 1))
+
+    y = np.asarray(labels, dtype=np.float64)
+    positive = y.mean()
+    sample_weight = np.where(y == 1, 0.5 / positive, 0.5 / (1 - positive)) / len(y)
+
+    dim = 1 << bits
+    weights = np.zeros(dim)
+    bias = 0.0
+    m_w, v_w = np.zeros(dim), np.zeros(dim)
+    m_b = v_b = 0.0
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        scores = np.bincount(row_of, weights=weights[columns], minlength=len(rows)) * scale + bias
+        error = (1.0 / (1.0 + np.exp(-scores)) - y) * sample_weight
+        grad_w = np.bincount(columns, weights=(error * scale)[row_of], minlength=dim) + l2 * weights
+        grad_b = error.sum()
+
+        m_w = beta1 * m_w + (1 - beta1) * grad_w
+        v_w = beta2 * v_w + (1 - beta2) * grad_w ** 2
+        m_b = beta1 * m_b + (1 - beta1) * grad_b
+        v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+        correction1, correction2 = 1 - beta1 ** step, 1 - beta2 ** step
+        weights -= learning_rate * (m_w / correction1) / (np.sqrt(v_w / correction2) + eps)
+        bias -= learning_rate * (m_b / correction1) / (np.sqrt(v_b / correction2) + eps)
+
+    return weights, bias
+
+
+def precision_recall(predicted: List[bool], actual: List[int]) -> Tuple[float, float]:
+    true_positive = sum(1 for p, a in zip(predicted, actual) if p and a)
+    predicted_positive = sum(predicted)
+    actual_positive = sum(actual)
+    precision = true_positive / predicted_positive if predicted_positive else 0.0
+    recall = true_positive / actual_positive if actual_positive else 0.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and export the domain classifier")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--bits", type=int, default=16, help="log2 of the hashed feature count")
+    parser.add_argument("--min-n", type=int, default=2)
+    parser.add_argument("--max-n", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--learning-rate", type=float, default=0.05)
+    parser.add_argument("--l2", type=float, default=1e-5)
+    parser.add_argument("--accept-threshold", type=float, default=0.7,
+                        help="Accept a query without keywords at or above this probability")
+    parser.add_argument("--reject-threshold", type=float, default=0.3,
+                        help="Reject a query with only ambiguous keywords at or below this probability")
+    args = parser.parse_args()
+
+    train_set, test_set = split_corpus(load_corpus(args.corpus))
+    print(f"📚 {len(train_set)} training queries, {len(test_set)} held out")
+
+    start = time.perf_counter()
+    weights, bias = train(
+        [query for _, _, query in train_set],
+        [label for label, _, _ in train_set],
+        args.bits, args.min_n, args.max_n, args.epochs, args.learning_rate, args.l2,
+    )
+    print(f"⏱️ Trained in {time.perf_counter() - start:.1f}s")
+
+    classifier = DomainClassifier(
+        weights=weights,
+        bias=bias,
+        min_n=args.min_n,
+        max_n=args.max_n,
+        accept_threshold=args.accept_threshold,
+        reject_threshold=args.reject_threshold,
+    )
+    for name, examples in (("train", train_set), ("held out", test_set)):
+        predicted = [classifier.probability(normalize_query(query)) >= 0.5 for _, _, query in examples]
+        precision, recall = precision_recall(predicted, [label for label, _, _ in examples])
+        print(f"   {name:<9} precision {precision:.3f}  recall {recall:.3f}")
+
+    classifier.save(args.out)
+    print(f"💾 Model written to {args.out} ({os.path.getsize(args.out) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()